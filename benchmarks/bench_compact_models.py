@@ -0,0 +1,82 @@
+"""pydantic模型与紧凑表示的内存、加载时间对比
+
+用法：python -m benchmarks.bench_compact_models [--chapters 2000] [--lines 200]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple, TypeVar
+
+from benchmarks.synthetic import make_novel
+from novel_spiders.entities.compact_novel import CompactNovel
+from novel_spiders.utils.novel_save_load import (
+    load_novel_from_json,
+    novel_to_json,
+    novel_to_markdown,
+)
+from novel_spiders.utils.novel_store import NovelStore
+
+T = TypeVar("T")
+
+
+def measure(func: Callable[[], T]) -> Tuple[T, float, int]:
+    """执行函数，返回结果、耗时（秒）和结果仍占用的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="紧凑表示基准测试")
+    parser.add_argument("--chapters", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    args = parser.parse_args()
+
+    novel = make_novel(args.chapters, args.lines)
+    json_text = novel_to_json(novel)
+    line_total = args.chapters * (args.lines + 2)
+    print(f"{args.chapters} chapters, {line_total} lines, json {len(json_text)} bytes")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = NovelStore(os.path.join(tmp_dir, "novels.sqlite3"))
+        store.save_novel("bench", novel)
+        del novel
+        gc.collect()
+
+        pydantic_novel, t, m = measure(lambda: load_novel_from_json(json_text))
+        results.append(("pydantic from json", t, m))
+        _, t, m = measure(lambda: store.load_novel("bench"))
+        results.append(("pydantic from store", t, m))
+        _, t, m = measure(lambda: CompactNovel.from_novel(pydantic_novel))
+        results.append(("compact from pydantic", t, m))
+        _, t, m = measure(lambda: list(store.load_compact("bench").chapters))
+        results.append(("compact from store", t, m))
+        lazy_novel, t, m = measure(lambda: store.load_compact("bench"))
+        results.append(("lazy compact (header)", t, m))
+
+        expected, t, m = measure(lambda: novel_to_markdown(pydantic_novel, {}))
+        results.append(("markdown pydantic", t, m))
+        actual, t, m = measure(lambda: novel_to_markdown(lazy_novel, {}))
+        results.append(("markdown lazy compact", t, m))
+        if actual != expected:
+            raise Exception("Markdown from compact novel differs")
+        store.close()
+
+    print(f"{'case':<24}{'time (s)':>10}{'memory (MB)':>14}")
+    for name, elapsed, size in results:
+        print(f"{name:<24}{elapsed:>10.3f}{size / 1024 / 1024:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
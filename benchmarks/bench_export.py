@@ -0,0 +1,46 @@
+"""待翻译json和markdown导出的耗时
+
+用法：python -m benchmarks.bench_export [--chapters 2000] [--lines 200]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.synthetic import make_novel
+from novel_spiders.utils.novel_save_load import (
+    NovelLineIndex,
+    TranslationTable,
+    novel_to_markdown,
+    novel_to_translatable_json,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出基准测试")
+    parser.add_argument("--chapters", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    args = parser.parse_args()
+
+    novel = make_novel(args.chapters, args.lines)
+    start = time.perf_counter()
+    untrans_json = novel_to_translatable_json(novel)
+    print(f"translatable json (cold index) {time.perf_counter() - start:.3f} s")
+
+    # 模拟翻译结果
+    translates = {k: f"訳:{v}" for k, v in json.loads(untrans_json).items()}
+
+    start = time.perf_counter()
+    novel_to_markdown(novel, translates)
+    print(f"markdown (cold index)          {time.perf_counter() - start:.3f} s")
+
+    line_index = NovelLineIndex()
+    start = time.perf_counter()
+    novel_to_translatable_json(novel, line_index)
+    table = TranslationTable(translates)
+    novel_to_markdown(novel, table, line_index)
+    print(f"json + markdown (shared index) {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+"""基准测试套件，结果追加到benchmarks/results/history.jsonl（不纳入版本管理），并与上一次结果比较
+
+用法：python -m benchmarks.run [--quick] [--only fetch,parse] [--no-save]
+
+- fetch：通过本地桩服务器采集整部小说的吞吐量（含延迟和错误重试的场景）
+- parse：各解析后端解析保存的章节页的耗时
+- export：合成小说导出markdown和待翻译json的耗时和峰值内存，以及多格式导出（有无渲染缓存）的耗时
+- json：小说json的保存和读取
+- store：小说存储的保存和读取
+- watch：轮询关注的小说（首次、304、不支持ETag时比较摘要）每部小说的响应字节数，与每次检查都获取作品信息和目录相比
+- stream：采集并保存到存储的峰值内存，整部小说获取完再保存与按顺序流式写入相比，以及章节数翻倍时的增长
+- startup：命令行入口和各子命令模块的导入耗时（新进程中测量），以及导出命令加载的重型依赖数
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from benchmarks.synthetic import make_novel
+from novel_spiders.parsers.syosetu_chapter_parser import PARSER_BACKENDS
+from novel_spiders.utils.novel_export import EXPORT_FORMATS, RenderCache, export_novel
+from novel_spiders.spiders.novel_watcher import NovelWatcher
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.novel_save_load import (
+    load_novel_from_json,
+    novel_to_json,
+    novel_to_markdown,
+    novel_to_translatable_json,
+)
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from novel_spiders.utils.watch_list import WatchList
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results", "history.jsonl")
+
+Metrics = Dict[str, float]
+
+
+def best_time(func: Callable[[], Any], repeat: int = 3) -> float:
+    """多次执行取最短耗时（秒）"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(func: Callable[[], Any]) -> float:
+    """执行期间的峰值内存（MB）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def _crawl(
+    config: StubConfig, data_root: str, rate_limit: RateLimitConfig
+) -> Tuple[float, int, Dict[str, int]]:
+    """用桩服务器采集一次
+    :return: 耗时、章节数、各类请求数
+    """
+    with StubServer(config) as server:
+        spider = Syosetu18Spider()
+        patch_spider(spider, server.base_url)
+        spider.resource_name = config.code
+        spider.data_root = data_root
+        spider.use_journal = False
+        spider.http2 = False
+        spider.rate_limit = rate_limit
+        start = time.perf_counter()
+        novel = asyncio.run(spider.get_novel())
+        elapsed = time.perf_counter() - start
+        return elapsed, len(novel.chapters), dict(server.requests)
+
+
+def bench_fetch(quick: bool) -> Metrics:
+    chapters = 60 if quick else 300
+    no_limit = RateLimitConfig(requests_per_second=0, backoff_base=0.05)
+    results: Metrics = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        elapsed, count, _ = _crawl(
+            StubConfig(chapters=chapters, latency=0.02, seed=1),
+            os.path.join(tmp_dir, "clean"),
+            no_limit,
+        )
+        results["clean_seconds"] = elapsed
+        results["clean_chapters_per_second"] = count / elapsed
+
+        elapsed, count, requests = _crawl(
+            StubConfig(
+                chapters=chapters,
+                latency=0.02,
+                error_rate=0.05,
+                retry_after=None,
+                seed=1,
+            ),
+            os.path.join(tmp_dir, "errors"),
+            no_limit,
+        )
+        results["errors_seconds"] = elapsed
+        results["errors_chapters_per_second"] = count / elapsed
+        results["errors_retried_requests"] = requests.get("error", 0)
+    return results
+
+
+def bench_parse(quick: bool) -> Metrics:
+    repeat = 20 if quick else 100
+    with StubServer(StubConfig(chapters=repeat)) as server:
+        pages = [server.render_chapter(i) for i in range(1, repeat + 1)]
+    results: Metrics = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in PARSER_BACKENDS:
+            spider = Syosetu18Spider()
+            spider.resource_name = "n0000aa"
+            spider.data_root = tmp_dir
+            spider.parser_backend = backend
+
+            def parse_all():
+                for i, html in enumerate(pages, start=1):
+                    spider._parse_single_chapter(html, i)
+
+            results[f"{backend}_ms_per_chapter"] = best_time(parse_all) / repeat * 1000
+    return results
+
+
+def bench_export(quick: bool) -> Metrics:
+    novel = make_novel(100 if quick else 1000, 200)
+    translates = {
+        key: f"訳:{text}"
+        for key, text in json.loads(novel_to_translatable_json(novel)).items()
+    }
+    results = {
+        "markdown_seconds": best_time(lambda: novel_to_markdown(novel, translates)),
+        "markdown_peak_mb": peak_memory(lambda: novel_to_markdown(novel, translates)),
+        "translatable_seconds": best_time(lambda: novel_to_translatable_json(novel)),
+        "translatable_peak_mb": peak_memory(lambda: novel_to_translatable_json(novel)),
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_base = os.path.join(tmp_dir, "bench")
+        with RenderCache(os.path.join(tmp_dir, "render.sqlite3")) as cache:
+
+            def export(use_cache: bool):
+                export_novel(
+                    novel,
+                    translates,
+                    out_base,
+                    EXPORT_FORMATS,
+                    cache if use_cache else None,
+                )
+
+            # 先导出一次，之后两种情况都是替换已有的文件
+            export(True)
+            results["formats_uncached_seconds"] = best_time(lambda: export(False))
+            results["formats_cached_seconds"] = best_time(lambda: export(True))
+    return results
+
+
+def bench_json(quick: bool) -> Metrics:
+    novel = make_novel(100 if quick else 1000, 200)
+    text = novel_to_json(novel)
+    return {
+        "save_seconds": best_time(lambda: novel_to_json(novel)),
+        "load_seconds": best_time(lambda: load_novel_from_json(text)),
+        "load_peak_mb": peak_memory(lambda: load_novel_from_json(text)),
+        "size_mb": len(text.encode("utf-8")) / 1024 / 1024,
+    }
+
+
+def bench_store(quick: bool) -> Metrics:
+    novel = make_novel(100 if quick else 1000, 200)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "novels.sqlite3")
+        store = NovelStore(path)
+        start = time.perf_counter()
+        store.save_novel("bench", novel)
+        save_seconds = time.perf_counter() - start
+        results = {
+            "save_seconds": save_seconds,
+            "load_seconds": best_time(lambda: store.load_novel("bench")),
+            "load_compact_seconds": best_time(
+                lambda: list(store.load_compact("bench").chapters)
+            ),
+            "load_chapter_ms": best_time(lambda: store.load_chapter("bench", 50))
+            * 1000,
+            "size_mb": os.path.getsize(path) / 1024 / 1024,
+        }
+        store.close()
+    return results
+
+
+def _crawl_peak_memory(chapters: int, stream: bool) -> float:
+    """用桩服务器采集并保存到存储，返回期间的峰值内存（MB）
+    :param stream: 为True时流式写入存储，否则整部小说获取完后保存
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with StubServer(StubConfig(chapters=chapters, seed=1)) as server:
+            spider = _watch_spider(server.base_url, server.config.code)
+            spider.data_root = tmp_dir
+            store = NovelStore(os.path.join(tmp_dir, "novels.sqlite3"))
+
+            def crawl() -> None:
+                if stream:
+                    asyncio.run(spider.stream_novel(store, window=32))
+                else:
+                    novel = asyncio.run(spider.get_novel())
+                    store.save_novel(server.config.code, novel)
+
+            peak = peak_memory(crawl)
+            assert len(store.chapter_indexes(server.config.code)) == chapters
+            store.close()
+    return peak
+
+
+def bench_stream(quick: bool) -> Metrics:
+    chapters = 100 if quick else 1000
+    results: Metrics = {}
+    for name, stream in (("gather", False), ("stream", True)):
+        small = _crawl_peak_memory(chapters, stream)
+        large = _crawl_peak_memory(chapters * 2, stream)
+        results[f"{name}_peak_mb"] = large
+        # 章节数翻倍时峰值内存的增长，流式写入时应接近0
+        results[f"{name}_growth_mb"] = large - small
+    return results
+
+
+def _watch_spider(base_url: str, code: str) -> Syosetu18Spider:
+    spider = Syosetu18Spider()
+    patch_spider(spider, base_url)
+    spider.resource_name = code
+    spider.use_journal = False
+    spider.http2 = False
+    spider.parse_workers = 0
+    spider.rate_limit = RateLimitConfig(requests_per_second=0, backoff_base=0.05)
+    return spider
+
+
+def _poll_round(server: StubServer, watch_list: WatchList) -> Tuple[float, int]:
+    """轮询一次所有关注的小说，不处理更新
+    :return: 耗时、响应字节数
+    """
+
+    async def on_change(spider) -> None:
+        pass
+
+    async def run() -> None:
+        watcher = NovelWatcher(
+            watch_list,
+            lambda code, site: _watch_spider(server.base_url, code),
+            on_change,
+            concurrency=32,
+        )
+        template = _watch_spider(server.base_url, "")
+        async with template.create_client() as client:
+            async with template.create_scheduler(client) as scheduler:
+                await watcher.run_once(client, scheduler)
+
+    before = sum(server.bytes_sent.values())
+    start = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - start, sum(server.bytes_sent.values()) - before
+
+
+def bench_watch(quick: bool) -> Metrics:
+    novels = 200 if quick else 5000
+    results: Metrics = {}
+    with StubServer(StubConfig(chapters=100)) as server:
+        # 原来的检查方式：每次获取作品信息页和目录
+        spider = _watch_spider(server.base_url, server.config.code)
+        asyncio.run(spider.plan_crawl())
+        check_bytes = sum(server.bytes_sent.values())
+        results["update_check_bytes_per_novel"] = check_bytes
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with WatchList(
+                os.path.join(tmp_dir, "watch.sqlite3"),
+                min_interval=0,
+                max_interval=0,
+                jitter=0,
+            ) as watch_list:
+                watch_list.follow([f"n{i:04d}aa" for i in range(novels)], "syosetu18")
+                _, size = _poll_round(server, watch_list)
+                results["poll_first_bytes_per_novel"] = size / novels
+                elapsed, size = _poll_round(server, watch_list)
+                results["poll_not_modified_bytes_per_novel"] = size / novels
+                results["poll_not_modified_ratio"] = size / novels / check_bytes
+                results["polls_per_second"] = novels / elapsed
+                server.config.etag = False
+                _, size = _poll_round(server, watch_list)
+                results["poll_no_etag_bytes_per_novel"] = size / novels
+    return results
+
+
+# 导出命令不应加载的依赖
+HEAVY_MODULES = ("httpx", "bs4", "requests", "pydantic", "asyncio")
+
+
+def _import_ms(module: str) -> float:
+    """在新进程中导入模块，返回-X importtime报告的累计耗时（毫秒）"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    ).stderr
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise Exception(f"No import time reported for {module}")
+
+
+def _loaded_heavy_modules(module: str) -> List[str]:
+    """在新进程中导入模块后已加载的重型依赖"""
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    stdout = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    ).stdout
+    return [m for m in stdout.strip().split(",") if m]
+
+
+def bench_startup(quick: bool) -> Metrics:
+    repeat = 3 if quick else 7
+    modules = {
+        "main": "main",
+        "export": "novel_spiders.commands.export",
+        "fetch": "novel_spiders.commands.fetch",
+    }
+    results = {
+        f"{name}_import_ms": min(_import_ms(module) for _ in range(repeat))
+        for name, module in modules.items()
+    }
+    results["export_heavy_modules"] = len(_loaded_heavy_modules(modules["export"]))
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[bool], Metrics]] = {
+    "fetch": bench_fetch,
+    "parse": bench_parse,
+    "export": bench_export,
+    "json": bench_json,
+    "store": bench_store,
+    "watch": bench_watch,
+    "stream": bench_stream,
+    "startup": bench_startup,
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    """读取历史结果"""
+    if not os.path.exists(path):
+        return []
+    history = []
+    with io.open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                history.append(json.loads(line))
+    return history
+
+
+def _previous(history: List[Dict[str, Any]], quick: bool) -> Optional[Dict[str, Any]]:
+    """同一规模的上一次结果"""
+    for entry in reversed(history):
+        if entry.get("quick") == quick:
+            return entry
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基准测试套件")
+    parser.add_argument("--quick", action="store_true", help="缩小规模，快速运行")
+    parser.add_argument(
+        "--only", help=f"只运行部分测试，逗号分隔：{','.join(BENCHMARKS)}"
+    )
+    parser.add_argument("--results", default=RESULTS_PATH, help="历史结果文件")
+    parser.add_argument("--no-save", action="store_true", help="不记录本次结果")
+    args = parser.parse_args()
+
+    names = list(BENCHMARKS) if not args.only else args.only.split(",")
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(
+                f"Unknown benchmark: {name}, available: {list(BENCHMARKS)}"
+            )
+
+    previous = _previous(load_history(args.results), args.quick)
+    previous_results = {} if previous is None else previous["results"]
+
+    results: Dict[str, Metrics] = {}
+    for name in names:
+        print(f"Running {name}...")
+        results[name] = BENCHMARKS[name](args.quick)
+
+    print(f"\n{'metric':<40}{'value':>12}{'previous':>12}{'change':>10}")
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = previous_results.get(name, {}).get(metric)
+            old_text = "" if old is None else f"{old:.4g}"
+            change = "" if not old else f"{(value - old) / old * 100:+.1f}%"
+            print(f"{name + '.' + metric:<40}{value:>12.4g}{old_text:>12}{change:>10}")
+
+    if args.no_save:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    entry = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results,
+    }
+    with io.open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"\nSaved results to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""本地转发代理，代替真实代理测试代理池，可设置延迟和限流
+
+用法：python -m benchmarks.stub_proxy [--port 8866] [--latency 0.05] [--throttle]
+"""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import socket
+import threading
+import time
+
+# 转发时保留的响应头
+_FORWARD_HEADERS = ("Content-Type", "Retry-After", "ETag", "Last-Modified")
+
+
+class StubProxy:
+    """在后台线程运行的HTTP转发代理，只支持http://网址的GET
+
+    用法：
+        with StubProxy(latency=0.01) as proxy:
+            pool = ProxyPool([proxy.url])
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        throttle: bool = False,
+        retry_after: Optional[int] = 1,
+    ):
+        """
+        :param port: 端口，为0时自动分配
+        :param latency: 每个请求额外的延迟（秒）
+        :param throttle: 为True时不转发，全部返回429，模拟被站点限流的出口
+        :param retry_after: 限流时的Retry-After
+        """
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """代理网址"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubProxy":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """在后台线程开始服务"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止服务"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        """在当前线程服务，直到中断"""
+        self._server.serve_forever()
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] += 1
+
+    def _handler_class(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, headers: dict, body: bytes) -> None:
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if proxy.latency > 0:
+                    time.sleep(proxy.latency)
+                if proxy.throttle:
+                    proxy.count("throttled")
+                    headers = {}
+                    if proxy.retry_after is not None:
+                        headers["Retry-After"] = str(proxy.retry_after)
+                    self._reply(429, headers, b"")
+                    return
+
+                target = urlsplit(self.path)
+                if target.scheme != "http" or target.hostname is None:
+                    proxy.count("rejected")
+                    self._reply(400, {}, b"")
+                    return
+                path = target.path or "/"
+                if target.query:
+                    path = f"{path}?{target.query}"
+                headers = {
+                    k: v
+                    for k, v in self.headers.items()
+                    if k.lower() not in ("proxy-connection", "connection", "host")
+                }
+                try:
+                    conn = http.client.HTTPConnection(
+                        target.hostname, target.port or 80, timeout=30
+                    )
+                    conn.request("GET", path, headers=headers)
+                    resp = conn.getresponse()
+                    body = resp.read()
+                    forward = {
+                        k: v for k, v in resp.getheaders() if k in _FORWARD_HEADERS
+                    }
+                    conn.close()
+                except OSError:
+                    proxy.count("bad_gateway")
+                    self._reply(502, {}, b"")
+                    return
+                proxy.count("forwarded")
+                self._reply(resp.status, forward, body)
+
+        return Handler
+
+
+def closed_port_url() -> str:
+    """一个没有监听的本地端口，用作连接失败的代理"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地转发代理")
+    parser.add_argument("--port", type=int, default=8866)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="每个请求的延迟（秒）"
+    )
+    parser.add_argument("--throttle", action="store_true", help="全部返回429")
+    args = parser.parse_args()
+
+    proxy = StubProxy(args.port, args.latency, args.throttle)
+    print(f"Proxy listening at {proxy.url}")
+    try:
+        proxy.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
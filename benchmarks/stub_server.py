@@ -0,0 +1,328 @@
+"""本地桩服务器，用保存的网页模板模拟小说站点，可设置延迟和错误率
+
+用法：python -m benchmarks.stub_server [--port 8765] [--chapters 300] [--latency 0.05]
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import Dict, List, Optional, Set
+import argparse
+import glob
+import hashlib
+import io
+import os
+import random
+import re
+import threading
+import time
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@dataclass
+class StubConfig:
+    """桩服务器设置"""
+
+    code: str = "n0000aa"
+    title: str = "ベンチマーク小説"
+    chapters: int = 100
+    # 目录每页的章节数，与站点一致
+    toc_page_size: int = 100
+    # 每个请求的固定延迟和随机抖动（秒）
+    latency: float = 0.0
+    jitter: float = 0.0
+    # 返回错误的概率，作品信息页不出错
+    error_rate: float = 0.0
+    error_status: int = 503
+    retry_after: Optional[int] = 1
+    # 不同图片的数量，章节按索引轮流引用
+    image_count: int = 5
+    image_size: int = 32 * 1024
+    # 改稿的章节索引到改稿时间
+    revised: Dict[int, str] = field(default_factory=dict)
+    # 每章的话数，大于0时目录中每章开头有章标题
+    episode_size: int = 0
+    # 已删除的章节索引，不出现在目录中，访问时返回404
+    deleted: Set[int] = field(default_factory=set)
+    # 作品信息页和目录页是否返回ETag并响应If-None-Match（304）
+    etag: bool = True
+    seed: Optional[int] = None
+
+
+def _load_templates() -> List[Template]:
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, "chapter_*.html")))
+    templates = []
+    for path in paths:
+        with io.open(path, "r", encoding="utf-8") as f:
+            templates.append(Template(f.read()))
+    return templates
+
+
+class StubServer:
+    """在后台线程运行的桩服务器
+
+    用法：
+        with StubServer(StubConfig(chapters=50)) as server:
+            patch_spider(spider, server.base_url)
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None, port: int = 0):
+        """
+        :param config: 服务器设置
+        :param port: 端口，为0时自动分配
+        """
+        self.config = config or StubConfig()
+        self.requests: Counter = Counter()
+        # 按请求类型统计的响应字节数（含状态行和响应头）
+        self.bytes_sent: Counter = Counter()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        with io.open(
+            os.path.join(FIXTURE_DIR, "info.html"), "r", encoding="utf-8"
+        ) as f:
+            self._info = Template(f.read())
+        self._chapters = _load_templates()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """站点根网址，不带结尾的/"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """在后台线程开始服务"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止服务"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        """在当前线程服务，直到中断"""
+        self._server.serve_forever()
+
+    def count(self, kind: str) -> None:
+        """按类型计数请求"""
+        with self._lock:
+            self.requests[kind] += 1
+
+    def count_bytes(self, kind: str, size: int) -> None:
+        """按类型累计响应字节数"""
+        with self._lock:
+            self.bytes_sent[kind] += size
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.config.error_rate
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.config.latency + self._random.random() * self.config.jitter
+
+    def _substitute(self, template: Template, **values) -> str:
+        text = template.safe_substitute(
+            code=self.config.code,
+            title=self.config.title,
+            chapters=self.config.chapters,
+            **values,
+        )
+        return text.replace("//img.stub/", f"{self.base_url}/img/")
+
+    def render_info(self) -> str:
+        """作品信息页，最终更新日为最后的改稿时间"""
+        updated_at = max(self.config.revised.values(), default="2024/01/01 12:00")
+        return self._substitute(self._info, updated_at=updated_at)
+
+    def render_toc(self, page: int) -> str:
+        """目录页"""
+        config = self.config
+        first = (page - 1) * config.toc_page_size + 1
+        last = min(config.chapters, page * config.toc_page_size)
+        items = []
+        for index in range(first, last + 1):
+            if config.episode_size > 0 and (index - 1) % config.episode_size == 0:
+                episode = (index - 1) // config.episode_size + 1
+                items.append(
+                    f'<div class="p-eplist__chapter-title">第{episode}章</div>'
+                )
+            if index in config.deleted:
+                continue
+            revised = config.revised.get(index)
+            revised_tag = (
+                f'<span title="{revised} 改稿">（<u>改</u>）</span>' if revised else ""
+            )
+            items.append(
+                '<div class="p-eplist__sublist">'
+                f'<a href="/{config.code}/{index}/" class="p-eplist__subtitle">'
+                f"第{index}話</a>"
+                f'<div class="p-eplist__update">\n2024/01/01 12:00\n{revised_tag}'
+                "</div></div>"
+            )
+        page_count = max(
+            1, (config.chapters + config.toc_page_size - 1) // config.toc_page_size
+        )
+        pager = ""
+        if page < page_count:
+            pager = (
+                '<div class="c-pager">'
+                f'<a href="/{config.code}/?p={page + 1}" '
+                'class="c-pager__item c-pager__item--next">次へ</a>'
+                f'<a href="/{config.code}/?p={page_count}" '
+                'class="c-pager__item c-pager__item--last">最後へ</a></div>'
+            )
+        return (
+            '<html><body><div class="p-eplist">'
+            f'{"".join(items)}</div>{pager}</body></html>'
+        )
+
+    def render_chapter(self, index: int) -> str:
+        """章节页，按索引轮流使用保存的章节模板"""
+        template = self._chapters[index % len(self._chapters)]
+        return self._substitute(
+            template, index=index, image=index % max(1, self.config.image_count)
+        )
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def flush_headers(self):
+                # 记录状态行和响应头的字节数
+                buffer = getattr(self, "_headers_buffer", [])
+                self.header_bytes = sum(len(line) for line in buffer)
+                super().flush_headers()
+
+            def finish_response(self, kind: str, body: bytes = b""):
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+                server.count_bytes(kind, self.header_bytes + len(body))
+
+            def do_GET(self):
+                path = self.path
+                code = re.escape(server.config.code)
+                delay = server._delay()
+                if delay > 0:
+                    time.sleep(delay)
+
+                is_info = path.startswith("/novelview/infotop/ncode/")
+                if not is_info and server._should_fail():
+                    server.count("error")
+                    self.send_response(server.config.error_status)
+                    if server.config.retry_after is not None:
+                        self.send_header("Retry-After", str(server.config.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.finish_response("error")
+                    return
+
+                content_type = "text/html; charset=utf-8"
+                if is_info:
+                    kind, body = "info", server.render_info().encode("utf-8")
+                elif path.startswith("/img/"):
+                    kind, body = "image", b"\xff\xd8" + b"\0" * server.config.image_size
+                    content_type = "image/jpeg"
+                elif m := re.fullmatch(rf"/{code}/(?:\?p=(\d+))?", path):
+                    page = int(m.group(1) or 1)
+                    kind, body = "toc", server.render_toc(page).encode("utf-8")
+                elif m := re.fullmatch(rf"/{code}/(\d+)/", path):
+                    index = int(m.group(1))
+                    if (
+                        not 1 <= index <= server.config.chapters
+                        or index in server.config.deleted
+                    ):
+                        kind, body = "missing", b""
+                    else:
+                        kind = "chapter"
+                        body = server.render_chapter(index).encode("utf-8")
+                else:
+                    kind, body = "missing", b""
+
+                etag = None
+                if server.config.etag and kind in ("info", "toc"):
+                    etag = f'"{hashlib.md5(body).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        kind = f"{kind}_not_modified"
+
+                server.count(kind)
+                if kind == "missing":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.finish_response(kind)
+                    return
+                if kind.endswith("_not_modified"):
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.finish_response(kind)
+                    return
+                self.send_response(200)
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.finish_response(kind, body)
+
+        return Handler
+
+
+def patch_spider(spider, base_url: str) -> None:
+    """把爬虫的站点网址改为桩服务器
+    :param spider: 使用syosetu系适配器的NovelSpider
+    :param base_url: 桩服务器根网址
+    """
+    spider.adapter = type(spider.adapter)(base_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地桩服务器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--code", default=StubConfig.code)
+    parser.add_argument("--chapters", type=int, default=300)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="每个请求的延迟（秒）"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        code=args.code,
+        chapters=args.chapters,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    server = StubServer(config, args.port)
+    print(f"Serving {config.code} ({config.chapters} chapters) at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""基准测试用的合成小说"""
+
+from novel_spiders.entities.novel import Chapter, ChapterContent, Novel
+
+
+def make_novel(chapter_count: int, line_count: int) -> Novel:
+    """生成合成小说，每章有章前、本体、章后内容
+    :param chapter_count: 章节数
+    :param line_count: 每章本体行数
+    """
+    chapters = []
+    for i in range(1, chapter_count + 1):
+        chapters.append(
+            Chapter(
+                index=i,
+                title=f"第{i}話",
+                ep_title=f"第{(i - 1) // 50 + 1}章",
+                updated_at="2024/01/01 12:00",
+                prepend_contents=[ChapterContent(key="Lp1", content=f"前書き{i}")],
+                contents=[
+                    ChapterContent(
+                        key=f"L{j}",
+                        content="" if j % 5 == 0 else f"本文{i}の{j}行目です。" * 3,
+                    )
+                    for j in range(1, line_count + 1)
+                ],
+                append_contents=[ChapterContent(key="La1", content=f"後書き{i}")],
+            )
+        )
+    return Novel(
+        title="合成小説", description="あらすじ", author="作者", chapters=chapters
+    )
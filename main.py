@@ -1,90 +1,275 @@
-from typing import Dict, Optional
-from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
-from novel_spiders.utils.novel_save_load import (
-    novel_to_json,
-    load_novel_from_json,
-    novel_to_translatable_json,
-    load_json_dict,
-    novel_to_markdown,
-)
-from novel_spiders.entities.novel import Novel
-import asyncio
-import io
-import os
+from typing import List, Optional
+import argparse
 import sys
 
+# 入口只依赖标准库，各子命令在运行时才导入所需模块：
+# export / translate-export 只读取已保存的小说，不导入httpx、bs4和pydantic
+COMMANDS = ("fetch", "export", "translate-export", "worker", "watch")
+DEFAULT_COMMAND = "fetch"
 
-async def main():
-    # spider = Syosetu18Spider()
-    # # spider.resource_name = "n3057hq"
-    # spider.resource_name = "n0609jx"
-    # novel = await spider.get_novel()
-    # json = novel_to_json(novel)
-    # # 保存到test.json中
-    # with io.open("test.json", "w", encoding="utf-8") as f:
-    #     f.write(json)
-
-    # with io.open("test.json", "r", encoding="utf-8") as f:
-    #     json = f.read()
-    # novel2 = load_novel_from_json(json)
-    # print(novel2.title)
-    # # trans_json = novel_to_translatable_json(novel2)
-    # # with io.open("testtrans.json", "w", encoding="utf-8") as f:
-    # #     f.write(trans_json)
-    # with io.open("transed.json", "r", encoding="utf-8") as f:
-    #     trans_json = f.read()
-    # trans_dict = load_json_dict(trans_json)
-    # md_text = novel_to_markdown(novel2, trans_dict)
-    # with io.open("test.md", "w", encoding="utf-8") as f:
-    #     f.write(md_text)
-
-    # 采集导出试验
-    code = sys.argv[1]
-    spider = Syosetu18Spider()
-    spider.resource_name = code
-    spider.data_root = f"./data/{code}"
-    spider.asset_dir = "assets"
-
-    # 目录不存在则创建
-    if not os.path.exists(spider.data_root):
-        os.makedirs(spider.data_root)
-
-    novel_path = os.path.join(spider.data_root, f"{code}.json")
-    novel: Optional[Novel] = None
-    if os.path.exists(novel_path):
-        print(f"Load novel from {novel_path}")
-        with io.open(novel_path, "r", encoding="utf-8") as f:
-            novel = load_novel_from_json(f.read())
-    else:
-        print(f"Get novel from {spider.resource_name}")
-        novel = await spider.get_novel(proxy=Syosetu18Spider.PROXY_URL)
-        with io.open(novel_path, "w", encoding="utf-8") as f:
-            f.write(novel_to_json(novel))
-
-    untrans_json_path = os.path.join(spider.data_root, f"{code}_untrans.json")
-    if not os.path.exists(untrans_json_path):
-        print(f"Save untranslatable json to {untrans_json_path}")
-        with io.open(untrans_json_path, "w", encoding="utf-8") as f:
-            f.write(novel_to_translatable_json(novel))
-
-    trans_json_path = os.path.join(spider.data_root, f"{code}_trans.json")
-    # AITranslator 出来的默认文件名，忘了改名时的兼容
-    if not os.path.exists(trans_json_path):
-        trans_json_path = os.path.join(spider.data_root, f"合并结果.json")
-    trans_dict: Dict[str, str] = {}
-    if os.path.exists(trans_json_path):
-        print("Load translatable")
-        with io.open(trans_json_path, "r", encoding="utf-8") as f:
-            trans_json = f.read()
-            trans_dict = load_json_dict(trans_json)
-
-    print("Save markdown")
-    md_text = novel_to_markdown(novel, trans_dict)
-    with io.open(
-        os.path.join(spider.data_root, f"{code}.md"), "w", encoding="utf-8"
-    ) as f:
-        f.write(md_text)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口
+    :param argv: 命令行参数，为None时用sys.argv
+    :return: 退出码
+    """
+    parser = _build_parser()
+    args = parser.parse_args(_with_default_command(argv))
+    if args.command in ("export", "translate-export"):
+        from novel_spiders.commands.export import run_export
+
+        return run_export(args, render=args.command == "export")
+
+    import asyncio
+
+    from novel_spiders.commands import fetch
+
+    error = fetch.check_args(args)
+    if error is not None:
+        parser.error(error)
+    if args.command == "worker":
+        return asyncio.run(fetch.run_worker(args))
+    if args.command == "watch":
+        return asyncio.run(fetch.run_watch(args))
+    return asyncio.run(fetch.run_fetch(args))
+
+
+def _with_default_command(argv: Optional[List[str]]) -> List[str]:
+    """没有指定子命令时使用fetch，兼容旧的命令行"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and (argv[0] in COMMANDS or argv[0] in ("-h", "--help")):
+        return argv
+    return [DEFAULT_COMMAND, *argv]
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """创建命令行解析器"""
+    codes = argparse.ArgumentParser(add_help=False)
+    codes.add_argument("codes", nargs="*", help="小说编号，如n0609jx，可指定多个")
+    codes.add_argument(
+        "--codes-file",
+        help="从文件读取小说编号，每行一个，#开头的行忽略",
+    )
+
+    store = argparse.ArgumentParser(add_help=False)
+    store.add_argument(
+        "--store",
+        default="./data/novels.sqlite3",
+        help="小说存储的数据库路径，旧的{code}.json在首次读取时自动导入",
+    )
+
+    network = argparse.ArgumentParser(add_help=False)
+    network.add_argument("--site", default="syosetu18", help="站点适配器")
+    network.add_argument(
+        "--proxy", help="代理，为空字符串时不使用代理，默认使用爬虫的PROXY_URL"
+    )
+    network.add_argument(
+        "--proxies",
+        help="代理池，逗号分隔，指定时忽略--proxy，请求分摊到各代理，每个代理单独限速",
+    )
+    network.add_argument(
+        "--proxy-file", help="从文件读取代理池，每行一个，#开头的行忽略"
+    )
+    network.add_argument(
+        "--proxy-strategy",
+        default="least_outstanding",
+        help="选择代理的策略：least_outstanding（进行中的请求最少）或latency（按延迟加权）",
+    )
+    network.add_argument(
+        "--proxy-check-interval",
+        type=float,
+        default=60.0,
+        help="代理健康检查间隔（秒），为0时只在请求失败或被限流时剔除",
+    )
+    network.add_argument(
+        "--cache-only",
+        action="store_true",
+        help="离线模式，只从响应缓存读取网页，不访问网络",
+    )
+    network.add_argument("--no-cache", action="store_true", help="不使用响应缓存")
+    network.add_argument(
+        "--worker-concurrency",
+        type=int,
+        default=8,
+        help="每个工作进程同时处理的章节数",
+    )
+
+    translate = argparse.ArgumentParser(add_help=False)
+    translate.add_argument(
+        "--delta",
+        action="store_true",
+        help="导出{code}_delta.json，只含没有翻译或原文改动过的行",
+    )
+    translate.add_argument(
+        "--merge-delta",
+        action="store_true",
+        help="把{code}_delta_trans.json（增量的翻译结果）合并到{code}_trans.json",
+    )
+    translate.add_argument(
+        "--chunk-bytes",
+        type=int,
+        default=0,
+        help="按字节数上限把待翻译内容分块导出到{code}_chunks，章节不拆分",
+    )
+    translate.add_argument(
+        "--chunk-tokens", type=int, default=0, help="分块的token数上限"
+    )
+    translate.add_argument("--chunk-lines", type=int, default=0, help="分块的行数上限")
+    translate.add_argument(
+        "--merge-chunks",
+        action="store_true",
+        help="按清单顺序把{code}_chunks/part-NNNN_trans.json合并到{code}_trans.json",
+    )
+    translate.add_argument(
+        "--metrics-json",
+        help="结束时把指标（耗时分布、字节数、重试、队列长度等）写到json文件",
+    )
+
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument(
+        "--formats", default="md", help="导出格式，逗号分隔：md、html、epub"
+    )
+    render.add_argument(
+        "--no-render-cache",
+        action="store_true",
+        help="不使用章节渲染缓存（{code}_render.sqlite3），全部重新渲染",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="采集小说并导出，不指定子命令时为fetch"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    fetch = commands.add_parser(
+        "fetch",
+        parents=[codes, store, network, translate, render],
+        help="采集（或增量更新）小说并导出",
+    )
+    fetch.add_argument(
+        "--max-novels",
+        type=int,
+        default=4,
+        help="同时采集的小说数，所有小说的章节共用一个任务队列",
+    )
+    fetch.add_argument(
+        "--update",
+        action="store_true",
+        help="已保存时增量更新，只获取新增或改稿的章节",
+    )
+    fetch.add_argument(
+        "--queue",
+        help="分布式采集的任务队列（SQLite）路径，指定时章节由工作进程获取并写入--store",
+    )
+    fetch.add_argument(
+        "--local-workers",
+        type=int,
+        default=2,
+        help="指定--queue时在本机启动的工作进程数，为0时只等待其他工作进程",
+    )
+    fetch.add_argument(
+        "--save-json",
+        action="store_true",
+        help="保存时同时写出{code}.json",
+    )
+    fetch.add_argument(
+        "--migrate",
+        action="store_true",
+        help="开始前把./data下所有{code}/{code}.json导入存储",
+    )
+    fetch.add_argument(
+        "--refetch",
+        action="store_true",
+        help="忽略已保存的小说重新采集，配合--cache-only可用新的解析逻辑重放缓存",
+    )
+    fetch.add_argument(
+        "--metrics-prom",
+        help="定期把采集指标写到Prometheus文本格式文件，可供node_exporter采集",
+    )
+    fetch.add_argument(
+        "--progress-interval",
+        type=float,
+        default=1.0,
+        help="进度显示和Prometheus文件的刷新间隔（秒）",
+    )
+    fetch.add_argument(
+        "--no-progress", action="store_true", help="不显示采集进度和预计剩余时间"
+    )
+
+    commands.add_parser(
+        "export",
+        parents=[codes, store, translate, render],
+        help="导出已保存的小说（待翻译json、markdown等格式），不访问网络",
+    )
+    commands.add_parser(
+        "translate-export",
+        parents=[codes, store, translate],
+        help="只导出或合并翻译文件（待翻译json、增量、分块），不渲染",
+    )
+
+    worker = commands.add_parser(
+        "worker",
+        parents=[store, network],
+        help="处理任务队列中的章节任务，--site需与协调者一致",
+    )
+    worker.add_argument("--queue", required=True, help="任务队列（SQLite）路径")
+    worker.add_argument(
+        "--exit-when-drained",
+        action="store_true",
+        help="在协调者结束且没有剩余任务时退出，否则一直等待新任务",
+    )
+
+    watch = commands.add_parser(
+        "watch",
+        parents=[codes, store, network, translate, render],
+        help="轮询关注的小说，有更新时只获取新章节并导出，指定的小说编号加入关注列表",
+    )
+    watch.add_argument(
+        "--watch-list",
+        default="./data/watch.sqlite3",
+        help="关注列表和轮询计划的数据库路径",
+    )
+    watch.add_argument(
+        "--min-interval",
+        type=float,
+        default=600.0,
+        help="轮询间隔下限（秒），经常更新的小说逐渐缩短到此间隔",
+    )
+    watch.add_argument(
+        "--max-interval",
+        type=float,
+        default=86400.0,
+        help="轮询间隔上限（秒），长期没有更新的小说逐渐延长到此间隔",
+    )
+    watch.add_argument(
+        "--initial-interval",
+        type=float,
+        default=3600.0,
+        help="新关注的小说的轮询间隔（秒）",
+    )
+    watch.add_argument(
+        "--poll-concurrency",
+        type=int,
+        default=8,
+        help="同时进行的轮询请求数",
+    )
+    watch.add_argument(
+        "--max-novels",
+        type=int,
+        default=2,
+        help="同时更新的小说数",
+    )
+    watch.add_argument(
+        "--save-json",
+        action="store_true",
+        help="保存时同时写出{code}.json",
+    )
+    watch.add_argument(
+        "--once",
+        action="store_true",
+        help="只轮询一次当前到期的小说后退出，可由cron等定期运行",
+    )
+    return parser
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(main())
@@ -0,0 +1,74 @@
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import Dict, List, Type, TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from novel_spiders.interfaces.ISiteAdapter import ISiteAdapter
+
+# 第三方包通过此入口点组注册适配器：name = "module:Class"
+ENTRY_POINT_GROUP = "pynovelspider.adapters"
+
+# 内置适配器，使用时才导入
+BUILTIN_ADAPTERS: Dict[str, str] = {
+    "syosetu": "novel_spiders.adapters.syosetu_adapter:SyosetuAdapter",
+    "syosetu18": "novel_spiders.adapters.syosetu_adapter:Syosetu18Adapter",
+}
+
+_registry: Dict[str, Union[str, Type["ISiteAdapter"]]] = dict(BUILTIN_ADAPTERS)
+_entry_points_loaded = False
+
+
+def register_adapter(adapter_class: Type["ISiteAdapter"]) -> Type["ISiteAdapter"]:
+    """注册适配器类，可用作类装饰器，同名时覆盖
+    :param adapter_class: 适配器类，name为注册名
+    :return: 适配器类
+    """
+    if not adapter_class.name:
+        raise ValueError(f"Adapter {adapter_class.__name__} has no name")
+    _registry[adapter_class.name] = adapter_class
+    return adapter_class
+
+
+def _load_entry_points() -> None:
+    """读取已安装包声明的适配器，不覆盖已注册的同名适配器"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        _registry.setdefault(entry_point.name, entry_point.value)
+
+
+def available_adapters() -> List[str]:
+    """所有可用的适配器名"""
+    _load_entry_points()
+    return sorted(_registry)
+
+
+def get_adapter_class(name: str) -> Type["ISiteAdapter"]:
+    """按注册名获取适配器类
+    :param name: 注册名，见available_adapters
+    :return: 适配器类
+    """
+    adapter_class = _registry.get(name)
+    if adapter_class is None:
+        _load_entry_points()
+        adapter_class = _registry.get(name)
+    if adapter_class is None:
+        raise ValueError(
+            f"Unknown site adapter: {name}, available: {available_adapters()}"
+        )
+    if isinstance(adapter_class, str):
+        module_name, _, class_name = adapter_class.partition(":")
+        adapter_class = getattr(import_module(module_name), class_name)
+        _registry[name] = adapter_class
+    return adapter_class
+
+
+def get_adapter(name: str, **kwargs) -> "ISiteAdapter":
+    """按注册名创建适配器
+    :param name: 注册名
+    :param kwargs: 传给适配器构造函数的参数，如base_url
+    :return: 适配器
+    """
+    return get_adapter_class(name)(**kwargs)
@@ -0,0 +1,157 @@
+from typing import List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+from novel_spiders.entities.novel import TocEntry
+from novel_spiders.interfaces.ISiteAdapter import ISiteAdapter, NovelInfo, TocPage
+from novel_spiders.parsers.syosetu_chapter_parser import (
+    ParsedChapter,
+    get_chapter_parser,
+)
+
+
+class SyosetuAdapter(ISiteAdapter):
+    """小説家になろう（ncode.syosetu.com）"""
+
+    name = "syosetu"
+    BASE_URL = "https://ncode.syosetu.com"
+
+    def __init__(self, base_url: Optional[str] = None):
+        """
+        :param base_url: 站点根网址，不带结尾的/，为None时用BASE_URL
+        """
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+
+    def info_url(self, code: str) -> str:
+        return f"{self.base_url}/novelview/infotop/ncode/{code}/"
+
+    def toc_url(self, code: str) -> str:
+        return f"{self.base_url}/{code}/"
+
+    def chapter_url(self, code: str, index: int) -> str:
+        return f"{self.base_url}/{code}/{index}/"
+
+    def health_url(self) -> str:
+        return f"{self.base_url}/"
+
+    def check_parser_backend(self, backend: str) -> None:
+        get_chapter_parser(backend)
+
+    def parse_chapter(self, html: str, backend: str) -> ParsedChapter:
+        return get_chapter_parser(backend)(html)
+
+    def parse_info(self, html: str) -> NovelInfo:
+        """获取小说基本信息
+        :param html: 网页内容
+        :return: 小说标题、作者、简介、章节数
+        """
+        soup = BeautifulSoup(html, "html.parser")
+        # 标题：<div id="contents_main"> -> h1 -> a
+        title_tag = soup.select_one("#contents_main > h1 > a")
+        title = "" if title_tag is None else title_tag.text.strip()
+
+        # 章节数：div id=pre_info，取最后一个a标签的href，根据url最后一层为最后一章
+        chapter_tag = soup.select_one("#pre_info > a:last-child")
+        chapter = 0
+        if chapter_tag is not None:
+            chapter_url_attr = chapter_tag.get("href")
+            chapter_url = ""
+            if isinstance(chapter_url_attr, str):
+                chapter_url = chapter_url_attr
+            elif isinstance(chapter_url_attr, list):
+                chapter_url = chapter_url_attr[-1]
+            try:
+                chapter = int(chapter_url.strip("/").split("/")[-1])
+            except ValueError:
+                # 短篇没有章节页
+                chapter = 0
+
+        author = ""
+        desc = ""
+        # 最終掲載日、最終更新日等，可能在noveltable2中
+        dates: List[str] = []
+
+        trs = []
+        for table_id in ("noveltable1", "noveltable2"):
+            table = soup.find("table", id=table_id)
+            if isinstance(table, Tag):
+                trs.extend(table.find_all("tr"))
+        for tr in trs:
+            th_tag = tr.find("th")
+            td_tag = tr.find("td")
+            if th_tag is None or td_tag is None:
+                continue
+            th = th_tag.text.strip()
+            td = td_tag.text.strip()
+            if "作者名" in th:
+                author = td
+            elif "あらすじ" in th:
+                desc = td
+            elif th.endswith("掲載日") or th.endswith("更新日"):
+                dates.append(td)
+
+        return NovelInfo(title, author, desc, chapter, " ".join(dates))
+
+    def parse_toc_page(self, html: str, url: str) -> TocPage:
+        """解析一页目录
+        :param html: 网页内容
+        :param url: 目录页网址，用于补全章节网址
+        :return: 本页的章节和翻页链接
+        """
+        soup = BeautifulSoup(html, "html.parser")
+
+        entries: List[TocEntry] = []
+        ep_title = ""
+        for item in soup.select(".p-eplist__chapter-title, .p-eplist__sublist"):
+            classes = item.get("class") or []
+            if "p-eplist__chapter-title" in classes:
+                ep_title = item.text.strip()
+                continue
+            link = item.select_one("a.p-eplist__subtitle")
+            if link is None:
+                continue
+            href = link.get("href")
+            if not isinstance(href, str):
+                continue
+            try:
+                index = int(href.strip("/").split("/")[-1])
+            except ValueError:
+                continue
+
+            updated_at = ""
+            update_tag = item.select_one(".p-eplist__update")
+            if update_tag is not None:
+                # 改稿时：<span title="2024/01/02 12:00 改稿">（<u>改</u>）</span>
+                revised_tag = update_tag.select_one("span[title]")
+                revised = revised_tag.get("title") if revised_tag is not None else None
+                if isinstance(revised, str) and revised.strip():
+                    updated_at = revised.replace("改稿", "").strip()
+                else:
+                    posted = update_tag.find(string=True, recursive=False)
+                    updated_at = "" if posted is None else str(posted).strip()
+
+            entries.append(
+                TocEntry(
+                    index=index,
+                    url=urljoin(url, href),
+                    title=link.text.strip(),
+                    ep_title=ep_title,
+                    updated_at=updated_at,
+                )
+            )
+
+        hrefs: List[Optional[str]] = []
+        for selector in ("a.c-pager__item--next", "a.c-pager__item--last"):
+            tag = soup.select_one(selector)
+            href = tag.get("href") if tag is not None else None
+            hrefs.append(href if isinstance(href, str) else None)
+        return TocPage(entries, ep_title, hrefs[0], hrefs[1])
+
+
+class Syosetu18Adapter(SyosetuAdapter):
+    """ノクターンノベルズ等R18版（novel18.syosetu.com），需要年龄确认的cookie"""
+
+    name = "syosetu18"
+    BASE_URL = "https://novel18.syosetu.com"
+    COOKIES = {"over18": "yes"}
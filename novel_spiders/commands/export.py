@@ -0,0 +1,184 @@
+from typing import List, Optional, Union, TYPE_CHECKING
+import argparse
+import io
+import os
+
+from novel_spiders.entities.compact_novel import CompactNovel
+from novel_spiders.utils.chunked_export import (
+    ChunkLimit,
+    export_translatable_chunks,
+    merge_translated_chunks,
+)
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.novel_export import EXPORT_FORMATS, RenderCache, export_novel
+from novel_spiders.utils.novel_save_load import (
+    NovelLineIndex,
+    TranslationTable,
+    load_compact_novel_from_json,
+    novel_to_translatable_json,
+)
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.translation_delta import TranslationFiles
+
+if TYPE_CHECKING:
+    from novel_spiders.entities.novel import Novel
+
+# 导出命令只读取已保存的小说，不导入httpx、bs4和pydantic
+
+
+def read_codes(args: argparse.Namespace) -> List[str]:
+    """合并命令行和文件中的小说编号，去重并保持顺序"""
+    codes: List[str] = list(args.codes)
+    if args.codes_file:
+        with io.open(args.codes_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    codes.append(line)
+    return list(dict.fromkeys(codes))
+
+
+def parse_formats(value: str) -> List[str]:
+    """解析逗号分隔的导出格式
+    :param value: 如"md,epub"
+    :return: 格式列表
+    """
+    formats = [fmt.strip() for fmt in value.split(",") if fmt.strip()]
+    for fmt in formats:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown export format: {fmt}, available: {list(EXPORT_FORMATS)}"
+            )
+    return formats
+
+
+def load_saved_novel(
+    code: str, store: NovelStore, data_root: str
+) -> Optional[CompactNovel]:
+    """读取已保存的小说为紧凑表示，存储中没有时读取旧的{code}.json（不导入存储）
+    :param code: 小说编号
+    :param store: 小说存储
+    :param data_root: 小说的数据目录
+    :return: 紧凑小说，都没有时为None
+    """
+    compact = store.load_compact(code)
+    if compact is not None:
+        return compact
+    novel_path = os.path.join(data_root, f"{code}.json")
+    if not os.path.exists(novel_path):
+        return None
+    with io.open(novel_path, "r", encoding="utf-8") as f:
+        return load_compact_novel_from_json(f.read())
+
+
+def export_outputs(
+    data_root: str,
+    code: str,
+    novel: Union["Novel", CompactNovel],
+    args: argparse.Namespace,
+    metrics: Metrics,
+    render: bool = True,
+) -> None:
+    """导出待翻译json和带翻译的markdown等格式，各步骤耗时记录到export_seconds
+    :param render: 是否渲染--formats指定的格式，为False时只处理翻译相关的文件
+    """
+    # 两种导出共用行索引，每行的key和分类只计算一次
+    line_index = NovelLineIndex()
+    untrans_json_path = os.path.join(data_root, f"{code}_untrans.json")
+    if not os.path.exists(untrans_json_path):
+        print(f"Save untranslatable json to {untrans_json_path}")
+        with metrics.timer("export_seconds", stage="untrans_json"):
+            with io.open(untrans_json_path, "w", encoding="utf-8") as f:
+                f.write(novel_to_translatable_json(novel, line_index))
+
+    files = TranslationFiles(data_root, code)
+    trans_dict = files.load_translates()
+    if trans_dict:
+        print("Load translatable")
+    chunk_dir = os.path.join(data_root, f"{code}_chunks")
+    if args.merge_chunks:
+        chunk_translates = merge_translated_chunks(chunk_dir)
+        trans_dict.update(chunk_translates)
+        files.save_translates(trans_dict)
+        print(f"Merged {len(chunk_translates)} translated lines from {chunk_dir}")
+    if args.merge_delta:
+        merged = files.merge_delta(trans_dict)
+        print(f"Merged {len(merged)} translated lines into {files.trans_path}")
+    if args.delta:
+        with metrics.timer("export_seconds", stage="delta"):
+            delta = files.export_delta(novel, trans_dict, line_index)
+        if delta:
+            print(f"Save {len(delta)} untranslated lines to {files.delta_path}")
+        else:
+            print("No untranslated lines")
+    limit = ChunkLimit(args.chunk_bytes, args.chunk_tokens, args.chunk_lines)
+    if limit.max_bytes or limit.max_tokens or limit.max_lines:
+        with metrics.timer("export_seconds", stage="chunks"):
+            chunks = export_translatable_chunks(novel, chunk_dir, limit)
+        print(f"Save {len(chunks)} translatable chunks to {chunk_dir}")
+    if not render:
+        return
+    translates = TranslationTable(trans_dict)
+
+    formats = parse_formats(args.formats)
+    print(f"Save {', '.join(formats)}")
+    cache = (
+        None
+        if args.no_render_cache
+        else RenderCache(os.path.join(data_root, f"{code}_render.sqlite3"))
+    )
+    # 各章独立渲染，内容和翻译没有变化的章节直接使用缓存
+    try:
+        with metrics.timer("export_seconds", stage="render"):
+            stats = export_novel(
+                novel,
+                translates,
+                os.path.join(data_root, code),
+                formats,
+                cache,
+                line_index=line_index,
+            )
+    finally:
+        if cache is not None:
+            cache.close()
+    metrics.inc("export_chapters_total", stats.rendered, result="rendered")
+    metrics.inc("export_chapters_total", stats.cached, result="cached")
+    print(f"Rendered {stats.rendered} chapters, {stats.cached} from cache")
+
+
+def run_export(args: argparse.Namespace, render: bool = True) -> int:
+    """export / translate-export命令：导出已保存的小说，不访问网络
+    :param render: 为False时只导出和合并翻译文件（translate-export）
+    :return: 退出码
+    """
+    codes = read_codes(args)
+    if not codes:
+        print("No novel code given")
+        return 0
+    if render:
+        try:
+            parse_formats(args.formats)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 2
+
+    metrics = Metrics()
+    failures = 0
+    with NovelStore(args.store) as store:
+        for code in codes:
+            data_root = f"./data/{code}"
+            try:
+                novel = load_saved_novel(code, store, data_root)
+                if novel is None:
+                    raise Exception(f"Novel not found: {code}, fetch it first")
+                os.makedirs(data_root, exist_ok=True)
+                export_outputs(data_root, code, novel, args, metrics, render)
+            except Exception as e:
+                failures += 1
+                print(f"{code} failed: {e}")
+            else:
+                print(f"{code} done: {len(novel.chapters)} chapters")
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"Saved metrics to {args.metrics_json}")
+    return 1 if failures else 0
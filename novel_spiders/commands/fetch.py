@@ -0,0 +1,453 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import sys
+import time
+
+from novel_spiders.adapters.registry import get_adapter, get_adapter_class
+from novel_spiders.commands.export import export_outputs, parse_formats, read_codes
+from novel_spiders.entities.compact_novel import CompactNovel
+from novel_spiders.spiders.distributed_crawl import (
+    CrawlWorker,
+    enqueue_novel,
+    finish_novel,
+    wait_for_novel,
+)
+from novel_spiders.spiders.novel_spider import NovelSpider
+from novel_spiders.spiders.novel_watcher import POLL_CHANGED, NovelWatcher
+from novel_spiders.utils.metrics import Metrics, describe_crawl_metrics
+from novel_spiders.utils.novel_save_load import write_novel_json
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.proxy_pool import PROXY_STRATEGIES, ProxyPool
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+from novel_spiders.utils.response_cache import ResponseCache
+from novel_spiders.utils.watch_list import WatchList
+from novel_spiders.utils.work_queue import WorkQueue
+
+
+def check_args(args: argparse.Namespace) -> Optional[str]:
+    """检查需要导入站点适配器等模块才能确定的参数
+    :return: 错误信息，没有错误时为None
+    """
+    if args.proxy_strategy not in PROXY_STRATEGIES:
+        return (
+            f"Unknown proxy strategy: {args.proxy_strategy}, "
+            f"available: {list(PROXY_STRATEGIES)}"
+        )
+    try:
+        get_adapter_class(args.site)
+        if getattr(args, "formats", None) is not None:
+            parse_formats(args.formats)
+    except ValueError as e:
+        return str(e)
+    if args.proxy is None:
+        args.proxy = NovelSpider.PROXY_URL
+    return None
+
+
+async def run_fetch(args: argparse.Namespace) -> int:
+    """fetch命令：采集（或增量更新）小说并导出
+    :return: 退出码
+    """
+    codes = read_codes(args)
+    if not codes:
+        print("No novel code given")
+        return 0
+
+    cache: Optional[ResponseCache] = None
+    if not args.no_cache:
+        cache = ResponseCache("./data/.http_cache", cache_only=args.cache_only)
+
+    store = NovelStore(args.store)
+    if args.migrate:
+        migrated = store.migrate_data_root("./data")
+        print(f"Migrated {len(migrated)} novels to {args.store}")
+
+    metrics = Metrics()
+    describe_crawl_metrics(metrics)
+
+    proxies = read_proxies(args)
+    proxy_pool: Optional[ProxyPool] = None
+    if proxies:
+        proxy_pool = ProxyPool(proxies, args.proxy_strategy)
+        print(f"Using {len(proxy_pool)} proxies ({args.proxy_strategy})")
+
+    queue: Optional[WorkQueue] = None
+    workers: List[multiprocessing.process.BaseProcess] = []
+    if args.queue:
+        # 分布式采集：本进程只获取目录并把章节加入队列，章节由工作进程获取
+        queue = WorkQueue(args.queue)
+        queue.closed = False
+        workers = _start_local_workers(args)
+        print(f"Queue chapters to {args.queue}, {len(workers)} local workers")
+
+    # 所有小说共用一个连接池、限流器、代理池、章节调度器和采集指标
+    template = create_spider(codes[0], args, cache, metrics, proxy_pool)
+    start = time.monotonic()
+    novel_semaphore = asyncio.Semaphore(args.max_novels)
+    failures: Dict[str, str] = {}
+    finished = 0
+
+    async def run_novel(code: str) -> None:
+        nonlocal finished
+        async with novel_semaphore:
+            spider = create_spider(code, args, cache, metrics, proxy_pool)
+            spider.client = client
+            spider.scheduler = scheduler
+            try:
+                novel = await _crawl_novel(spider, code, store, args, queue, metrics)
+                await asyncio.to_thread(
+                    export_outputs, spider.data_root, code, novel, args, metrics
+                )
+            except Exception as e:
+                failures[code] = str(e)
+                finished += 1
+                metrics.inc("novels_total", result="failed")
+                print(f"[{finished}/{len(codes)}] {code} failed: {e}")
+            else:
+                finished += 1
+                metrics.inc("novels_total", result="ok")
+                print(
+                    f"[{finished}/{len(codes)}] {code} done: {len(novel.chapters)} chapters"
+                )
+
+    reporter = asyncio.create_task(_report_progress(metrics, len(codes), args))
+    background = [reporter]
+    try:
+        async with template.create_client(args.proxy) as client:
+            health_url = template.adapter.health_url()
+            if proxy_pool is not None and args.proxy_check_interval > 0 and health_url:
+                background.append(
+                    asyncio.create_task(
+                        _check_proxies(client, health_url, args.proxy_check_interval)
+                    )
+                )
+            async with template.create_scheduler(client) as scheduler:
+                await asyncio.gather(*(run_novel(code) for code in codes))
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        _write_metrics(metrics, args)
+        if queue is not None:
+            # 通知工作进程处理完剩余任务后退出
+            queue.closed = True
+            for worker in workers:
+                await asyncio.to_thread(worker.join)
+            queue.close()
+        store.close()
+        if cache is not None:
+            cache.close()
+
+    if not args.no_progress:
+        print(_progress_line(metrics, len(codes), time.monotonic() - start, None))
+
+    if failures:
+        print(f"\n{len(failures)} of {len(codes)} novels failed:")
+        for code, error in failures.items():
+            print(f"{code}: {error}")
+        return 1
+    return 0
+
+
+def read_proxies(args: argparse.Namespace) -> List[str]:
+    """合并命令行和文件中的代理池，去重并保持顺序"""
+    proxies: List[str] = []
+    if args.proxies:
+        proxies.extend(p.strip() for p in args.proxies.split(",") if p.strip())
+    if args.proxy_file:
+        with io.open(args.proxy_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    proxies.append(line)
+    return list(dict.fromkeys(proxies))
+
+
+async def _check_proxies(client: AsyncHttpClient, url: str, interval: float) -> None:
+    """定期检查代理池，恢复已正常的代理，剔除失效的代理"""
+    while True:
+        await asyncio.sleep(interval)
+        health = await client.check_proxies(url)
+        down = [proxy for proxy, ok in health.items() if not ok]
+        if down:
+            print(f"Unhealthy proxies: {', '.join(down)}")
+
+
+def _start_local_workers(
+    args: argparse.Namespace,
+) -> List[multiprocessing.process.BaseProcess]:
+    """启动本机的工作进程，协调者结束且没有剩余任务时退出"""
+    worker_args = argparse.Namespace(**vars(args))
+    worker_args.exit_when_drained = True
+    # 协调者已在运行事件循环，用spawn启动，不复制当前进程的状态
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(max(0, args.local_workers)):
+        process = context.Process(target=worker_process, args=(worker_args,))
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def worker_process(args: argparse.Namespace) -> None:
+    """工作进程入口"""
+    asyncio.run(run_worker(args))
+
+
+async def run_worker(args: argparse.Namespace) -> int:
+    """worker命令：处理任务队列中的章节，写入小说存储
+    :return: 退出码
+    """
+    cache: Optional[ResponseCache] = None
+    if not args.no_cache:
+        cache = ResponseCache("./data/.http_cache", cache_only=args.cache_only)
+    store = NovelStore(args.store)
+    queue = WorkQueue(args.queue)
+    proxies = read_proxies(args)
+    proxy_pool = ProxyPool(proxies, args.proxy_strategy) if proxies else None
+
+    def factory(code: str, site: str) -> NovelSpider:
+        return create_spider(code, args, cache, None, proxy_pool, site)
+
+    worker = CrawlWorker(queue, store, factory, concurrency=args.worker_concurrency)
+    print(f"Worker {worker.worker_id} started on {args.queue}")
+    template = factory("", args.site)
+    try:
+        async with template.create_client(args.proxy) as client:
+            async with template.create_scheduler(client) as scheduler:
+                await worker.run(client, scheduler, args.exit_when_drained)
+    finally:
+        queue.close()
+        store.close()
+        if cache is not None:
+            cache.close()
+    print(
+        f"Worker {worker.worker_id} finished: "
+        f"{worker.completed} chapters, {worker.failed} failures"
+    )
+    return 0
+
+
+async def run_watch(args: argparse.Namespace) -> int:
+    """watch命令：轮询关注的小说，有更新时只获取新增或改稿的章节并导出
+    命令行中的小说编号加入关注列表，之后不指定也会继续轮询
+    :return: 退出码
+    """
+    cache: Optional[ResponseCache] = None
+    if not args.no_cache:
+        cache = ResponseCache("./data/.http_cache", cache_only=args.cache_only)
+    store = NovelStore(args.store)
+    metrics = Metrics()
+    describe_crawl_metrics(metrics)
+    proxies = read_proxies(args)
+    proxy_pool = ProxyPool(proxies, args.proxy_strategy) if proxies else None
+    watch_list = WatchList(
+        args.watch_list, args.min_interval, args.max_interval, args.initial_interval
+    )
+    added = watch_list.follow(read_codes(args), args.site)
+    print(f"Watching {len(watch_list)} novels ({added} new) in {args.watch_list}")
+
+    # 有更新时按增量更新处理，已保存的章节不重新获取
+    update_args = argparse.Namespace(**vars(args))
+    update_args.update = True
+    update_args.refetch = False
+
+    def factory(code: str, site: str) -> NovelSpider:
+        return create_spider(code, args, cache, metrics, proxy_pool, site)
+
+    async def on_change(spider: NovelSpider) -> None:
+        code = spider.resource_name
+        novel = await _crawl_novel(spider, code, store, update_args, None, metrics)
+        await asyncio.to_thread(
+            export_outputs, spider.data_root, code, novel, args, metrics
+        )
+        print(f"{code} updated: {len(novel.chapters)} chapters")
+
+    watcher = NovelWatcher(
+        watch_list,
+        factory,
+        on_change,
+        concurrency=args.poll_concurrency,
+        max_updates=args.max_novels,
+        metrics=metrics,
+    )
+    template = factory("", args.site)
+    try:
+        async with template.create_client(args.proxy) as client:
+            async with template.create_scheduler(client) as scheduler:
+                if not args.once:
+                    await watcher.run(client, scheduler)
+                results = await watcher.run_once(client, scheduler)
+    finally:
+        watch_list.close()
+        store.close()
+        if cache is not None:
+            cache.close()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+            print(f"Saved metrics to {args.metrics_json}")
+
+    changed = [r.code for r in results if r.status == POLL_CHANGED]
+    print(
+        f"Polled {len(results)} novels, "
+        f"{len(changed)} updated: {', '.join(changed) or '-'}"
+    )
+    return 0
+
+
+def create_spider(
+    code: str,
+    args: argparse.Namespace,
+    cache: Optional[ResponseCache],
+    metrics: Optional[Metrics] = None,
+    proxy_pool: Optional[ProxyPool] = None,
+    site: Optional[str] = None,
+) -> NovelSpider:
+    """创建小说对应的爬虫，数据保存在./data/{code}
+    :param site: 站点适配器名，为None时用--site
+    """
+    spider = NovelSpider(get_adapter(site or args.site))
+    spider.proxy_pool = proxy_pool
+    spider.resource_name = code
+    spider.data_root = f"./data/{code}"
+    spider.response_cache = cache
+    spider.metrics = metrics
+    return spider
+
+
+def _progress_line(
+    metrics: Metrics,
+    novel_count: int,
+    elapsed: float,
+    samples: Optional[Deque[Tuple[float, float]]],
+) -> str:
+    """进度行：已完成/已提交的章节、速度、预计剩余时间、队列长度和重试次数
+    :param metrics: 采集指标
+    :param novel_count: 小说总数
+    :param elapsed: 已用时间（秒）
+    :param samples: 最近的(时间, 完成章节数)，用于计算当前速度，为None时用平均速度
+    """
+    done = metrics.total("chapters_total")
+    submitted = metrics.total("chapters_submitted_total")
+    novels = metrics.total("novels_total")
+    if samples is not None and len(samples) >= 2:
+        (t0, d0), (t1, d1) = samples[0], samples[-1]
+        rate = (d1 - d0) / (t1 - t0) if t1 > t0 else 0.0
+    else:
+        rate = done / elapsed if elapsed > 0 else 0.0
+    remaining = submitted - done
+    if remaining <= 0:
+        eta = "-"
+    elif rate > 0:
+        eta = f"{remaining / rate:.0f}s"
+    else:
+        eta = "?"
+    failed = done - metrics.value("chapters_total", result="ok")
+    return (
+        f"novels {novels:.0f}/{novel_count} | "
+        f"chapters {done:.0f}/{submitted:.0f} ({failed:.0f} failed) | "
+        f"{rate:.1f}/s | ETA {eta} | "
+        f"queued {metrics.value('queue_depth', queue='jobs'):.0f} "
+        f"parsing {metrics.value('queue_depth', queue='pages'):.0f} | "
+        f"in flight {metrics.total('http_in_flight'):.0f} | "
+        f"retries {metrics.total('http_retries_total'):.0f} | "
+        f"{elapsed:.0f}s"
+    )
+
+
+async def _report_progress(
+    metrics: Metrics, novel_count: int, args: argparse.Namespace
+) -> None:
+    """定期在stderr显示进度，并刷新Prometheus文件"""
+    start = time.monotonic()
+    # 最近约10秒的采样，ETA按当前速度估算
+    samples: Deque[Tuple[float, float]] = deque(
+        maxlen=max(2, int(10 / max(args.progress_interval, 0.1)) + 1)
+    )
+    tty = sys.stderr.isatty()
+    while True:
+        await asyncio.sleep(args.progress_interval)
+        now = time.monotonic()
+        samples.append((now, metrics.total("chapters_total")))
+        if args.metrics_prom:
+            await asyncio.to_thread(metrics.write_prometheus, args.metrics_prom)
+        if args.no_progress:
+            continue
+        line = _progress_line(metrics, novel_count, now - start, samples)
+        if tty:
+            # 覆盖同一行
+            sys.stderr.write(f"\r\x1b[K{line}")
+        else:
+            sys.stderr.write(f"{line}\n")
+        sys.stderr.flush()
+
+
+def _write_metrics(metrics: Metrics, args: argparse.Namespace) -> None:
+    """写出最终的采集指标"""
+    if not args.no_progress and sys.stderr.isatty():
+        sys.stderr.write("\n")
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"Saved metrics to {args.metrics_json}")
+
+
+async def _crawl_novel(
+    spider: NovelSpider,
+    code: str,
+    store: NovelStore,
+    args: argparse.Namespace,
+    queue: Optional[WorkQueue] = None,
+    metrics: Optional[Metrics] = None,
+) -> CompactNovel:
+    """读取已保存的小说，需要时采集或增量更新并保存
+    章节获取完按顺序流式写入存储，完成后按需逐章读取导出，内存中不保留整部小说
+    指定任务队列时章节由工作进程获取并写入存储，本进程等待完成后从存储读取
+    """
+    # 目录不存在则创建
+    if not os.path.exists(spider.data_root):
+        os.makedirs(spider.data_root)
+
+    novel_path = os.path.join(spider.data_root, f"{code}.json")
+    saved = False
+    if not args.refetch:
+        saved = store.has_novel(code)
+        if saved and not args.update:
+            # 只导出时按需逐章读取，不加载整部小说
+            print(f"Load novel from {store.path}")
+            compact = store.load_compact(code)
+            if compact is not None:
+                return compact
+        if not saved and os.path.exists(novel_path):
+            # 旧版本保存的json，导入到存储中
+            print(f"Migrate novel from {novel_path}")
+            store.migrate_json(code, novel_path)
+            saved = True
+
+    if queue is not None:
+        plan = await enqueue_novel(spider, store, queue, refetch=args.refetch)
+        print(f"Queued {len(plan.entries)} chapters of {code}")
+        failed = await wait_for_novel(queue, code, metrics=metrics)
+        if failed:
+            raise Exception(f"Failed to get chapters: {list(failed)}")
+        await finish_novel(store, code, plan)
+    else:
+        action = "Update" if saved else "Get"
+        print(f"{action} novel from {spider.resource_name}")
+        plan = await spider.stream_novel(store, refetch=args.refetch, proxy=args.proxy)
+        print(f"Saved {len(plan.entries)} fetched chapters of {code} to {store.path}")
+        spider.clear_journal()
+
+    compact = store.load_compact(code)
+    if compact is None:
+        raise Exception(f"Novel not found in store: {code}")
+    if args.save_json:
+        with io.open(novel_path, "w", encoding="utf-8") as f:
+            write_novel_json(compact, f)
+    return compact
@@ -0,0 +1,253 @@
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    from novel_spiders.entities.novel import Chapter, ChapterContent, Novel
+
+# 紧凑的内存表示，用于导出等只读的热点路径
+# 与Novel/Chapter/ChapterContent的属性名一致，导出函数可直接使用
+# 只在接口边界（爬虫、保存）与pydantic模型互相转换，pydantic在转换时才导入
+
+
+class ContentLine(NamedTuple):
+    """遍历LineTable时生成的一行，属性同ChapterContent"""
+
+    key: str
+    content: str
+
+
+class LineTable:
+    """章节内容行表，key和内容分别存为两个列表，不为每行创建对象"""
+
+    __slots__ = ("keys", "texts")
+
+    def __init__(
+        self, keys: Optional[List[str]] = None, texts: Optional[List[str]] = None
+    ):
+        """
+        :param keys: 行的key列表
+        :param texts: 行的内容列表，长度与keys一致
+        """
+        self.keys: List[str] = [] if keys is None else keys
+        self.texts: List[str] = [] if texts is None else texts
+
+    @classmethod
+    def from_contents(cls, contents: Iterable["ChapterContent"]) -> "LineTable":
+        """从ChapterContent列表创建"""
+        table = cls()
+        for content in contents:
+            table.keys.append(content.key)
+            table.texts.append(content.content)
+        return table
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Sequence[str]]) -> "LineTable":
+        """从[key, 内容]对的列表创建"""
+        table = cls()
+        for key, text in pairs:
+            table.keys.append(key)
+            table.texts.append(text)
+        return table
+
+    def to_contents(self) -> List["ChapterContent"]:
+        """转换为ChapterContent列表"""
+        from novel_spiders.entities.novel import ChapterContent
+
+        return [
+            ChapterContent(key=key, content=text)
+            for key, text in zip(self.keys, self.texts)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[ContentLine]:
+        return map(ContentLine, self.keys, self.texts)
+
+    def __getitem__(self, i: int) -> ContentLine:
+        return ContentLine(self.keys[i], self.texts[i])
+
+
+class CompactChapter:
+    """紧凑章节"""
+
+    __slots__ = (
+        "index",
+        "title",
+        "ep_title",
+        "updated_at",
+        "prepend_contents",
+        "contents",
+        "append_contents",
+    )
+
+    def __init__(
+        self,
+        index: int,
+        title: str,
+        ep_title: str,
+        prepend_contents: LineTable,
+        contents: LineTable,
+        append_contents: LineTable,
+        updated_at: str = "",
+    ):
+        self.index = index
+        self.title = title
+        self.ep_title = ep_title
+        self.prepend_contents = prepend_contents
+        self.contents = contents
+        self.append_contents = append_contents
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_chapter(cls, chapter: "Chapter") -> "CompactChapter":
+        """从pydantic章节对象转换"""
+        return cls(
+            index=chapter.index,
+            title=chapter.title,
+            ep_title=chapter.ep_title,
+            prepend_contents=LineTable.from_contents(chapter.prepend_contents),
+            contents=LineTable.from_contents(chapter.contents),
+            append_contents=LineTable.from_contents(chapter.append_contents),
+            updated_at=chapter.updated_at,
+        )
+
+    def to_chapter(self) -> "Chapter":
+        """转换为pydantic章节对象"""
+        from novel_spiders.entities.novel import Chapter
+
+        return Chapter(
+            index=self.index,
+            title=self.title,
+            ep_title=self.ep_title,
+            prepend_contents=self.prepend_contents.to_contents(),
+            contents=self.contents.to_contents(),
+            append_contents=self.append_contents.to_contents(),
+            updated_at=self.updated_at,
+        )
+
+
+class LazyChapters(Sequence[CompactChapter]):
+    """按需加载的章节序列，按位置访问，顺序与章节索引列表一致"""
+
+    __slots__ = ("_indexes", "_loader", "_cache")
+
+    def __init__(
+        self,
+        indexes: List[int],
+        loader: Callable[[int], CompactChapter],
+        keep_loaded: bool = False,
+    ):
+        """
+        :param indexes: 章节索引列表
+        :param loader: 按章节索引加载章节的函数
+        :param keep_loaded: 是否保留已加载的章节，为False时每次访问都重新加载，内存只占当前章节
+        """
+        self._indexes = indexes
+        self._loader = loader
+        self._cache: Optional[Dict[int, CompactChapter]] = {} if keep_loaded else None
+
+    @property
+    def indexes(self) -> List[int]:
+        """章节索引列表"""
+        return self._indexes
+
+    def get(self, index: int) -> CompactChapter:
+        """按章节索引获取"""
+        if self._cache is None:
+            return self._loader(index)
+        chapter = self._cache.get(index)
+        if chapter is None:
+            chapter = self._loader(index)
+            self._cache[index] = chapter
+        return chapter
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __getitem__(self, pos):  # type: ignore[override]
+        if isinstance(pos, slice):
+            return [self.get(index) for index in self._indexes[pos]]
+        return self.get(self._indexes[pos])
+
+    def __iter__(self) -> Iterator[CompactChapter]:
+        for index in self._indexes:
+            yield self.get(index)
+
+
+class CompactNovel:
+    """紧凑小说，章节可以是列表，也可以是LazyChapters"""
+
+    __slots__ = ("title", "description", "author", "chapters")
+
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        author: str,
+        chapters: Sequence[CompactChapter],
+    ):
+        self.title = title
+        self.description = description
+        self.author = author
+        self.chapters = chapters
+
+    @classmethod
+    def from_novel(cls, novel: "Novel") -> "CompactNovel":
+        """从pydantic小说对象转换"""
+        return cls(
+            title=novel.title,
+            description=novel.description,
+            author=novel.author,
+            chapters=[CompactChapter.from_chapter(c) for c in novel.chapters],
+        )
+
+    def to_novel(self) -> "Novel":
+        """转换为pydantic小说对象，会加载所有章节"""
+        from novel_spiders.entities.novel import Novel
+
+        return Novel(
+            title=self.title,
+            description=self.description,
+            author=self.author,
+            chapters=[c.to_chapter() for c in self.chapters],
+        )
+
+
+def compact_chapter_from_pairs(
+    index: int,
+    title: str,
+    ep_title: str,
+    updated_at: str,
+    sections: Tuple[
+        Iterable[Sequence[str]], Iterable[Sequence[str]], Iterable[Sequence[str]]
+    ],
+) -> CompactChapter:
+    """从章前、本体、章后三段[key, 内容]对创建紧凑章节，不经过pydantic校验
+    :param index: 章节索引
+    :param title: 章节标题
+    :param ep_title: 大章节标题
+    :param updated_at: 更新时间
+    :param sections: 章前、本体、章后
+    :return: 紧凑章节
+    """
+    prepend, contents, append = sections
+    return CompactChapter(
+        index=index,
+        title=title,
+        ep_title=ep_title,
+        prepend_contents=LineTable.from_pairs(prepend),
+        contents=LineTable.from_pairs(contents),
+        append_contents=LineTable.from_pairs(append),
+        updated_at=updated_at,
+    )
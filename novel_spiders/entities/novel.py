@@ -18,6 +18,8 @@ class Chapter(BaseModel):
     prepend_contents: List[ChapterContent]
     contents: List[ChapterContent]
     append_contents: List[ChapterContent]
+    # 目录中的最后更新时间（有改稿时为改稿时间），旧数据为空
+    updated_at: str = ""
 
 
 class Novel(BaseModel):
@@ -27,3 +29,15 @@ class Novel(BaseModel):
     description: str
     author: str
     chapters: List[Chapter]
+
+
+class TocEntry(BaseModel):
+    """目录中的一个章节"""
+
+    index: int
+    url: str
+    title: str = ""
+    # 所属的章（目录中的章标题），没有分章时为空
+    ep_title: str = ""
+    # 最后更新时间（有改稿时为改稿时间）
+    updated_at: str = ""
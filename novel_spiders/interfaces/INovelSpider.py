@@ -25,13 +25,13 @@ class INovelSpider(ABC):
 
     @property
     def asset_dir(self) -> str:
-        """Aeest文件夹路径"""
-        return self._aeest_dir
+        """Asset文件夹路径"""
+        return self._asset_dir
 
     @asset_dir.setter
     def asset_dir(self, value: str) -> None:
-        """设置Aeest文件夹路径"""
-        self._aeest_dir = value
+        """设置Asset文件夹路径"""
+        self._asset_dir = value
 
     @property
     def data_root(self) -> str:
@@ -47,3 +47,11 @@ class INovelSpider(ABC):
     async def get_novel(self, proxy: str = "") -> Novel:
         """获取小说内容"""
         pass
+
+    @abstractmethod
+    async def update_novel(self, novel: Novel, proxy: str = "") -> Novel:
+        """增量更新已保存的小说，只获取新增或改稿的章节
+        :param novel: 已保存的小说对象
+        :return: 合并后的小说对象
+        """
+        pass
@@ -0,0 +1,107 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+from novel_spiders.entities.novel import TocEntry
+from novel_spiders.parsers.syosetu_chapter_parser import ParsedChapter
+from novel_spiders.utils.requests_helper import DEFAULT_USER_AGENT
+
+
+class NovelInfo(NamedTuple):
+    """作品信息页的解析结果"""
+
+    title: str
+    author: str
+    description: str
+    # 章节数，目录为空时按1..N获取，不知道时为0
+    chapter_count: int = 0
+    # 最后发布或更新的时间（原文），有新章节或改稿时变化，没有时为空
+    updated_at: str = ""
+
+
+class TocPage(NamedTuple):
+    """解析出的一页目录"""
+
+    # 本页的章节，本页中没有章标题在前的章节ep_title为空
+    entries: List[TocEntry]
+    # 本页最后一个章标题，之后各页开头的章节属于该章
+    last_ep_title: str = ""
+    # 下一页和最后一页的相对网址
+    next_href: Optional[str] = None
+    last_href: Optional[str] = None
+
+
+class ISiteAdapter(ABC):
+    """站点适配器，只负责网址拼接和网页解析
+    获取、调度、限流、缓存和保存由NovelSpider统一处理
+    适配器会随章节任务传给解析子进程，需可pickle
+    """
+
+    # 注册名，见novel_spiders.adapters.registry
+    name: str = ""
+    # 所有请求附带的cookies和请求头
+    COOKIES: Dict[str, str] = {}
+    HEADERS: Dict[str, str] = {"User-Agent": DEFAULT_USER_AGENT}
+    # 章节页中没有大章节标题时使用
+    DEFAULT_EP = "小说正文"
+
+    @abstractmethod
+    def info_url(self, code: str) -> str:
+        """作品信息页网址"""
+        pass
+
+    @abstractmethod
+    def toc_url(self, code: str) -> str:
+        """目录第一页网址"""
+        pass
+
+    @abstractmethod
+    def chapter_url(self, code: str, index: int) -> str:
+        """章节页网址，目录为空时用于按章节数拼接"""
+        pass
+
+    @abstractmethod
+    def parse_info(self, html: str) -> NovelInfo:
+        """解析作品信息页"""
+        pass
+
+    @abstractmethod
+    def parse_toc_page(self, html: str, url: str) -> TocPage:
+        """解析一页目录
+        :param html: 网页内容
+        :param url: 目录页网址，用于补全章节网址
+        """
+        pass
+
+    @abstractmethod
+    def parse_chapter(self, html: str, backend: str) -> ParsedChapter:
+        """解析章节页，在解析子进程中调用
+        :param html: 网页内容
+        :param backend: 解析器名称
+        """
+        pass
+
+    def health_url(self) -> str:
+        """检查代理健康状态时请求的网址，为空时不主动检查"""
+        return ""
+
+    def check_parser_backend(self, backend: str) -> None:
+        """检查解析器名称，不支持时抛出ValueError"""
+        pass
+
+    def toc_page_url(self, url: str, page: int) -> str:
+        """目录第page页的网址，默认在最后一页的网址上改?p=page
+        :param url: 最后一页的网址
+        :param page: 页码
+        """
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        query["p"] = [str(page)]
+        return urlunsplit(parts._replace(query=urlencode(query, doseq=True)))
+
+    def toc_page_number(self, url: str) -> int:
+        """目录页网址的页码（?p=page），没有时为0"""
+        try:
+            return int(parse_qs(urlsplit(url).query).get("p", ["0"])[0])
+        except ValueError:
+            return 0
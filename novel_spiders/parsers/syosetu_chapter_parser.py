@@ -0,0 +1,334 @@
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+import re
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+PREPEND_PATTERN = re.compile(r"Lp\d+")
+BODY_PATTERN = re.compile(r"L\d+")
+APPEND_PATTERN = re.compile(r"La\d+")
+
+
+@dataclass
+class ParsedLine:
+    """章节中的一行（一个<p id=...>）"""
+
+    key: str
+    text: str
+    # 行内第一个<a>中有<img>时为图片行，text为空
+    img_src: Optional[str] = None
+    img_alt: str = ""
+
+
+@dataclass
+class ParsedChapter:
+    """章节页解析结果，不含图片下载等副作用"""
+
+    # 大章节标题，页面中没有时为None
+    ep_title: Optional[str]
+    title: str
+    prepend: List[ParsedLine] = field(default_factory=list)
+    contents: List[ParsedLine] = field(default_factory=list)
+    append: List[ParsedLine] = field(default_factory=list)
+
+
+ChapterParser = Callable[[str], ParsedChapter]
+
+
+def parse_chapter_soup(html: str) -> ParsedChapter:
+    """用BeautifulSoup解析章节页，作为其他解析器的参照实现
+    :param html: 网页内容
+    :return: 解析结果
+    """
+    # 只有这个参照实现用到bs4，使用时才导入
+    from bs4 import BeautifulSoup
+    from bs4.element import Tag
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # 大章节标题
+    ep_span = soup.select_one(".c-announce > span:not([class])")
+    ep = None if ep_span is None else ep_span.text.strip()
+
+    article_tag = soup.find("article", class_="p-novel")
+    if not isinstance(article_tag, Tag):
+        raise Exception("Failed to get article tag")
+    title_tag = article_tag.find("h1", class_="p-novel__title")
+    title = "" if title_tag is None else title_tag.text.strip()
+
+    return ParsedChapter(
+        ep_title=ep,
+        title=title,
+        prepend=_get_soup_lines(soup, PREPEND_PATTERN),
+        contents=_get_soup_lines(soup, BODY_PATTERN),
+        append=_get_soup_lines(soup, APPEND_PATTERN),
+    )
+
+
+def _get_soup_lines(
+    soup: "BeautifulSoup", pattern: re.Pattern[str]
+) -> List[ParsedLine]:
+    """获取章节中的指定内容（章前、本体、章后）
+    :param soup: 网页内容
+    :param pattern: 正则表达式，筛选内容用
+    """
+    lines = []
+    for content in soup.find_all("p", id=pattern):
+        img_tag_a = content.find("a")
+        if img_tag_a and img_tag_a.find("img"):
+            img_tag = img_tag_a.find("img")
+            lines.append(
+                ParsedLine(
+                    key=content["id"],
+                    text="",
+                    img_src=img_tag.get("src", ""),
+                    img_alt=img_tag.get("alt", ""),
+                )
+            )
+        else:
+            lines.append(ParsedLine(key=content["id"], text=content.text))
+    return lines
+
+
+# 没有结束标签的元素，不入栈
+_VOID_TAGS = frozenset(
+    {
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "source",
+        "track",
+        "wbr",
+    }
+)
+
+
+# 内容不计入文本的元素，与BeautifulSoup的get_text一致（振假名、脚本等）
+_NON_TEXT_TAGS = frozenset({"rp", "rt", "script", "style", "template"})
+
+
+class _OpenLine:
+    """正在收集的一行，行内可以嵌套其他行（<p>中的<p>），各自收集"""
+
+    __slots__ = ("line", "depth", "text", "img", "a_state", "a_depth")
+
+    def __init__(self, line: ParsedLine, depth: int):
+        """
+        :param line: 已按出现顺序加入结果的行，结束时填入内容
+        :param depth: <p>在元素栈中的深度，栈短于此时该行结束
+        """
+        self.line = line
+        self.depth = depth
+        self.text: List[str] = []
+        self.img: Optional[Dict[str, str]] = None
+        # 行内第一个<a>：0未遇到，1在其中，2已结束
+        self.a_state = 0
+        self.a_depth = 0
+
+
+class _ChapterTokenizer(HTMLParser):
+    """单次遍历章节页，边读边把<p id=...>分到章前、本体、章后，不构建文档树"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.result = ParsedChapter(ep_title=None, title="")
+        self.has_article = False
+        self._article_open = False
+        self._article_depth = 0
+        # 已打开元素的(标签名, class列表)
+        self._stack: List[Tuple[str, List[str]]] = []
+        # 当前所在的_NON_TEXT_TAGS层数
+        self._non_text_depth = 0
+
+        # 大章节标题
+        self._ep_depth = 0
+        self._ep_text: List[str] = []
+        # 章节标题
+        self._title_found = False
+        self._title_depth = 0
+        self._title_text: List[str] = []
+        # 正在收集的行，外层在前
+        self._lines: List[_OpenLine] = []
+
+    def handle_starttag(self, tag, attrs):
+        attr_dict = {k: "" if v is None else v for k, v in attrs}
+        classes = attr_dict.get("class", "").split()
+
+        for line in self._lines:
+            self._line_starttag(line, tag, attr_dict)
+        if tag == "p":
+            self._try_start_line(attr_dict)
+
+        if self._ep_depth:
+            if tag == "span":
+                self._ep_depth += 1
+        elif (
+            self.result.ep_title is None
+            and tag == "span"
+            and "class" not in attr_dict
+            and self._stack
+            and "c-announce" in self._stack[-1][1]
+        ):
+            self._ep_depth = 1
+
+        if self._title_depth:
+            if tag == "h1":
+                self._title_depth += 1
+        elif tag == "article" and not self.has_article and "p-novel" in classes:
+            self.has_article = True
+            self._article_open = True
+            self._article_depth = len(self._stack) + 1
+        elif (
+            tag == "h1"
+            and not self._title_found
+            and self._article_open
+            and "p-novel__title" in classes
+        ):
+            self._title_found = True
+            self._title_depth = 1
+
+        if tag not in _VOID_TAGS:
+            self._stack.append((tag, classes))
+            if tag in _NON_TEXT_TAGS:
+                self._non_text_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>、<img/>等自闭合写法，不入栈
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._ep_depth and tag == "span":
+            self._ep_depth -= 1
+            if self._ep_depth == 0:
+                self.result.ep_title = "".join(self._ep_text).strip()
+
+        if self._title_depth and tag == "h1":
+            self._title_depth -= 1
+            if self._title_depth == 0:
+                self.result.title = "".join(self._title_text).strip()
+
+        # 弹出到对应的开始标签，容忍未闭合的元素
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for name, _ in self._stack[i:]:
+                    if name in _NON_TEXT_TAGS:
+                        self._non_text_depth -= 1
+                del self._stack[i:]
+                break
+        if self._article_open and len(self._stack) < self._article_depth:
+            self._article_open = False
+        if self._lines:
+            self._close_lines()
+
+    def handle_data(self, data):
+        if self._non_text_depth:
+            return
+        for line in self._lines:
+            line.text.append(data)
+        if self._ep_depth:
+            self._ep_text.append(data)
+        if self._title_depth:
+            self._title_text.append(data)
+
+    def unknown_decl(self, data):
+        # BeautifulSoup把CDATA的内容也计入文本
+        if data.upper().startswith("CDATA["):
+            self.handle_data(data[len("CDATA[") :])
+
+    def close(self):
+        super().close()
+        # 文档结束时仍未闭合的元素
+        for line in self._lines:
+            self._finish_line(line)
+        self._lines = []
+        if self._ep_depth:
+            self.result.ep_title = "".join(self._ep_text).strip()
+        if self._title_depth:
+            self.result.title = "".join(self._title_text).strip()
+
+    def _try_start_line(self, attrs: Dict[str, str]) -> None:
+        """<p>的id匹配章前、本体、章后任一规则时开始收集该行"""
+        key = attrs.get("id")
+        if key is None:
+            return
+        targets = []
+        if PREPEND_PATTERN.search(key):
+            targets.append(self.result.prepend)
+        if BODY_PATTERN.search(key):
+            targets.append(self.result.contents)
+        if APPEND_PATTERN.search(key):
+            targets.append(self.result.append)
+        if not targets:
+            return
+        # 按开始标签的顺序加入结果，与BeautifulSoup的find_all一致，内容在结束时填入
+        line = ParsedLine(key=key, text="")
+        for target in targets:
+            target.append(line)
+        self._lines.append(_OpenLine(line, len(self._stack) + 1))
+
+    def _line_starttag(self, line: _OpenLine, tag: str, attrs: Dict[str, str]) -> None:
+        if tag == "a" and line.a_state == 0:
+            line.a_state = 1
+            line.a_depth = len(self._stack) + 1
+        elif tag == "img" and line.a_state == 1 and line.img is None:
+            line.img = attrs
+
+    def _close_lines(self) -> None:
+        """元素栈弹出后，结束已关闭的<a>和行"""
+        depth = len(self._stack)
+        for line in self._lines:
+            if line.a_state == 1 and depth < line.a_depth:
+                line.a_state = 2
+        while self._lines and depth < self._lines[-1].depth:
+            self._finish_line(self._lines.pop())
+
+    def _finish_line(self, open_line: _OpenLine) -> None:
+        line = open_line.line
+        if open_line.img is not None:
+            line.img_src = open_line.img.get("src", "")
+            line.img_alt = open_line.img.get("alt", "")
+        else:
+            line.text = "".join(open_line.text)
+
+
+def parse_chapter_streaming(html: str) -> ParsedChapter:
+    """单次遍历解析章节页，结果与parse_chapter_soup一致
+    :param html: 网页内容
+    :return: 解析结果
+    """
+    tokenizer = _ChapterTokenizer()
+    tokenizer.feed(html)
+    tokenizer.close()
+    if not tokenizer.has_article:
+        raise Exception("Failed to get article tag")
+    return tokenizer.result
+
+
+PARSER_BACKENDS: Dict[str, ChapterParser] = {
+    "soup": parse_chapter_soup,
+    "streaming": parse_chapter_streaming,
+}
+
+
+def get_chapter_parser(name: str) -> ChapterParser:
+    """按名称获取章节解析器
+    :param name: 解析器名称，见PARSER_BACKENDS
+    :return: 解析函数
+    """
+    parser = PARSER_BACKENDS.get(name)
+    if parser is None:
+        raise ValueError(
+            f"Unknown parser backend: {name}, available: {list(PARSER_BACKENDS)}"
+        )
+    return parser
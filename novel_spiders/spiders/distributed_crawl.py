@@ -0,0 +1,224 @@
+from typing import Callable, Dict, Optional, Set, Tuple
+import asyncio
+import os
+import socket
+
+from novel_spiders.spiders.novel_spider import CrawlPlan, NovelSpider
+from novel_spiders.utils.crawl_scheduler import CrawlScheduler
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+from novel_spiders.utils.work_queue import (
+    TASK_LEASED,
+    TASK_PENDING,
+    WorkQueue,
+    WorkTask,
+)
+
+# 按(小说编号, 站点适配器名)创建爬虫
+SpiderFactory = Callable[[str, str], NovelSpider]
+
+
+def default_worker_id() -> str:
+    """工作进程标识：主机名和进程号"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def enqueue_novel(
+    spider: NovelSpider,
+    store: NovelStore,
+    queue: WorkQueue,
+    refetch: bool = False,
+) -> CrawlPlan:
+    """协调者：获取作品信息和目录，把需要获取的章节加入队列
+    已写入存储且目录中更新时间未变的章节不加入，协调者中断后重新加入时从已写入的章节继续，
+    小说信息在所有章节完成后由finish_novel保存
+    :param spider: 小说对应的爬虫
+    :param store: 工作进程写入章节的存储
+    :param queue: 任务队列
+    :param refetch: 是否忽略已保存的章节全部重新获取
+    :return: 采集计划
+    """
+    code = spider.resource_name
+    versions = {} if refetch else await asyncio.to_thread(store.chapter_versions, code)
+    plan = await spider.plan_crawl(versions=versions)
+    missing = plan.missing_versions(versions)
+    if missing:
+        await asyncio.to_thread(store.set_chapter_versions, code, missing)
+    await asyncio.to_thread(queue.enqueue, code, spider.adapter.name, plan.entries)
+    return plan
+
+
+async def finish_novel(store: NovelStore, code: str, plan: CrawlPlan) -> None:
+    """协调者：所有章节完成后保存小说信息，删除目录中已不存在的章节
+    有章节失败时不应调用，否则未写完的小说会被当作已保存
+    :param store: 小说存储
+    :param code: 小说编号
+    :param plan: enqueue_novel返回的采集计划
+    """
+    info = plan.info
+    await asyncio.to_thread(
+        store.finish_novel,
+        code,
+        info.title,
+        info.description,
+        info.author,
+        [e.index for e in plan.manifest],
+    )
+
+
+async def wait_for_novel(
+    queue: WorkQueue,
+    code: str,
+    poll_interval: float = 1.0,
+    metrics: Optional[Metrics] = None,
+) -> Dict[int, str]:
+    """协调者：等待小说的所有任务完成或失败
+    :param queue: 任务队列
+    :param code: 小说编号
+    :param poll_interval: 检查间隔（秒）
+    :param metrics: 采集指标，记录队列中各状态的任务数
+    :return: 失败的章节索引到错误信息
+    """
+    while True:
+        counts = await asyncio.to_thread(queue.counts, code)
+        if metrics is not None:
+            for state, count in counts.items():
+                metrics.set("work_queue_tasks", count, code=code, state=state)
+        if counts[TASK_PENDING] == 0 and counts[TASK_LEASED] == 0:
+            return await asyncio.to_thread(queue.failed, code)
+        await asyncio.sleep(poll_interval)
+
+
+class CrawlWorker:
+    """工作进程：从队列租用章节任务，获取后写入存储
+    所有小说共用一个HTTP客户端和章节调度器，同时处理的任务数由concurrency限制，
+    处理中的任务定期续租，进程退出或崩溃后未完成的任务租期过后由其他工作进程处理
+
+    用法：
+        worker = CrawlWorker(queue, store, factory)
+        async with client, scheduler:
+            await worker.run(client, scheduler)
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        store: NovelStore,
+        spider_factory: SpiderFactory,
+        worker_id: Optional[str] = None,
+        concurrency: int = 8,
+        poll_interval: float = 1.0,
+    ):
+        """
+        :param queue: 任务队列
+        :param store: 章节写入的存储，小说信息由协调者在所有章节完成后保存
+        :param spider_factory: 按(小说编号, 站点适配器名)创建爬虫
+        :param worker_id: 工作进程标识，为None时用主机名和进程号
+        :param concurrency: 同时处理的任务数
+        :param poll_interval: 队列为空时的检查间隔（秒）
+        """
+        self.queue = queue
+        self.store = store
+        self.spider_factory = spider_factory
+        self.worker_id = worker_id or default_worker_id()
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.failed = 0
+        self._spiders: Dict[Tuple[str, str], NovelSpider] = {}
+        self._leased: Dict[int, WorkTask] = {}
+
+    def _spider(
+        self, task: WorkTask, client: AsyncHttpClient, scheduler: CrawlScheduler
+    ) -> NovelSpider:
+        key = (task.code, task.site)
+        spider = self._spiders.get(key)
+        if spider is None:
+            spider = self.spider_factory(task.code, task.site)
+            spider.client = client
+            spider.scheduler = scheduler
+            os.makedirs(spider.data_root, exist_ok=True)
+            self._spiders[key] = spider
+        return spider
+
+    async def _process(
+        self, task: WorkTask, client: AsyncHttpClient, scheduler: CrawlScheduler
+    ) -> None:
+        """处理一个任务，出错时交回队列重试"""
+        try:
+            spider = self._spider(task, client, scheduler)
+            chapter = await spider.fetch_chapter(task.entry)
+            if chapter is None:
+                raise Exception(f"Failed to get chapter {task.entry.index}")
+            await asyncio.to_thread(self.store.put_chapters, task.code, [chapter])
+        except Exception as e:
+            self.failed += 1
+            print(f"Error: {task.code} chapter {task.entry.index}: {e}")
+            await asyncio.to_thread(self.queue.fail, self.worker_id, task, str(e))
+        else:
+            self.completed += 1
+            await asyncio.to_thread(self.queue.complete, self.worker_id, task)
+        finally:
+            self._leased.pop(task.id, None)
+
+    async def _heartbeat(self) -> None:
+        """每隔租期的三分之一续租处理中的任务"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if self._leased:
+                tasks = list(self._leased.values())
+                await asyncio.to_thread(self.queue.extend, self.worker_id, tasks)
+
+    async def _drained(self) -> bool:
+        """协调者已关闭队列，且没有待处理和处理中的任务"""
+        if not await asyncio.to_thread(lambda: self.queue.closed):
+            return False
+        counts = await asyncio.to_thread(self.queue.counts)
+        return counts[TASK_PENDING] == 0 and counts[TASK_LEASED] == 0
+
+    async def run(
+        self,
+        client: AsyncHttpClient,
+        scheduler: CrawlScheduler,
+        stop_when_drained: bool = True,
+    ) -> int:
+        """处理任务直到队列关闭且处理完毕（或被取消）
+        :param client: 共用的HTTP客户端
+        :param scheduler: 共用的章节调度器
+        :param stop_when_drained: 队列关闭且没有剩余任务时退出，为False时一直等待新任务
+        :return: 完成的任务数
+        """
+        running: Set[asyncio.Task] = set()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while True:
+                free = self.concurrency - len(running)
+                tasks = []
+                if free > 0:
+                    tasks = await asyncio.to_thread(
+                        self.queue.lease, self.worker_id, free
+                    )
+                for task in tasks:
+                    self._leased[task.id] = task
+                    running.add(
+                        asyncio.create_task(self._process(task, client, scheduler))
+                    )
+                if running:
+                    # 有任务完成或到检查间隔时再租用
+                    done, running = await asyncio.wait(
+                        running,
+                        timeout=self.poll_interval if free > len(tasks) else None,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    for finished in done:
+                        finished.result()
+                    continue
+                if stop_when_drained and await self._drained():
+                    return self.completed
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            heartbeat.cancel()
+            for pending in running:
+                pending.cancel()
+            await asyncio.gather(heartbeat, *running, return_exceptions=True)
@@ -0,0 +1,713 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urljoin
+import asyncio
+import os
+
+from novel_spiders.entities.novel import Novel, Chapter, ChapterContent, TocEntry
+from novel_spiders.interfaces.INovelSpider import INovelSpider
+from novel_spiders.interfaces.ISiteAdapter import ISiteAdapter, NovelInfo, TocPage
+from novel_spiders.parsers.syosetu_chapter_parser import ParsedLine
+from novel_spiders.utils.chapter_journal import ChapterJournal
+from novel_spiders.utils.chapter_sink import OrderedChapterSink
+from novel_spiders.utils.crawl_scheduler import ChapterJob, CrawlScheduler
+from novel_spiders.utils.image_downloader import ImageTask
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.proxy_pool import ProxyPool
+from novel_spiders.utils.rate_limiter import RateLimitConfig, backoff_delay
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+from novel_spiders.utils.response_cache import ResponseCache
+
+
+class _ParseContext(NamedTuple):
+    """解析章节所需的参数，可传给解析子进程"""
+
+    adapter: ISiteAdapter
+    backend: str
+    resource_name: str
+    data_root: str
+    asset_dir: str
+    default_ep: str
+
+
+def _parse_chapter(
+    html: str, ch_num: int, ctx: _ParseContext
+) -> Tuple[Chapter, List[ImageTask]]:
+    """解析单章内容，模块级函数以便在进程池中运行
+    :param html: 网页内容
+    :param ch_num: 章节号
+    :param ctx: 解析参数
+    :return: 章节对象、待下载的图片
+    """
+    parsed = ctx.adapter.parse_chapter(html, ctx.backend)
+
+    images: List[ImageTask] = []
+    chapter = Chapter(
+        index=ch_num,
+        title=parsed.title,
+        ep_title=ctx.default_ep if parsed.ep_title is None else parsed.ep_title,
+        prepend_contents=_get_chapter_body(parsed.prepend, ch_num, ctx, images),
+        contents=_get_chapter_body(parsed.contents, ch_num, ctx, images),
+        append_contents=_get_chapter_body(parsed.append, ch_num, ctx, images),
+    )
+    return chapter, images
+
+
+def _get_chapter_body(
+    lines: List[ParsedLine],
+    ch_num: int,
+    ctx: _ParseContext,
+    images: List[ImageTask],
+) -> List[ChapterContent]:
+    """将解析出的行转换为章节内容（章前、本体、章后）
+    :param lines: 解析出的行
+    :param ch_num: 章节号
+    :param ctx: 解析参数
+    :param images: 收集本地不存在、需要下载的图片
+    """
+    ccs = []
+
+    for line in lines:
+        if line.img_src is not None:
+            img_src = line.img_src
+            img_alt = line.img_alt
+            if not img_src.startswith("http"):
+                img_src = f"https:{img_src}"
+            img_ext = "jpg"
+            img_name = f"{ctx.resource_name}-ch{ch_num}-{line.key}.{img_ext}"
+            if not img_alt.strip():
+                img_alt = img_name
+            img_path = os.path.join(ctx.data_root, ctx.asset_dir, "imgs", img_name)
+            relative_path = os.path.join(ctx.asset_dir, "imgs", img_name)
+            cc = ChapterContent(
+                key=line.key,
+                content=f"img: ![{img_alt}]({relative_path})",
+            )
+            ccs.append(cc)
+            # 图片存在时不重复下载
+            if not os.path.exists(img_path):
+                images.append(ImageTask(cc, img_src, img_path, img_alt))
+        else:
+            ccs.append(ChapterContent(key=line.key, content=line.text))
+
+    return ccs
+
+
+class CrawlPlan(NamedTuple):
+    """一次采集的计划：作品信息、章节清单和需要获取的章节"""
+
+    info: NovelInfo
+    manifest: List[TocEntry]
+    entries: List[TocEntry]
+
+    def merge(
+        self, existing: Dict[int, Chapter], chapters: Dict[int, Chapter]
+    ) -> Novel:
+        """合并已保存的章节和新获取的章节，只保留目录中仍存在的章节
+        :param existing: 已保存的章节
+        :param chapters: 新获取的章节
+        :return: 小说对象
+        """
+        merged = dict(existing)
+        merged.update(chapters)
+        indexes = {entry.index for entry in self.manifest}
+        return Novel(
+            title=self.info.title,
+            description=self.info.description,
+            author=self.info.author,
+            chapters=sorted(
+                (c for c in merged.values() if c.index in indexes),
+                key=lambda c: c.index,
+            ),
+        )
+
+    def missing_versions(self, versions: Dict[int, str]) -> Dict[int, str]:
+        """已保存但没有更新时间的旧章节在目录中的更新时间，视为未改动，只需补上时间
+        :param versions: 已保存章节的索引到更新时间
+        :return: 章节索引到目录中的更新时间
+        """
+        return {
+            entry.index: entry.updated_at
+            for entry in self.manifest
+            if entry.updated_at and versions.get(entry.index) == ""
+        }
+
+
+class NovelSpider(INovelSpider):
+    """通用的小说爬虫，负责获取、调度、限流、缓存和断点日志
+    站点相关的网址和解析由适配器提供，见novel_spiders.adapters.registry
+
+    用法：
+        spider = NovelSpider(get_adapter("syosetu18"))
+        spider.resource_name = "n0000aa"
+        novel = await spider.get_novel()
+    """
+
+    PROXY_URL = "socks5://127.0.0.1:8866"
+
+    def __init__(self, adapter: ISiteAdapter):
+        """
+        :param adapter: 站点适配器
+        """
+        self._adapter = adapter
+        self._resource_name = adapter.name
+        self._headless = False
+        self._asset_dir = "assets"
+        self._current_proxy = ""
+        self._data_root = "."
+        self._max_concurrency = 5
+        self._http2 = True
+        self._rate_limit = RateLimitConfig()
+        self._use_journal = True
+        self._chapter_retry_rounds = 2
+        self._response_cache: Optional[ResponseCache] = None
+        self._parser_backend = "streaming"
+        self._parse_workers: Optional[int] = None
+        self._parse_queue_size = 0
+        self._image_concurrency = 4
+        self._metrics: Optional[Metrics] = None
+        self._proxy_pool: Optional[ProxyPool] = None
+        self._client: Optional[AsyncHttpClient] = None
+        self._scheduler: Optional[CrawlScheduler] = None
+
+    @property
+    def adapter(self) -> ISiteAdapter:
+        """站点适配器"""
+        return self._adapter
+
+    @adapter.setter
+    def adapter(self, value: ISiteAdapter) -> None:
+        """设置站点适配器"""
+        self._adapter = value
+
+    @property
+    def max_concurrency(self) -> int:
+        """最大并发请求数（连接池大小），自适应并发不会超过此值"""
+        return self._max_concurrency
+
+    @max_concurrency.setter
+    def max_concurrency(self, value: int) -> None:
+        """设置最大并发请求数"""
+        self._max_concurrency = value
+
+    @property
+    def http2(self) -> bool:
+        """是否尝试使用HTTP/2"""
+        return self._http2
+
+    @http2.setter
+    def http2(self, value: bool) -> None:
+        """设置是否尝试使用HTTP/2"""
+        self._http2 = value
+
+    @property
+    def rate_limit(self) -> RateLimitConfig:
+        """限流与重试参数（每秒请求数、自适应并发、退避等）"""
+        return self._rate_limit
+
+    @rate_limit.setter
+    def rate_limit(self, value: RateLimitConfig) -> None:
+        """设置限流与重试参数"""
+        self._rate_limit = value
+
+    @property
+    def use_journal(self) -> bool:
+        """是否将获取完的章节写入断点日志，中断后重新采集时跳过已记录的章节"""
+        return self._use_journal
+
+    @use_journal.setter
+    def use_journal(self, value: bool) -> None:
+        """设置是否使用断点日志"""
+        self._use_journal = value
+
+    @property
+    def journal_path(self) -> str:
+        """断点日志路径"""
+        return os.path.join(self.data_root, f"{self.resource_name}.journal.jsonl")
+
+    def clear_journal(self) -> None:
+        """删除断点日志，小说保存完成后调用"""
+        ChapterJournal(self.journal_path).clear()
+
+    @property
+    def chapter_retry_rounds(self) -> int:
+        """失败章节的重试次数，每次按退避时间等待"""
+        return self._chapter_retry_rounds
+
+    @chapter_retry_rounds.setter
+    def chapter_retry_rounds(self, value: int) -> None:
+        """设置失败章节的重试次数"""
+        self._chapter_retry_rounds = value
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """网页响应缓存，为None时不缓存"""
+        return self._response_cache
+
+    @response_cache.setter
+    def response_cache(self, value: Optional[ResponseCache]) -> None:
+        """设置网页响应缓存，由调用方负责关闭"""
+        self._response_cache = value
+
+    @property
+    def parser_backend(self) -> str:
+        """章节页解析器：streaming（单次遍历，默认）或soup（BeautifulSoup参照实现）"""
+        return self._parser_backend
+
+    @parser_backend.setter
+    def parser_backend(self, value: str) -> None:
+        """设置章节页解析器"""
+        self._adapter.check_parser_backend(value)
+        self._parser_backend = value
+
+    @property
+    def parse_workers(self) -> Optional[int]:
+        """解析进程数，为None时等于CPU核数，为0时在当前进程解析"""
+        return self._parse_workers
+
+    @parse_workers.setter
+    def parse_workers(self, value: Optional[int]) -> None:
+        """设置解析进程数"""
+        self._parse_workers = value
+
+    @property
+    def parse_queue_size(self) -> int:
+        """等待解析的网页队列长度，为0时为解析进程数的2倍"""
+        return self._parse_queue_size
+
+    @parse_queue_size.setter
+    def parse_queue_size(self, value: int) -> None:
+        """设置等待解析的网页队列长度"""
+        self._parse_queue_size = value
+
+    @property
+    def image_concurrency(self) -> int:
+        """同时下载的图片数，与章节获取分开限制"""
+        return self._image_concurrency
+
+    @image_concurrency.setter
+    def image_concurrency(self, value: int) -> None:
+        """设置同时下载的图片数"""
+        self._image_concurrency = value
+
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        """采集指标，为None时不记录"""
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, value: Optional[Metrics]) -> None:
+        """设置采集指标，多部小说可共用一个"""
+        self._metrics = value
+
+    @property
+    def proxy_pool(self) -> Optional[ProxyPool]:
+        """代理池，设置后忽略get_novel的proxy参数，请求分摊到池中各代理"""
+        return self._proxy_pool
+
+    @proxy_pool.setter
+    def proxy_pool(self, value: Optional[ProxyPool]) -> None:
+        """设置代理池"""
+        self._proxy_pool = value
+
+    @property
+    def client(self) -> Optional[AsyncHttpClient]:
+        """共用的异步HTTP客户端，未设置时get_novel内部创建并在结束后关闭"""
+        return self._client
+
+    @client.setter
+    def client(self, value: Optional[AsyncHttpClient]) -> None:
+        """设置共用的异步HTTP客户端，由调用方负责关闭"""
+        self._client = value
+
+    def create_client(self, proxy: str = "") -> AsyncHttpClient:
+        """按当前设置创建HTTP客户端，批量采集时可创建一个供多部小说共用
+        :param proxy: 代理
+        """
+        return AsyncHttpClient(
+            proxy=proxy,
+            cookies=self._adapter.COOKIES,
+            headers=self._adapter.HEADERS,
+            max_concurrency=self._max_concurrency,
+            rate_limit=self._rate_limit,
+            http2=self._http2,
+            cache=self._response_cache,
+            metrics=self._metrics,
+            proxy_pool=self._proxy_pool,
+        )
+
+    def create_scheduler(self, client: AsyncHttpClient) -> CrawlScheduler:
+        """按当前设置创建章节调度器，批量采集时可创建一个供多部小说共用
+        :param client: 调度器使用的HTTP客户端
+        """
+        return CrawlScheduler(
+            client,
+            parse_workers=self._parse_workers,
+            queue_size=self._parse_queue_size,
+            image_concurrency=self._image_concurrency,
+        )
+
+    @property
+    def scheduler(self) -> Optional[CrawlScheduler]:
+        """共用的章节调度器，未设置时获取章节时内部创建并在结束后关闭"""
+        return self._scheduler
+
+    @scheduler.setter
+    def scheduler(self, value: Optional[CrawlScheduler]) -> None:
+        """设置共用的章节调度器，由调用方负责启动和关闭"""
+        self._scheduler = value
+
+    @asynccontextmanager
+    async def _client_scope(self) -> AsyncIterator[AsyncHttpClient]:
+        """获取本次采集使用的客户端，外部传入的客户端不在此关闭"""
+        if self._client is not None:
+            yield self._client
+            return
+
+        client = self.create_client(self._current_proxy)
+        self._client = client
+        try:
+            yield client
+        finally:
+            self._client = None
+            await client.aclose()
+
+    @asynccontextmanager
+    async def _scheduler_scope(self) -> AsyncIterator[CrawlScheduler]:
+        """获取本次采集使用的章节调度器，外部传入的调度器不在此关闭"""
+        if self._scheduler is not None:
+            yield self._scheduler
+            return
+
+        assert self._client is not None
+        async with self.create_scheduler(self._client) as scheduler:
+            yield scheduler
+
+    async def _get_toc_page(self, url: str) -> TocPage:
+        assert self._client is not None
+        html = await self._client.get_webpage(url)
+        if html is None:
+            raise Exception("Failed to get webpage")
+        return self._adapter.parse_toc_page(html, url)
+
+    async def get_chapter_manifest(self) -> List[TocEntry]:
+        """按目录获取章节清单（网址、标题、所属的章、更新时间），按目录顺序排列
+        第一页给出最后一页时并发获取其余各页，否则按下一页链接逐页获取
+        :return: 章节清单，目录为空（如短篇）时为空列表
+        """
+        adapter = self._adapter
+        url = adapter.toc_url(self.resource_name)
+        async with self._client_scope():
+            first = await self._get_toc_page(url)
+            pages = [first]
+
+            last_url = (
+                None if first.last_href is None else urljoin(url, first.last_href)
+            )
+            last_page = 0 if last_url is None else adapter.toc_page_number(last_url)
+            if last_url is not None and last_page > 1:
+                pages.extend(
+                    await asyncio.gather(
+                        *(
+                            self._get_toc_page(adapter.toc_page_url(last_url, page))
+                            for page in range(2, last_page + 1)
+                        )
+                    )
+                )
+            else:
+                page_url = url
+                page = first
+                while page.next_href is not None:
+                    page_url = urljoin(page_url, page.next_href)
+                    page = await self._get_toc_page(page_url)
+                    pages.append(page)
+
+        manifest: List[TocEntry] = []
+        seen = set()
+        ep_title = ""
+        for page in pages:
+            for entry in page.entries:
+                # 章标题只出现在一页中，之后各页开头的章节沿用
+                if not entry.ep_title:
+                    entry.ep_title = ep_title
+                if entry.index not in seen:
+                    seen.add(entry.index)
+                    manifest.append(entry)
+            ep_title = page.last_ep_title or ep_title
+        return manifest
+
+    def _parse_context(self) -> _ParseContext:
+        """解析章节所需的参数，可传给子进程"""
+        return _ParseContext(
+            self._adapter,
+            self._parser_backend,
+            self._resource_name,
+            self.data_root,
+            self.asset_dir,
+            self._adapter.DEFAULT_EP,
+        )
+
+    def _parse_single_chapter(
+        self, html: str, ch_num: int
+    ) -> Tuple[Chapter, List[ImageTask]]:
+        """解析单章内容
+        :param html: 网页内容
+        :return: 章节对象、待下载的图片
+        """
+        return _parse_chapter(html, ch_num, self._parse_context())
+
+    async def get_novel(self, proxy: str = "") -> Novel:
+        """获取小说信息
+        中断后重新调用时跳过断点日志中已记录的章节，保存小说后应调用clear_journal
+        """
+        return await self._crawl(None, proxy)
+
+    async def update_novel(self, novel: Novel, proxy: str = "") -> Novel:
+        """增量更新已保存的小说，只获取新增或改稿的章节
+        :param novel: 已保存的小说对象
+        :param proxy: 代理
+        :return: 合并后的小说对象
+        """
+        return await self._crawl(novel, proxy)
+
+    def _get_outdated_entries(
+        self, versions: Dict[int, str], manifest: List[TocEntry]
+    ) -> List[TocEntry]:
+        """根据章节清单的更新时间找出需要获取的章节
+        :param versions: 已保存章节的索引到更新时间，旧数据没有更新时间时视为未改动
+        :param manifest: 章节清单
+        :return: 需要获取的章节
+        """
+        entries = []
+        for entry in manifest:
+            version = versions.get(entry.index)
+            if version is None:
+                entries.append(entry)
+            elif version and entry.updated_at and entry.updated_at != version:
+                entries.append(entry)
+        return entries
+
+    async def iter_chapters(
+        self, entries: List[TocEntry], window: int = 0
+    ) -> AsyncIterator[Chapter]:
+        """获取指定章节，按获取完成的顺序逐章生成，不保留已生成的章节
+        只有索引在尚未完成的最前一章之后window章以内的章节才提交获取，
+        调用方按索引顺序写入时最多缓存window章，内存与小说的章节数无关
+        失败的章节按退避时间重试，所有章节处理完后仍有失败时抛出异常
+        :param entries: 章节清单中需要获取的章节
+        :param window: 领先最前一章的章节数上限，为0时全部提交
+        :return: 章节对象的异步迭代器
+        """
+        entries = sorted(entries, key=lambda e: e.index)
+        if not entries:
+            return
+        window = window or len(entries)
+        ctx = self._parse_context()
+        config = self._rate_limit
+
+        async def get_chapter(
+            scheduler: CrawlScheduler, entry: TocEntry
+        ) -> Optional[Chapter]:
+            for attempt in range(self._chapter_retry_rounds + 1):
+                if attempt > 0:
+                    await asyncio.sleep(
+                        backoff_delay(
+                            attempt - 1, config.backoff_base, config.backoff_max
+                        )
+                    )
+                chapter = await self._submit_chapter(scheduler, ctx, entry)
+                if chapter is not None:
+                    return chapter
+            return None
+
+        failed: List[int] = []
+        running: Dict[asyncio.Task, int] = {}
+        # 已完成但前面还有未完成章节的位置
+        finished: Set[int] = set()
+        lowest = 0
+        submitted = 0
+        async with self._client_scope(), self._scheduler_scope() as scheduler:
+            try:
+                while running or submitted < len(entries):
+                    while submitted < min(len(entries), lowest + window):
+                        task = asyncio.create_task(
+                            get_chapter(scheduler, entries[submitted])
+                        )
+                        running[task] = submitted
+                        submitted += 1
+                    done, _ = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    chapters = []
+                    for task in done:
+                        position = running.pop(task)
+                        finished.add(position)
+                        chapter = task.result()
+                        if chapter is None:
+                            failed.append(entries[position].index)
+                        else:
+                            chapters.append(chapter)
+                    while lowest in finished:
+                        finished.remove(lowest)
+                        lowest += 1
+                    for chapter in chapters:
+                        yield chapter
+            finally:
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+
+        if failed:
+            raise Exception(f"Failed to get chapters: {sorted(failed)}")
+
+    async def _get_chapters(self, entries: List[TocEntry]) -> Dict[int, Chapter]:
+        """获取指定章节，跳过断点日志中已记录且未改稿的章节
+        有响应缓存时，目录中更新时间与缓存时相同的章节直接用缓存，不访问网络
+        :param entries: 章节清单中需要获取的章节
+        :return: 章节索引到章节对象的字典
+        """
+        journal = ChapterJournal(self.journal_path) if self._use_journal else None
+        journaled = {} if journal is None else journal.load()
+
+        chapters: Dict[int, Chapter] = {}
+        pending: List[TocEntry] = []
+        for entry in entries:
+            chapter = journaled.get(entry.index)
+            if chapter is not None and chapter.updated_at == entry.updated_at:
+                chapters[entry.index] = chapter
+            else:
+                pending.append(entry)
+
+        # 获取完一章立即写入断点日志
+        try:
+            async for chapter in self.iter_chapters(pending):
+                if journal is not None:
+                    journal.append(chapter)
+                chapters[chapter.index] = chapter
+        finally:
+            if journal is not None:
+                await asyncio.to_thread(journal.close)
+        return chapters
+
+    async def _submit_chapter(
+        self, scheduler: CrawlScheduler, ctx: _ParseContext, entry: TocEntry
+    ) -> Optional[Chapter]:
+        """把一章交给调度器获取和解析，失败时返回None"""
+        chapter = await scheduler.submit(
+            ChapterJob(entry.url, entry.index, _parse_chapter, ctx, entry.updated_at)
+        )
+        if chapter is not None:
+            chapter.updated_at = entry.updated_at
+        return chapter
+
+    async def fetch_chapter(self, entry: TocEntry) -> Optional[Chapter]:
+        """获取单章，不写断点日志、不分轮重试，供分布式采集的工作进程使用
+        批量获取时应设置共用的client和scheduler
+        :param entry: 章节清单中的章节
+        :return: 章节对象，失败时为None
+        """
+        async with self._scheduler_scope() as scheduler:
+            return await self._submit_chapter(scheduler, self._parse_context(), entry)
+
+    async def plan_crawl(
+        self,
+        novel: Optional[Novel] = None,
+        versions: Optional[Dict[int, str]] = None,
+    ) -> CrawlPlan:
+        """获取作品信息和章节清单，找出需要获取的章节，不获取章节本身
+        :param novel: 已保存的小说对象，为None时全部获取
+        :param versions: 已保存章节的索引到更新时间，指定时代替novel，不必加载章节内容
+        :return: 采集计划
+        """
+        async with self._client_scope() as client:
+            # 完整网址
+            url = self._adapter.info_url(self.resource_name)
+            html = await client.get_webpage(url)
+            if html is None:
+                raise Exception("Failed to get webpage")
+            info = self._adapter.parse_info(html)
+            manifest = await self.get_chapter_manifest()
+        if not manifest:
+            # 没有目录时按作品信息页的章节数获取
+            manifest = [
+                TocEntry(
+                    index=index,
+                    url=self._adapter.chapter_url(self.resource_name, index),
+                )
+                for index in range(1, info.chapter_count + 1)
+            ]
+        existing = {} if novel is None else {c.index: c for c in novel.chapters}
+        if versions is None:
+            versions = {index: c.updated_at for index, c in existing.items()}
+        for entry in manifest:
+            chapter = existing.get(entry.index)
+            if chapter is not None and not chapter.updated_at:
+                # 旧数据没有更新时间，视为未改动，只补上时间
+                chapter.updated_at = entry.updated_at
+        entries = self._get_outdated_entries(versions, manifest)
+        return CrawlPlan(info, manifest, entries)
+
+    async def _crawl(self, novel: Optional[Novel], proxy: str) -> Novel:
+        """获取小说，传入已保存的小说时只获取新增或改稿的章节
+        :param novel: 已保存的小说对象，为None时全部获取
+        :param proxy: 代理
+        :return: 小说对象
+        """
+        proxy = proxy.strip()
+        self._current_proxy = proxy
+
+        async with self._client_scope():
+            plan = await self.plan_crawl(novel)
+            chapters = await self._get_chapters(plan.entries)
+
+        existing = {} if novel is None else {c.index: c for c in novel.chapters}
+        return plan.merge(existing, chapters)
+
+    async def stream_novel(
+        self,
+        store: NovelStore,
+        refetch: bool = False,
+        proxy: str = "",
+        window: int = 64,
+    ) -> CrawlPlan:
+        """流式采集：获取完的章节按索引顺序成批写入存储，内存中不保留整部小说
+        已写入存储且目录中更新时间未变的章节跳过，中断后重新调用时从已写入的章节继续，
+        全部写完后才保存小说信息，不会把写到一半的小说当作已保存
+        :param store: 小说存储
+        :param refetch: 是否忽略已保存的章节全部重新获取
+        :param proxy: 代理
+        :param window: 领先最前一章获取的章节数，也是重排缓冲区的大小
+        :return: 采集计划
+        """
+        code = self.resource_name
+        self._current_proxy = proxy.strip()
+        versions = (
+            {} if refetch else await asyncio.to_thread(store.chapter_versions, code)
+        )
+
+        async with self._client_scope():
+            plan = await self.plan_crawl(versions=versions)
+            missing = plan.missing_versions(versions)
+            if missing:
+                await asyncio.to_thread(store.set_chapter_versions, code, missing)
+            sink = OrderedChapterSink(
+                store, code, [e.index for e in plan.entries], window
+            )
+            try:
+                async for chapter in self.iter_chapters(plan.entries, window):
+                    await sink.put(chapter)
+            finally:
+                # 出错时也写入已获取的章节，重新采集时不再获取
+                await sink.close()
+
+        info = plan.info
+        await asyncio.to_thread(
+            store.finish_novel,
+            code,
+            info.title,
+            info.description,
+            info.author,
+            [e.index for e in plan.manifest],
+        )
+        return plan
@@ -0,0 +1,166 @@
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+import asyncio
+import hashlib
+import json
+import time
+
+from novel_spiders.interfaces.ISiteAdapter import NovelInfo
+from novel_spiders.spiders.distributed_crawl import SpiderFactory
+from novel_spiders.spiders.novel_spider import NovelSpider
+from novel_spiders.utils.crawl_scheduler import CrawlScheduler
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+from novel_spiders.utils.watch_list import WatchEntry, WatchList
+
+# 有更新时调用，参数为已设置共用client和scheduler的爬虫，只需获取新增或改稿的章节
+ChangeHandler = Callable[[NovelSpider], Awaitable[None]]
+
+# 轮询结果
+POLL_NOT_MODIFIED = "not_modified"
+POLL_UNCHANGED = "unchanged"
+POLL_CHANGED = "changed"
+POLL_FAILED = "failed"
+
+
+class PollResult(NamedTuple):
+    """一次轮询的结果"""
+
+    code: str
+    status: str
+    # 调整后的轮询间隔（秒），失败时为None
+    interval: Optional[float]
+
+
+def info_digest(info: NovelInfo) -> str:
+    """作品信息的摘要，标题、简介、章节数或更新时间变化时不同
+    不直接比较网页，页面中的访问数等无关内容变化时不算更新
+    """
+    data = json.dumps(list(info), ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class NovelWatcher:
+    """轮询关注的小说的作品信息页，有更新时才获取新章节
+    - 用上次的ETag/Last-Modified发送条件请求，未修改（304）时只有响应头
+    - 服务器返回完整页面时比较作品信息的摘要，没有变化时不获取目录
+    - 轮询间隔由WatchList按是否有更新自适应调整
+
+    用法：
+        watcher = NovelWatcher(watch_list, factory, on_change)
+        async with client, scheduler:
+            await watcher.run(client, scheduler)
+    """
+
+    def __init__(
+        self,
+        watch_list: WatchList,
+        spider_factory: SpiderFactory,
+        on_change: ChangeHandler,
+        concurrency: int = 8,
+        max_updates: int = 2,
+        batch_size: int = 200,
+        idle_interval: float = 60.0,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        :param watch_list: 关注列表和轮询计划
+        :param spider_factory: 按(小说编号, 站点适配器名)创建爬虫
+        :param on_change: 有更新时调用
+        :param concurrency: 同时进行的轮询请求数
+        :param max_updates: 同时处理的更新数
+        :param batch_size: 每次从关注列表取出的到期小说数
+        :param idle_interval: 没有到期的小说时最长的等待时间（秒），期间新关注的小说在下次醒来时轮询
+        :param metrics: 记录轮询结果
+        """
+        self.watch_list = watch_list
+        self.spider_factory = spider_factory
+        self.on_change = on_change
+        self.batch_size = max(1, batch_size)
+        self.idle_interval = idle_interval
+        self.metrics = metrics
+        self._poll_semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._update_semaphore = asyncio.Semaphore(max(1, max_updates))
+
+    async def poll(
+        self, entry: WatchEntry, client: AsyncHttpClient, scheduler: CrawlScheduler
+    ) -> PollResult:
+        """轮询一部小说，有更新时处理完更新再记录，处理失败时下次轮询仍视为有更新
+        :param entry: 关注的小说
+        :param client: 共用的HTTP客户端
+        :param scheduler: 共用的章节调度器，处理更新时使用
+        :return: 轮询结果
+        """
+        spider = self.spider_factory(entry.code, entry.site)
+        spider.client = client
+        spider.scheduler = scheduler
+        status = POLL_FAILED
+        try:
+            async with self._poll_semaphore:
+                page = await client.get_conditional(
+                    spider.adapter.info_url(entry.code), entry.etag, entry.last_modified
+                )
+            if page is None:
+                raise Exception("Failed to get webpage")
+            digest = entry.digest
+            if page.text is None:
+                status = POLL_NOT_MODIFIED
+            else:
+                digest = info_digest(spider.adapter.parse_info(page.text))
+                status = POLL_UNCHANGED if digest == entry.digest else POLL_CHANGED
+            if status == POLL_CHANGED:
+                async with self._update_semaphore:
+                    await self.on_change(spider)
+            interval = await asyncio.to_thread(
+                self.watch_list.record_poll,
+                entry.code,
+                status == POLL_CHANGED,
+                page.etag,
+                page.last_modified,
+                digest,
+            )
+        except Exception as e:
+            print(f"Error: {entry.code} watch {status}: {e}")
+            status = POLL_FAILED
+            interval = None
+            await asyncio.to_thread(self.watch_list.record_failure, entry.code)
+        if self.metrics is not None:
+            self.metrics.inc("watch_polls_total", result=status)
+        return PollResult(entry.code, status, interval)
+
+    async def run_once(
+        self, client: AsyncHttpClient, scheduler: CrawlScheduler
+    ) -> List[PollResult]:
+        """轮询当前所有到期的小说
+        :return: 各小说的轮询结果
+        """
+        now = time.time()
+        results: List[PollResult] = []
+        while True:
+            # 本轮重新安排的小说下次轮询时间晚于now，不会重复取出
+            due = await asyncio.to_thread(self.watch_list.due, self.batch_size, now)
+            if not due:
+                return results
+            results.extend(
+                await asyncio.gather(
+                    *(self.poll(entry, client, scheduler) for entry in due)
+                )
+            )
+
+    async def run(self, client: AsyncHttpClient, scheduler: CrawlScheduler) -> None:
+        """一直轮询，直到被取消
+        :param client: 共用的HTTP客户端
+        :param scheduler: 共用的章节调度器
+        """
+        while True:
+            results = await self.run_once(client, scheduler)
+            changed = [r.code for r in results if r.status == POLL_CHANGED]
+            if results:
+                print(
+                    f"Polled {len(results)} novels, "
+                    f"{len(changed)} updated: {', '.join(changed) or '-'}"
+                )
+            next_poll_at = await asyncio.to_thread(self.watch_list.next_poll_at)
+            delay = self.idle_interval
+            if next_poll_at is not None:
+                delay = min(delay, max(0.0, next_poll_at - time.time()))
+            await asyncio.sleep(delay)
@@ -0,0 +1,93 @@
+from typing import BinaryIO, Dict, Optional
+import os
+
+from pydantic import ValidationError
+
+from novel_spiders.entities.novel import Chapter
+
+
+class ChapterJournal:
+    """章节断点日志（JSONL），每获取完一章立即追加一行，中断后重新采集时跳过已记录的章节
+    每行写入后立即交给操作系统，进程崩溃时不丢失；每sync_every章同步一次磁盘，关闭时全部同步
+
+    用法：
+        with ChapterJournal(path) as journal:
+            chapters = journal.load()
+            journal.append(chapter)
+    """
+
+    def __init__(self, path: str, sync_every: int = 16):
+        """
+        :param path: 日志文件路径
+        :param sync_every: 每追加多少章同步一次磁盘
+        """
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self._file: Optional[BinaryIO] = None
+        self._unsynced = 0
+
+    def __enter__(self) -> "ChapterJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def load(self) -> Dict[int, Chapter]:
+        """读取已记录的章节，同一章节以最后一次记录为准
+        写入中途崩溃时最后一行不完整，从文件中截掉，之后追加的记录从新的一行开始
+        :return: 章节索引到章节对象的字典
+        """
+        chapters: Dict[int, Chapter] = {}
+        if not os.path.exists(self.path):
+            return chapters
+
+        # 最后一个完整行的结尾位置
+        end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    chapter = Chapter.model_validate_json(line)
+                except ValidationError:
+                    continue
+                chapters[chapter.index] = chapter
+        if end < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        return chapters
+
+    def append(self, chapter: Chapter) -> None:
+        """追加一章，写入操作系统缓冲区，每sync_every章同步一次磁盘
+        :param chapter: 章节对象
+        """
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, "ab")
+        self._file.write(chapter.model_dump_json().encode("utf-8") + b"\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """把已追加的章节同步到磁盘"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        """同步并关闭日志文件"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def clear(self) -> None:
+        """删除日志，小说保存完成后调用"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
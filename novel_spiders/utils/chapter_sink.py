@@ -0,0 +1,90 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List, TYPE_CHECKING
+import asyncio
+
+from novel_spiders.utils.novel_store import NovelStore
+
+if TYPE_CHECKING:
+    from novel_spiders.entities.novel import Chapter
+
+
+class OrderedChapterSink:
+    """按章节索引顺序把章节成批写入小说存储
+    章节按获取完成的顺序到达，先放入重排缓冲区，前面的章节都到齐后按顺序写入，
+    内存中只保留缓冲区中等待前面章节的章节和一批待写入的章节，与小说的章节数无关
+    缓冲区超过上限时视为最前面缺少的章节已失败，跳过它继续写入
+
+    用法：
+        sink = OrderedChapterSink(store, code, [e.index for e in entries])
+        async for chapter in spider.iter_chapters(entries, sink.buffer_size):
+            await sink.put(chapter)
+        await sink.close()
+    """
+
+    def __init__(
+        self,
+        store: NovelStore,
+        code: str,
+        indexes: Iterable[int],
+        buffer_size: int = 64,
+        batch_size: int = 16,
+    ):
+        """
+        :param store: 小说存储
+        :param code: 小说编号
+        :param indexes: 将要到达的章节索引
+        :param buffer_size: 重排缓冲区的章节数上限，应不小于iter_chapters的window
+        :param batch_size: 每批写入的章节数，每批一个事务
+        """
+        self.store = store
+        self.code = code
+        self.buffer_size = max(1, buffer_size)
+        self.batch_size = max(1, batch_size)
+        self._indexes = sorted(set(indexes))
+        # 下一个要写入的章节在_indexes中的位置
+        self._next = 0
+        self._buffer: Dict[int, "Chapter"] = {}
+        self._batch: List["Chapter"] = []
+        # 内容有变化、实际写入的章节数
+        self.written = 0
+        # 缓冲区中同时等待的最大章节数
+        self.peak_buffered = 0
+
+    async def put(self, chapter: "Chapter") -> None:
+        """放入一章，前面的章节都已到达时连同缓冲区中的后续章节按顺序写入
+        :param chapter: 章节对象
+        """
+        self._buffer[chapter.index] = chapter
+        self.peak_buffered = max(self.peak_buffered, len(self._buffer))
+        self._drain()
+        if len(self._buffer) > self.buffer_size:
+            # 跳过最前面缺少的章节，从缓冲区中最小的索引继续
+            self._next = bisect_left(self._indexes, min(self._buffer))
+            self._drain()
+            if len(self._buffer) > self.buffer_size:
+                # 不在索引列表中的章节直接按索引顺序写入
+                for index in sorted(self._buffer):
+                    self._batch.append(self._buffer.pop(index))
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    def _drain(self) -> None:
+        """把缓冲区中从下一个要写入的章节开始连续的章节移到待写入的批次"""
+        indexes = self._indexes
+        while self._next < len(indexes) and indexes[self._next] in self._buffer:
+            self._batch.append(self._buffer.pop(indexes[self._next]))
+            self._next += 1
+
+    async def flush(self) -> None:
+        """写入待写入的批次"""
+        batch, self._batch = self._batch, []
+        if batch:
+            self.written += await asyncio.to_thread(
+                self.store.put_chapters, self.code, batch
+            )
+
+    async def close(self) -> None:
+        """写入缓冲区中剩余的章节，出错中断时也应调用，已获取的章节不丢失"""
+        for index in sorted(self._buffer):
+            self._batch.append(self._buffer.pop(index))
+        await self.flush()
@@ -0,0 +1,265 @@
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional
+import hashlib
+import io
+import json
+import os
+import re
+
+from novel_spiders.entities.compact_novel import CompactChapter, LazyChapters
+from novel_spiders.utils.novel_save_load import (
+    LINE_TEXT,
+    NovelLike,
+    NovelLineIndex,
+)
+
+MANIFEST_NAME = "manifest.json"
+_CHUNK_NAME_PATTERN = re.compile(r"part-\d+\.json")
+# 分块文件的开头、块之间的分隔符和结尾
+_OPEN = "{\n"
+_SEPARATOR = ",\n"
+_CLOSE = "\n}"
+# 进程池每个任务的章节数
+_BATCH_SIZE = 16
+
+
+@dataclass
+class ChunkLimit:
+    """分块上限，为0的项不限制，同时设置时任一项超过即换下一块"""
+
+    max_bytes: int = 0
+    max_tokens: int = 0
+    max_lines: int = 0
+
+    def exceeded(self, size_bytes: int, tokens: int, lines: int) -> bool:
+        """是否超过上限"""
+        return (
+            (self.max_bytes > 0 and size_bytes > self.max_bytes)
+            or (self.max_tokens > 0 and tokens > self.max_tokens)
+            or (self.max_lines > 0 and lines > self.max_lines)
+        )
+
+
+class _Block(NamedTuple):
+    """一章（或标题简介）的待翻译内容，已序列化为json字典的行"""
+
+    first_index: int
+    last_index: int
+    text: str
+    size_bytes: int
+    tokens: int
+    lines: int
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：非ASCII字符各算1个，ASCII字符每4个算1个"""
+    ascii_count = len(text.encode("ascii", errors="ignore"))
+    return len(text) - ascii_count + (ascii_count + 3) // 4
+
+
+def _make_block(first_index: int, last_index: int, entries: Dict[str, str]) -> _Block:
+    """把(key, 原文)序列化为json.dumps(indent=4)格式的字典行，不含首尾的括号"""
+    if not entries:
+        return _Block(first_index, last_index, "", 0, 0, 0)
+    # 整体序列化后去掉"{\n"和"\n}"，比逐行序列化快
+    block_text = json.dumps(entries, ensure_ascii=False, indent=4)[2:-2]
+    return _Block(
+        first_index,
+        last_index,
+        block_text,
+        len(block_text.encode("utf-8")),
+        estimate_tokens(block_text),
+        len(entries),
+    )
+
+
+def _render_chapter(chapter: Any) -> _Block:
+    """在子进程中序列化一章的待翻译内容，与novel_to_translatable_json选行一致"""
+    index = NovelLineIndex().chapter(chapter)
+    entries = {index.title_key: chapter.title}
+    for contents, section in (
+        (chapter.prepend_contents, index.prepend),
+        (chapter.contents, index.contents),
+        (chapter.append_contents, index.append),
+    ):
+        for content, key, kind in zip(contents, section.keys, section.kinds):
+            if kind == LINE_TEXT:
+                entries[key] = content.content
+    return _make_block(chapter.index, chapter.index, entries)
+
+
+def _render_chapters(chapters: List[Any]) -> List[_Block]:
+    """在子进程中序列化一批章节"""
+    return [_render_chapter(chapter) for chapter in chapters]
+
+
+def _iter_blocks(
+    novel: NovelLike, executor: Optional[Executor], window: int
+) -> Iterator[_Block]:
+    """按章节顺序生成块，进程池中最多同时有window批章节，内存不随小说长度增长"""
+    yield _make_block(0, 0, {"title": novel.title, "description": novel.description})
+
+    chapters: Iterable[Any] = novel.chapters
+    # 按需加载的章节已按索引排序，不必全部加载后再排序
+    if not isinstance(chapters, LazyChapters):
+        chapters = sorted(chapters, key=lambda c: c.index)
+
+    if executor is None:
+        for chapter in chapters:
+            yield _render_chapter(chapter)
+        return
+
+    # 每个任务处理一批章节，减少进程间传输的次数
+    pending: Deque[Future] = deque()
+    batch: List[Any] = []
+    for chapter in chapters:
+        # 紧凑表示的序列化比pydantic模型快得多
+        if not isinstance(chapter, CompactChapter):
+            chapter = CompactChapter.from_chapter(chapter)
+        batch.append(chapter)
+        if len(batch) < _BATCH_SIZE:
+            continue
+        pending.append(executor.submit(_render_chapters, batch))
+        batch = []
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    if batch:
+        pending.append(executor.submit(_render_chapters, batch))
+    while pending:
+        yield from pending.popleft().result()
+
+
+class _ChunkWriter:
+    """把块依次写入分块文件，写完一个文件后记录到清单"""
+
+    def __init__(self, out_dir: str, limit: ChunkLimit):
+        self.out_dir = out_dir
+        self.limit = limit
+        self.chunks: List[Dict[str, Any]] = []
+        self._file: Optional[io.TextIOWrapper] = None
+        self._hash = hashlib.sha256()
+        self._info: Dict[str, Any] = {}
+
+    def add(self, block: _Block) -> None:
+        if block.lines == 0:
+            return
+        # 大小包括分隔符和结尾的括号，与写出的文件大小一致
+        if self._file is not None and self.limit.exceeded(
+            self._info["bytes"] + len(_SEPARATOR) + block.size_bytes + len(_CLOSE),
+            self._info["tokens"] + block.tokens,
+            self._info["lines"] + block.lines,
+        ):
+            self.close()
+        if self._file is None:
+            self._open(block.first_index)
+            self._write(_OPEN)
+        else:
+            self._write(_SEPARATOR)
+        if self.limit.exceeded(
+            len(_OPEN) + block.size_bytes + len(_CLOSE), block.tokens, block.lines
+        ):
+            print(f"Warning: chapter {block.first_index} alone exceeds the chunk limit")
+        self._write(block.text)
+        self._info["last_chapter"] = block.last_index
+        self._info["tokens"] += block.tokens
+        self._info["lines"] += block.lines
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._write(_CLOSE)
+        self._file.close()
+        self._file = None
+        self._info["sha256"] = self._hash.hexdigest()
+        self.chunks.append(self._info)
+
+    def _open(self, first_index: int) -> None:
+        name = f"part-{len(self.chunks) + 1:04d}.json"
+        # 不转换换行，文件大小与清单中的一致
+        self._file = io.open(
+            os.path.join(self.out_dir, name), "w", encoding="utf-8", newline="\n"
+        )
+        self._hash = hashlib.sha256()
+        self._info = {
+            "file": name,
+            "first_chapter": first_index,
+            "last_chapter": first_index,
+            "bytes": 0,
+            "tokens": 0,
+            "lines": 0,
+        }
+
+    def _write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self._file.write(text)  # type: ignore[union-attr]
+        self._hash.update(data)
+        self._info["bytes"] += len(data)
+
+
+def export_translatable_chunks(
+    novel: NovelLike,
+    out_dir: str,
+    limit: ChunkLimit,
+    workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """把待翻译内容按上限分块写入out_dir/part-NNNN.json，并写出清单
+    每块都是完整的json字典，章节不会被拆到两块中；内容与novel_to_translatable_json一致
+    :param novel: 小说对象
+    :param out_dir: 分块目录，旧的分块会被删除
+    :param limit: 分块上限
+    :param workers: 序列化章节的进程数，为None时等于CPU核数，为0或1时在当前进程处理
+    :return: 清单中的分块列表
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        # 只删除旧的分块，保留翻译结果
+        if _CHUNK_NAME_PATTERN.fullmatch(name):
+            os.remove(os.path.join(out_dir, name))
+
+    writer = _ChunkWriter(out_dir, limit)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for block in _iter_blocks(novel, executor, max(workers, 1) * 2):
+            writer.add(block)
+        writer.close()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    manifest = {
+        "title": novel.title,
+        "limit": asdict(limit),
+        "lines": sum(c["lines"] for c in writer.chunks),
+        "chunks": writer.chunks,
+    }
+    with io.open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        f.write(json.dumps(manifest, ensure_ascii=False, indent=4))
+    return writer.chunks
+
+
+def translated_chunk_path(out_dir: str, chunk: Dict[str, Any]) -> str:
+    """分块的翻译结果路径：part-NNNN.json -> part-NNNN_trans.json"""
+    stem, ext = os.path.splitext(chunk["file"])
+    return os.path.join(out_dir, f"{stem}_trans{ext}")
+
+
+def merge_translated_chunks(out_dir: str) -> Dict[str, str]:
+    """按清单顺序合并各分块的翻译结果，缺少的分块跳过并提示
+    :param out_dir: 分块目录
+    :return: 合并后的翻译
+    """
+    with io.open(os.path.join(out_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    translates: Dict[str, str] = {}
+    for chunk in manifest["chunks"]:
+        path = translated_chunk_path(out_dir, chunk)
+        if not os.path.exists(path):
+            print(f"Warning: translated chunk not found: {path}")
+            continue
+        with io.open(path, "r", encoding="utf-8") as f:
+            translates.update(json.load(f))
+    return translates
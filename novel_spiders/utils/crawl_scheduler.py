@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+import asyncio
+import os
+import time
+
+from novel_spiders.entities.novel import Chapter
+from novel_spiders.utils.image_downloader import ImageDownloader, ImageTask
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+
+# 解析函数：(网页内容, 章节索引, 解析参数) -> (章节对象, 待下载的图片)，需可在子进程中运行
+ChapterParseFunc = Callable[[str, int, Any], Tuple[Chapter, List[ImageTask]]]
+
+
+class ChapterJob(NamedTuple):
+    """一个章节的获取任务"""
+
+    url: str
+    index: int
+    parse: ChapterParseFunc
+    context: Any
+    # 目录中的更新时间，与缓存的版本相同时不重新获取
+    version: Optional[str] = None
+
+
+class CrawlScheduler:
+    """章节调度器，可由多部小说共用
+    全局任务队列 -> 异步获取网页 -> 有界网页队列 -> 进程池解析 -> 图片下载队列
+
+    用法：
+        async with CrawlScheduler(client) as scheduler:
+            chapter = await scheduler.submit(job)
+    """
+
+    def __init__(
+        self,
+        client: AsyncHttpClient,
+        parse_workers: Optional[int] = None,
+        queue_size: int = 0,
+        image_concurrency: int = 4,
+    ):
+        """
+        :param client: 共用的HTTP客户端，获取协程数等于其总并发数
+        :param parse_workers: 解析进程数，为None时等于CPU核数，为0时在当前进程解析
+        :param queue_size: 等待解析的网页队列长度，为0时为解析进程数的2倍
+        :param image_concurrency: 同时下载的图片数
+        """
+        if parse_workers is None:
+            parse_workers = os.cpu_count() or 1
+        self.client = client
+        self.parse_workers = parse_workers
+        self.downloader = ImageDownloader(client, image_concurrency)
+        self._jobs: asyncio.Queue[Tuple[ChapterJob, asyncio.Future]] = asyncio.Queue()
+        self._pages: asyncio.Queue[Tuple[ChapterJob, asyncio.Future, str]] = (
+            asyncio.Queue(maxsize=queue_size or max(parse_workers, 1) * 2)
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._workers: List[asyncio.Task] = []
+        self._finishing: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "CrawlScheduler":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        """启动获取和解析协程"""
+        if self._workers:
+            return
+        if self.parse_workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self._workers = [
+            asyncio.create_task(self._fetcher())
+            for _ in range(self.client.total_concurrency)
+        ] + [
+            asyncio.create_task(self._parser())
+            for _ in range(max(self.parse_workers, 1))
+        ]
+
+    async def close(self) -> None:
+        """停止协程，等待图片下载完成，关闭进程池"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._finishing:
+            await asyncio.gather(*self._finishing, return_exceptions=True)
+        await self.downloader.join()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._record_queues()
+
+    def submit(self, job: ChapterJob) -> "asyncio.Future[Optional[Chapter]]":
+        """提交章节任务
+        :param job: 章节任务
+        :return: 结果为章节对象，失败时为None
+        """
+        future: asyncio.Future[Optional[Chapter]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._jobs.put_nowait((job, future))
+        metrics = self.client.metrics
+        if metrics is not None:
+            metrics.inc("chapters_submitted_total")
+            self._record_queues()
+        return future
+
+    def _record_queues(self) -> None:
+        """记录各队列中等待的任务数"""
+        metrics = self.client.metrics
+        if metrics is not None:
+            metrics.set("queue_depth", self._jobs.qsize(), queue="jobs")
+            metrics.set("queue_depth", self._pages.qsize(), queue="pages")
+            metrics.set("queue_depth", len(self._finishing), queue="images")
+
+    def _record_chapter(self, result: str) -> None:
+        metrics = self.client.metrics
+        if metrics is not None:
+            metrics.inc("chapters_total", result=result)
+
+    async def _fetcher(self) -> None:
+        """获取网页放入有界队列，队列满时等待，内存中最多只有并发数加队列长度个网页"""
+        while True:
+            job, future = await self._jobs.get()
+            self._record_queues()
+            if future.done():
+                continue
+            try:
+                html = await self.client.get_webpage(job.url, job.version)
+            except Exception as e:
+                # 缓存的数据库被锁、磁盘错误等，只让这一章失败，获取协程继续运行
+                print(f"Error getting chapter {job.index}: {e}")
+                self._record_chapter("fetch_failed")
+                if not future.done():
+                    future.set_result(None)
+                continue
+            if html is None:
+                print(f"Error getting chapter {job.index}: Failed to get webpage")
+                self._record_chapter("fetch_failed")
+                future.set_result(None)
+                continue
+            await self._pages.put((job, future, html))
+            self._record_queues()
+
+    async def _parser(self) -> None:
+        """用进程池解析网页，图片交给下载队列，不等待下载完成"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future, html = await self._pages.get()
+            self._record_queues()
+            start = time.perf_counter()
+            try:
+                if self._executor is None:
+                    chapter, images = job.parse(html, job.index, job.context)
+                else:
+                    chapter, images = await loop.run_in_executor(
+                        self._executor, job.parse, html, job.index, job.context
+                    )
+            except Exception as e:
+                print(f"Error getting chapter {job.index}: {e}")
+                self._record_chapter("parse_failed")
+                if not future.done():
+                    future.set_result(None)
+                continue
+            if self.client.metrics is not None:
+                # 用进程池时包含传给子进程和取回结果的开销
+                self.client.metrics.observe(
+                    "parse_seconds", time.perf_counter() - start
+                )
+            task = asyncio.create_task(self._finish(future, chapter, images))
+            self._finishing.add(task)
+            task.add_done_callback(self._finishing.discard)
+
+    async def _finish(
+        self,
+        future: "asyncio.Future[Optional[Chapter]]",
+        chapter: Chapter,
+        images: List[ImageTask],
+    ) -> None:
+        """等章节的图片下载完成，失败的图片改为保存图片的URL"""
+        results = await asyncio.gather(
+            *(self.downloader.submit(i.url, i.save_path) for i in images),
+            return_exceptions=True,
+        )
+        for image, ok in zip(images, results):
+            if ok is not True:
+                image.content.content = f"img: ![{image.alt}]({image.url})"
+        self._record_chapter("ok")
+        if not future.done():
+            future.set_result(chapter)
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+import asyncio
+import os
+import shutil
+import time
+
+from novel_spiders.entities.novel import ChapterContent
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+
+
+class ImageTask(NamedTuple):
+    """解析时收集的待下载图片"""
+
+    # 图片所在的章节内容，下载失败时改为保存图片的URL
+    content: ChapterContent
+    url: str
+    save_path: str
+    alt: str
+
+
+class ImageDownloader:
+    """图片下载队列，独立于章节获取，有单独的并发上限
+    同一URL只下载一次，保存到其他路径时从已下载的文件复制
+    只保留进行中的任务和最近下载完成的max_finished个URL，长时间运行时内存不增长
+    """
+
+    def __init__(
+        self,
+        client: AsyncHttpClient,
+        max_concurrency: int = 4,
+        max_finished: int = 4096,
+    ):
+        """
+        :param client: 下载用的HTTP客户端
+        :param max_concurrency: 同时下载的图片数
+        :param max_finished: 记录已下载完成的URL的个数上限，超过时忘记最早的
+        """
+        self._client = client
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._max_finished = max(0, max_finished)
+        # 进行中的下载：URL -> (第一次提交的保存路径, 下载任务)
+        self._downloads: Dict[str, Tuple[str, asyncio.Task[bool]]] = {}
+        # 已下载完成：URL -> 保存路径，按完成顺序
+        self._finished: "OrderedDict[str, str]" = OrderedDict()
+        # 进行中的任务：(URL, 保存路径) -> 任务
+        self._tasks: Dict[Tuple[str, str], asyncio.Task[bool]] = {}
+
+    def submit(self, url: str, save_path: str) -> "asyncio.Task[bool]":
+        """提交下载，立即返回，任务结果为是否成功
+        :param url: 图片URL
+        :param save_path: 保存路径
+        :return: 下载任务
+        """
+        key = (url, save_path)
+        task = self._tasks.get(key)
+        if task is not None:
+            return task
+
+        download = self._downloads.get(url)
+        if download is not None:
+            task = asyncio.create_task(self._copy(download[0], download[1], save_path))
+        elif url in self._finished:
+            task = asyncio.create_task(self._copy(self._finished[url], None, save_path))
+        else:
+            task = asyncio.create_task(self._download(url, save_path))
+            self._downloads[url] = (save_path, task)
+            task.add_done_callback(lambda t: self._on_downloaded(url, save_path, t))
+        self._tasks[key] = task
+        task.add_done_callback(lambda t: self._tasks.pop(key, None))
+        return task
+
+    async def join(self) -> None:
+        """等待所有已提交的下载完成"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _on_downloaded(
+        self, url: str, save_path: str, task: "asyncio.Task[bool]"
+    ) -> None:
+        """下载结束后不再保留任务，成功时记下保存路径供之后复制"""
+        self._downloads.pop(url, None)
+        if task.cancelled() or task.exception() is not None or not task.result():
+            return
+        if self._max_finished == 0:
+            return
+        self._finished[url] = save_path
+        self._finished.move_to_end(url)
+        while len(self._finished) > self._max_finished:
+            self._finished.popitem(last=False)
+
+    def _record(self, result: str) -> None:
+        metrics = self._client.metrics
+        if metrics is not None:
+            metrics.inc("images_total", result=result)
+
+    async def _download(self, url: str, save_path: str) -> bool:
+        if os.path.exists(save_path):
+            self._record("exists")
+            return True
+        async with self._semaphore:
+            start = time.perf_counter()
+            ok = await self._client.download_image(url, save_path)
+        if self._client.metrics is not None:
+            self._client.metrics.observe(
+                "image_download_seconds", time.perf_counter() - start
+            )
+        self._record("downloaded" if ok else "failed")
+        return ok
+
+    async def _copy(
+        self,
+        src_path: str,
+        src_task: Optional["asyncio.Task[bool]"],
+        save_path: str,
+    ) -> bool:
+        """等同一URL的下载完成后复制到另一路径，src_task为None时已下载完成"""
+        if src_task is not None and not await src_task:
+            return False
+        if os.path.exists(save_path):
+            return True
+        try:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            tmp_path = f"{save_path}.part"
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, save_path)
+        except OSError as e:
+            print(f"Error downloading image: {e}")
+            return False
+        self._record("copied")
+        return True
@@ -0,0 +1,256 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import json
+import math
+import os
+import threading
+import time
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    """累计分桶直方图，与Prometheus的histogram一致"""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """按分桶估算分位数（取所在分桶的上界）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            if total >= rank:
+                return bound
+        return math.inf
+
+
+class Metrics:
+    """采集指标：计数器、仪表和直方图，可带标签
+    可导出为Prometheus文本格式或json，多线程/多协程共用
+
+    用法：
+        metrics = Metrics()
+        metrics.inc("http_requests_total", status=200)
+        with metrics.timer("parse_seconds"):
+            ...
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._types: Dict[str, str] = {}
+        self._values: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self.started_at = time.time()
+
+    def describe(
+        self,
+        name: str,
+        help_text: str,
+        kind: str = "counter",
+        buckets: Optional[Sequence[float]] = None,
+    ) -> None:
+        """登记指标的说明和类型
+        :param name: 指标名
+        :param help_text: 说明
+        :param kind: counter、gauge或histogram
+        :param buckets: 直方图分桶上界，为None时用DEFAULT_BUCKETS
+        """
+        with self._lock:
+            self._help[name] = help_text
+            self._types[name] = kind
+            if kind == "histogram":
+                self._buckets[name] = tuple(buckets or DEFAULT_BUCKETS)
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        """计数器增加"""
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "counter")
+            values = self._values.setdefault(name, {})
+            values[key] = values.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """设置仪表的值"""
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "gauge")
+            self._values.setdefault(name, {})[key] = value
+
+    def add(self, name: str, amount: float, **labels) -> None:
+        """仪表增减（如队列长度、进行中的请求数）"""
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "gauge")
+            values = self._values.setdefault(name, {})
+            values[key] = values.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """直方图记录一个值"""
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "histogram")
+            histograms = self._histograms.setdefault(name, {})
+            histogram = histograms.get(key)
+            if histogram is None:
+                buckets = self._buckets.get(name, DEFAULT_BUCKETS)
+                histogram = histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """记录代码块耗时到直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name: str, **labels) -> float:
+        """计数器或仪表的值，未记录时为0"""
+        with self._lock:
+            return self._values.get(name, {}).get(_label_key(labels), 0.0)
+
+    def total(self, name: str) -> float:
+        """计数器或仪表所有标签的值之和"""
+        with self._lock:
+            return sum(self._values.get(name, {}).values())
+
+    def to_json(self) -> Dict[str, object]:
+        """导出为可json序列化的字典，直方图给出次数、总和和估算的分位数"""
+        result: Dict[str, object] = {"uptime_seconds": time.time() - self.started_at}
+        with self._lock:
+            for name, values in sorted(self._values.items()):
+                result[name] = [
+                    {"labels": dict(key), "value": value}
+                    for key, value in sorted(values.items())
+                ]
+            for name, histograms in sorted(self._histograms.items()):
+                result[name] = [
+                    {
+                        "labels": dict(key),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "mean": h.sum / h.count if h.count else 0.0,
+                        "p50": h.quantile(0.5),
+                        "p90": h.quantile(0.9),
+                        "p99": h.quantile(0.99),
+                    }
+                    for key, h in sorted(histograms.items())
+                ]
+        return result
+
+    def to_prometheus(self) -> str:
+        """导出为Prometheus文本格式"""
+        lines: List[str] = []
+        with self._lock:
+            names = sorted(set(self._values) | set(self._histograms))
+            for name in names:
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types.get(name, 'untyped')}")
+                for key, value in sorted(self._values.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                for key, h in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        labels = _format_labels(key + (("le", _format_value(bound)),))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(key + (("le", "+Inf"),))
+                    lines.append(f"{name}_bucket{labels} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """写出Prometheus文本文件（可供node_exporter的textfile采集），先写临时文件再替换"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: str) -> None:
+        """写出json统计"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_json(), ensure_ascii=False, indent=4))
+        os.replace(tmp_path, path)
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    parts = []
+    for name, value in key:
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def describe_crawl_metrics(metrics: Metrics) -> None:
+    """登记采集过程中记录的指标"""
+    metrics.describe(
+        "http_request_seconds", "HTTP请求耗时（含读取响应体）", "histogram"
+    )
+    metrics.describe(
+        "http_phase_seconds",
+        "建立连接（含DNS和代理握手）、TLS握手、等待响应头等阶段的耗时",
+        "histogram",
+    )
+    metrics.describe("rate_limit_wait_seconds", "等待限流和并发槽位的耗时", "histogram")
+    metrics.describe("http_responses_total", "按状态码统计的响应数")
+    metrics.describe("http_errors_total", "按异常类型统计的连接错误、超时等")
+    metrics.describe("http_retries_total", "按原因统计的重试次数，gave_up为重试用尽")
+    metrics.describe("http_response_bytes_total", "响应体字节数")
+    metrics.describe("http_in_flight", "进行中的请求数", "gauge")
+    metrics.describe(
+        "cache_requests_total",
+        "响应缓存命中（含版本未变时直接使用）、重新验证和未命中次数",
+    )
+    metrics.describe("queue_depth", "调度器各队列中的任务数", "gauge")
+    metrics.describe("parse_seconds", "章节解析耗时", "histogram")
+    metrics.describe("chapters_total", "完成和失败的章节数")
+    metrics.describe("chapters_submitted_total", "提交给调度器的章节数")
+    metrics.describe("image_download_seconds", "图片下载耗时", "histogram")
+    metrics.describe("images_total", "图片下载结果")
+    metrics.describe("export_seconds", "各导出步骤的耗时", "histogram")
+    metrics.describe("export_chapters_total", "重新渲染和使用缓存的章节数")
+    metrics.describe("novels_total", "完成和失败的小说数")
+    metrics.describe("proxy_requests_total", "各代理的请求结果")
+    metrics.describe("proxy_ejected", "代理是否暂时被剔除", "gauge")
+    metrics.describe("work_queue_tasks", "分布式采集任务队列中各状态的任务数", "gauge")
+    metrics.describe(
+        "watch_polls_total", "轮询作品信息页的结果：未修改、内容未变、有更新、失败"
+    )
@@ -0,0 +1,715 @@
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+import datetime
+import hashlib
+import html
+import io
+import os
+import re
+import sqlite3
+import uuid
+import zipfile
+import zlib
+
+from novel_spiders.entities.compact_novel import CompactChapter, LineTable
+from novel_spiders.utils.novel_save_load import (
+    LINE_BLANK,
+    LINE_IMAGE,
+    ChapterLineIndex,
+    NovelLike,
+    NovelLineIndex,
+    Translates,
+    TranslationTable,
+    chapter_markdown_lines,
+    markdown_header_lines,
+)
+
+# 支持的导出格式，html和epub共用同一份章节渲染结果
+EXPORT_FORMATS = ("md", "html", "epub")
+# 渲染结果变化时修改，使旧的缓存失效
+RENDER_VERSION = "1"
+# 进程池每个任务的章节数
+_BATCH_SIZE = 16
+# 未指定进程数时，章节数达到此值才启动进程池，章节少时启动进程的开销比渲染本身还大
+_PARALLEL_MIN_CHAPTERS = 500
+_IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+_IMAGE_MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+_CSS = """body { line-height: 1.8; }
+p.trans { color: #555; }
+img { max-width: 100%; }
+hr { margin: 1.5em 0; }
+"""
+
+
+class RenderCache:
+    """章节渲染结果的磁盘缓存
+    以章节索引和渲染种类为键，保存章节内容和翻译的哈希，哈希一致时直接复用，
+    每章每种只保留最新一份，大小不随导出次数增长
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 缓存数据库路径
+        """
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS chapters (
+                chapter INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                content BLOB NOT NULL,
+                PRIMARY KEY (chapter, kind)
+            );
+            """)
+        self._db.commit()
+
+    def __enter__(self) -> "RenderCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """提交并关闭数据库"""
+        self._db.commit()
+        self._db.close()
+
+    def get(self, chapter: int, kind: str, digest: str) -> Optional[str]:
+        """读取渲染结果
+        :param chapter: 章节索引
+        :param kind: 渲染种类（md或html）
+        :param digest: 当前章节内容和翻译的哈希
+        :return: 渲染结果，不存在或哈希不一致时为None
+        """
+        row = self._db.execute(
+            "SELECT digest, content FROM chapters WHERE chapter = ? AND kind = ?",
+            (chapter, kind),
+        ).fetchone()
+        if row is None or row[0] != digest:
+            return None
+        return zlib.decompress(row[1]).decode("utf-8")
+
+    def put(self, chapter: int, kind: str, digest: str, content: str) -> None:
+        """保存渲染结果，替换该章的旧结果，调用commit后写入磁盘"""
+        self._db.execute(
+            "INSERT OR REPLACE INTO chapters (chapter, kind, digest, content)"
+            " VALUES (?, ?, ?, ?)",
+            (chapter, kind, digest, zlib.compress(content.encode("utf-8"))),
+        )
+
+    def commit(self) -> None:
+        """提交写入"""
+        self._db.commit()
+
+
+class ExportStats(NamedTuple):
+    """导出统计"""
+
+    chapters: int
+    # 重新渲染的章节数，其余章节来自缓存
+    rendered: int
+    cached: int
+
+
+class _RenderJob(NamedTuple):
+    """交给子进程渲染的一章"""
+
+    chapter: CompactChapter
+    # 本章用到的翻译，只传需要的部分
+    translates: Dict[str, str]
+    show_ep: bool
+    kinds: Tuple[str, ...]
+
+
+class _Rendered(NamedTuple):
+    """渲染完成的一章"""
+
+    index: int
+    title: str
+    ep_title: str
+    show_ep: bool
+    parts: Dict[str, str]
+
+
+def chapter_keys(index: ChapterLineIndex) -> List[str]:
+    """章节所有行（含大章节标题和标题）的json key"""
+    return [
+        index.ep_key,
+        index.title_key,
+        *index.prepend.keys,
+        *index.contents.keys,
+        *index.append.keys,
+    ]
+
+
+def chapter_digest(chapter: Any, used: Dict[str, str], show_ep: bool) -> str:
+    """章节内容和翻译的哈希，作为渲染缓存的键
+    :param chapter: 章节对象（Chapter或CompactChapter）
+    :param used: 本章的翻译（TranslationTable.select的结果）
+    :param show_ep: 是否输出大章节标题
+    :return: 哈希
+    """
+    texts: List[str] = [RENDER_VERSION, "1" if show_ep else "0"]
+    texts.append(chapter.ep_title)
+    texts.append(chapter.title)
+    for contents in (
+        chapter.prepend_contents,
+        chapter.contents,
+        chapter.append_contents,
+    ):
+        texts.append("\x01")
+        if isinstance(contents, LineTable):
+            texts.extend(contents.texts)
+        else:
+            texts.extend(content.content for content in contents)
+    # 行的key由章节索引和行在章内的位置决定，原文、翻译的key和翻译分别拼接即可区分
+    texts.append("\x01")
+    texts.extend(used)
+    texts.append("\x01")
+    texts.extend(used.values())
+    return hashlib.blake2b(
+        "\x00".join(texts).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def chapter_html(
+    chapter: Any, index: ChapterLineIndex, translates: TranslationTable, show_ep: bool
+) -> str:
+    """一章的xhtml片段，html和epub共用
+    :param chapter: 章节对象（Chapter或CompactChapter）
+    :param index: 章节的行索引
+    :param translates: 翻译内容
+    :param show_ep: 是否输出大章节标题
+    :return: xhtml片段
+    """
+    lines: List[str] = [f'<section id="ch-{chapter.index}">']
+    if show_ep:
+        _append_html_text(lines, "h1", chapter.ep_title, translates.get(index.ep_key))
+    _append_html_text(lines, "h2", chapter.title, translates.get(index.title_key))
+
+    sections = [
+        (chapter.prepend_contents, index.prepend),
+        (chapter.contents, index.contents),
+        (chapter.append_contents, index.append),
+    ]
+    first = True
+    for contents, section in sections:
+        if len(contents) == 0:
+            continue
+        if not first:
+            lines.append("<hr />")
+        first = False
+        for content, key, kind in zip(contents, section.keys, section.kinds):
+            if kind == LINE_BLANK:
+                continue
+            if kind == LINE_IMAGE:
+                lines.append(_image_html(content.content))
+            else:
+                _append_html_text(lines, "p", content.content, translates.get(key))
+    lines.append("</section>")
+    return "\n".join(lines) + "\n"
+
+
+def _append_html_text(
+    lines: List[str], tag: str, text: str, translate: Optional[Tuple[str, str]]
+) -> None:
+    """添加原文和翻译（与原文不一致时）"""
+    lines.append(f"<{tag}>{html.escape(text.strip())}</{tag}>")
+    if translate is not None and translate[1] != text.strip():
+        lines.append(f'<{tag} class="trans">{html.escape(translate[1])}</{tag}>')
+
+
+def _image_html(line: str) -> str:
+    """图片行（img: ![alt](path)）转换为img标签"""
+    match = _IMAGE_PATTERN.search(line)
+    if match is None:
+        return f"<p>{html.escape(line.strip())}</p>"
+    alt, src = match.groups()
+    return (
+        f'<p class="image"><img src="{html.escape(_image_href(src))}"'
+        f' alt="{html.escape(alt)}" /></p>'
+    )
+
+
+def _image_href(path: str) -> str:
+    """图片的相对网址，统一使用/分隔"""
+    return path.replace(os.sep, "/")
+
+
+def _render_parts(
+    chapter: Any,
+    index: ChapterLineIndex,
+    translates: TranslationTable,
+    show_ep: bool,
+    kinds: Sequence[str],
+) -> Dict[str, str]:
+    """渲染一章的各种结果"""
+    parts: Dict[str, str] = {}
+    if "md" in kinds:
+        lines = chapter_markdown_lines(chapter, index, translates, show_ep)
+        parts["md"] = "\n" + "\n".join(lines)
+    if "html" in kinds:
+        parts["html"] = chapter_html(chapter, index, translates, show_ep)
+    return parts
+
+
+def _render_jobs(jobs: List[_RenderJob]) -> List[Dict[str, str]]:
+    """在子进程中渲染一批章节"""
+    return [
+        _render_parts(
+            job.chapter,
+            NovelLineIndex().chapter(job.chapter),
+            TranslationTable(job.translates),
+            job.show_ep,
+            job.kinds,
+        )
+        for job in jobs
+    ]
+
+
+class _Batch(NamedTuple):
+    """交给进程池的一批章节，结果按顺序写回"""
+
+    items: List[Tuple[_Rendered, str]]
+    future: Future
+
+
+def _iter_rendered(
+    novel: NovelLike,
+    translates: TranslationTable,
+    line_index: NovelLineIndex,
+    kinds: Tuple[str, ...],
+    cache: Optional[RenderCache],
+    executor: Optional[Executor],
+    window: int,
+    counts: Dict[str, int],
+) -> Iterator[_Rendered]:
+    """按章节顺序生成渲染结果，缓存命中的章节不再渲染
+    没有进程池时在当前进程直接渲染；否则未命中的章节分批交给进程池，
+    进程池中最多同时有window批，内存不随小说长度增长
+    """
+
+    def store(rendered: _Rendered, digest: str, parts: Dict[str, str]) -> None:
+        rendered.parts.update(parts)
+        if cache is not None:
+            for kind, content in parts.items():
+                cache.put(rendered.index, kind, digest, content)
+
+    # 按顺序排列的已完成章节和进行中的批次
+    pending: Deque[Union[_Rendered, _Batch]] = deque()
+    batch: List[Tuple[_Rendered, str]] = []
+    jobs: List[_RenderJob] = []
+    running = 0
+
+    def submit() -> None:
+        nonlocal batch, jobs, running
+        if not jobs:
+            return
+        pending.append(_Batch(batch, executor.submit(_render_jobs, jobs)))
+        batch, jobs = [], []
+        running += 1
+
+    def drain(limit: int) -> Iterator[_Rendered]:
+        nonlocal running
+        while pending and (isinstance(pending[0], _Rendered) or running > limit):
+            item = pending.popleft()
+            if isinstance(item, _Rendered):
+                yield item
+                continue
+            running -= 1
+            for (rendered, digest), parts in zip(item.items, item.future.result()):
+                store(rendered, digest, parts)
+                yield rendered
+
+    current_ep = ""
+    for chapter in novel.chapters:
+        show_ep = current_ep != chapter.ep_title
+        current_ep = chapter.ep_title
+        index = line_index.chapter(chapter)
+        rendered = _Rendered(
+            chapter.index, chapter.title, chapter.ep_title, show_ep, {}
+        )
+        used: Dict[str, str] = {}
+        digest = ""
+        missing: List[str] = list(kinds)
+        if cache is not None or executor is not None:
+            used = translates.select(chapter_keys(index))
+        if cache is not None:
+            digest = chapter_digest(chapter, used, show_ep)
+            missing = []
+            for kind in kinds:
+                content = cache.get(chapter.index, kind, digest)
+                if content is None:
+                    missing.append(kind)
+                else:
+                    rendered.parts[kind] = content
+        if not missing:
+            counts["cached"] += 1
+            # 保持顺序：之前未提交的批次先提交
+            submit()
+            pending.append(rendered)
+        elif executor is None:
+            counts["rendered"] += 1
+            store(
+                rendered,
+                digest,
+                _render_parts(chapter, index, translates, show_ep, missing),
+            )
+            pending.append(rendered)
+        else:
+            counts["rendered"] += 1
+            # 紧凑表示的序列化比pydantic模型快得多
+            if not isinstance(chapter, CompactChapter):
+                chapter = CompactChapter.from_chapter(chapter)
+            batch.append((rendered, digest))
+            jobs.append(_RenderJob(chapter, used, show_ep, tuple(missing)))
+            if len(jobs) >= _BATCH_SIZE:
+                submit()
+        yield from drain(window)
+    submit()
+    yield from drain(-1)
+
+
+class _MarkdownWriter:
+    """逐章写入markdown，内容与novel_to_markdown一致"""
+
+    def __init__(self, path: str, novel: NovelLike, translates: TranslationTable):
+        self.path = path
+        self._tmp_path = f"{path}.tmp"
+        self._file = io.open(self._tmp_path, "w", encoding="utf-8")
+        self._file.write("\n".join(markdown_header_lines(novel, translates)))
+
+    def add(self, rendered: _Rendered) -> None:
+        self._file.write(rendered.parts["md"])
+
+    def close(self) -> None:
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        os.remove(self._tmp_path)
+
+
+def _title_page_html(novel: NovelLike, translates: TranslationTable) -> str:
+    """标题、作者和简介的xhtml片段"""
+    lines: List[str] = []
+    _append_html_text(lines, "h1", novel.title, translates.get("title"))
+    lines.append(f'<p class="author">{html.escape(novel.author)}</p>')
+    for paragraph in novel.description.splitlines():
+        if paragraph.strip():
+            lines.append(f"<p>{html.escape(paragraph.strip())}</p>")
+    translate = translates.get("description")
+    if translate is not None and translate[1] != novel.description.strip():
+        for paragraph in translate[1].splitlines():
+            if paragraph.strip():
+                lines.append(f'<p class="trans">{html.escape(paragraph.strip())}</p>')
+    return "\n".join(lines) + "\n"
+
+
+def _xhtml_document(title: str, body: str, language: str, css_href: str = "") -> str:
+    """完整的xhtml文档"""
+    head = f"<title>{html.escape(title)}</title>"
+    if css_href:
+        head += f'\n<link rel="stylesheet" type="text/css" href="{css_href}" />'
+    else:
+        head += f"\n<style>\n{_CSS}</style>"
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml"'
+        ' xmlns:epub="http://www.idpf.org/2007/ops"'
+        f' lang="{language}" xml:lang="{language}">\n'
+        f'<head>\n<meta charset="utf-8" />\n{head}\n</head>\n'
+        f"<body>\n{body}</body>\n</html>\n"
+    )
+
+
+class _HtmlWriter:
+    """逐章写入单个html文件"""
+
+    def __init__(
+        self, path: str, novel: NovelLike, translates: TranslationTable, language: str
+    ):
+        self.path = path
+        self._tmp_path = f"{path}.tmp"
+        document = _xhtml_document(novel.title, "\x00", language)
+        head, self._tail = document.split("\x00")
+        self._file = io.open(self._tmp_path, "w", encoding="utf-8")
+        self._file.write(head)
+        self._file.write(_title_page_html(novel, translates))
+
+    def add(self, rendered: _Rendered) -> None:
+        self._file.write(rendered.parts["html"])
+
+    def close(self) -> None:
+        self._file.write(self._tail)
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._file.close()
+        os.remove(self._tmp_path)
+
+
+class _EpubWriter:
+    """边渲染边把章节写入epub（zip），内存中只保留目录信息
+    图片从image_root读取，与章节中的相对路径一致地放入包中
+    """
+
+    def __init__(
+        self,
+        path: str,
+        novel: NovelLike,
+        translates: TranslationTable,
+        language: str,
+        image_root: str,
+    ):
+        self.path = path
+        self.novel = novel
+        self.language = language
+        self.image_root = image_root
+        self._tmp_path = f"{path}.tmp"
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", zipfile.ZIP_DEFLATED)
+        # mimetype必须是第一个文件且不压缩
+        self._zip.writestr(
+            zipfile.ZipInfo("mimetype"),
+            "application/epub+zip",
+            compress_type=zipfile.ZIP_STORED,
+        )
+        self._zip.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<container version="1.0"'
+            ' xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+            "<rootfiles>\n"
+            '<rootfile full-path="OEBPS/content.opf"'
+            ' media-type="application/oebps-package+xml" />\n'
+            "</rootfiles>\n</container>\n",
+        )
+        self._zip.writestr("OEBPS/style.css", _CSS)
+        self._zip.writestr(
+            "OEBPS/title.xhtml",
+            _xhtml_document(
+                novel.title, _title_page_html(novel, translates), language, "style.css"
+            ),
+        )
+        # (文件名, 标题, 大章节标题)，大章节没有变化时为None，变为没有大章节时为空
+        self._chapters: List[Tuple[str, str, Optional[str]]] = []
+        self._images: Set[str] = set()
+
+    def add(self, rendered: _Rendered) -> None:
+        name = f"ch-{rendered.index:05d}.xhtml"
+        body = rendered.parts["html"]
+        self._zip.writestr(
+            f"OEBPS/{name}",
+            _xhtml_document(rendered.title, body, self.language, "style.css"),
+        )
+        self._chapters.append(
+            (name, rendered.title, rendered.ep_title if rendered.show_ep else None)
+        )
+        for match in re.finditer(r'<img src="([^"]+)"', body):
+            self._images.add(html.unescape(match.group(1)))
+
+    def close(self) -> None:
+        images: List[Tuple[str, str]] = []
+        for href in sorted(self._images):
+            file_path = os.path.join(self.image_root, *href.split("/"))
+            if not os.path.exists(file_path):
+                print(f"Warning: image not found: {file_path}")
+                continue
+            # 图片已经压缩过
+            self._zip.write(file_path, f"OEBPS/{href}", zipfile.ZIP_STORED)
+            images.append((href, _media_type(href)))
+        self._zip.writestr("OEBPS/nav.xhtml", self._nav())
+        self._zip.writestr("OEBPS/content.opf", self._opf(images))
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._zip.close()
+        os.remove(self._tmp_path)
+
+    def _nav(self) -> str:
+        items: List[str] = []
+        in_ep = False
+        for name, title, ep_title in self._chapters:
+            if ep_title is not None and in_ep:
+                # 大章节变化（包括变为没有大章节）时结束上一个大章节
+                items.append("</ol></li>")
+                in_ep = False
+            if ep_title:
+                items.append(f'<li><a href="{name}">{html.escape(ep_title)}</a><ol>')
+                in_ep = True
+            items.append(f'<li><a href="{name}">{html.escape(title)}</a></li>')
+        if in_ep:
+            items.append("</ol></li>")
+        body = (
+            '<nav epub:type="toc" id="toc">\n<ol>\n'
+            '<li><a href="title.xhtml">'
+            f"{html.escape(self.novel.title)}</a></li>\n"
+            + "\n".join(items)
+            + "\n</ol>\n</nav>\n"
+        )
+        return _xhtml_document(self.novel.title, body, self.language, "style.css")
+
+    def _opf(self, images: Sequence[Tuple[str, str]]) -> str:
+        identifier = uuid.uuid5(
+            uuid.NAMESPACE_URL, f"{self.novel.title}\n{self.novel.author}"
+        )
+        modified = datetime.datetime.now(datetime.timezone.utc).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        manifest = [
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml"'
+            ' properties="nav" />',
+            '<item id="css" href="style.css" media-type="text/css" />',
+            '<item id="title" href="title.xhtml"'
+            ' media-type="application/xhtml+xml" />',
+        ]
+        spine = ['<itemref idref="title" />']
+        for name, _, _ in self._chapters:
+            item_id = name.rsplit(".", 1)[0]
+            manifest.append(
+                f'<item id="{item_id}" href="{name}"'
+                ' media-type="application/xhtml+xml" />'
+            )
+            spine.append(f'<itemref idref="{item_id}" />')
+        for i, (href, media_type) in enumerate(images, start=1):
+            manifest.append(
+                f'<item id="img-{i}" href="{html.escape(href)}"'
+                f' media-type="{media_type}" />'
+            )
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0"'
+            ' unique-identifier="book-id">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="book-id">urn:uuid:{identifier}</dc:identifier>\n'
+            f"<dc:title>{html.escape(self.novel.title)}</dc:title>\n"
+            f"<dc:creator>{html.escape(self.novel.author)}</dc:creator>\n"
+            f"<dc:language>{self.language}</dc:language>\n"
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            "</metadata>\n<manifest>\n"
+            + "\n".join(manifest)
+            + "\n</manifest>\n<spine>\n"
+            + "\n".join(spine)
+            + "\n</spine>\n</package>\n"
+        )
+
+
+def _media_type(href: str) -> str:
+    ext = os.path.splitext(href)[1].lower()
+    return _IMAGE_MEDIA_TYPES.get(ext, "application/octet-stream")
+
+
+def export_novel(
+    novel: NovelLike,
+    translates: Translates,
+    out_base: str,
+    formats: Sequence[str] = ("md",),
+    cache: Optional[RenderCache] = None,
+    workers: Optional[int] = None,
+    line_index: Optional[NovelLineIndex] = None,
+    language: str = "ja",
+) -> ExportStats:
+    """带翻译导出为多种格式，各章独立渲染（可并行），渲染结果按章节内容和翻译的哈希缓存
+    输出先写临时文件，全部完成后再替换，markdown与novel_to_markdown一致
+    :param novel: 小说对象
+    :param translates: 翻译内容
+    :param out_base: 输出路径（不含扩展名），如data/n0000aa，图片相对于其所在目录
+    :param formats: 导出格式，见EXPORT_FORMATS
+    :param cache: 渲染缓存，为None时全部重新渲染
+    :param workers: 渲染章节的进程数，为None时章节数达到_PARALLEL_MIN_CHAPTERS才使用CPU核数，
+        否则在当前进程处理；为0或1时在当前进程处理
+    :param line_index: 行索引，与其他导出共用时传入
+    :param language: epub和html的语言
+    :return: 导出统计
+    """
+    for fmt in formats:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown export format: {fmt}, available: {list(EXPORT_FORMATS)}"
+            )
+    if not isinstance(translates, TranslationTable):
+        translates = TranslationTable(translates)
+    if line_index is None:
+        line_index = NovelLineIndex()
+    if workers is None:
+        if len(novel.chapters) >= _PARALLEL_MIN_CHAPTERS:
+            workers = os.cpu_count() or 1
+        else:
+            workers = 0
+    kinds: List[str] = []
+    if "md" in formats:
+        kinds.append("md")
+    if "html" in formats or "epub" in formats:
+        kinds.append("html")
+
+    writers: List[Any] = []
+    if "md" in formats:
+        writers.append(_MarkdownWriter(f"{out_base}.md", novel, translates))
+    if "html" in formats:
+        writers.append(_HtmlWriter(f"{out_base}.html", novel, translates, language))
+    if "epub" in formats:
+        writers.append(
+            _EpubWriter(
+                f"{out_base}.epub",
+                novel,
+                translates,
+                language,
+                os.path.dirname(os.path.abspath(out_base)),
+            )
+        )
+
+    counts = {"rendered": 0, "cached": 0}
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for rendered in _iter_rendered(
+            novel,
+            translates,
+            line_index,
+            tuple(kinds),
+            cache,
+            executor,
+            max(workers, 1) * 2,
+            counts,
+        ):
+            for writer in writers:
+                writer.add(rendered)
+        for writer in writers:
+            writer.close()
+    except BaseException:
+        for writer in writers:
+            try:
+                writer.abort()
+            except OSError:
+                pass
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if cache is not None:
+            cache.commit()
+
+    return ExportStats(
+        counts["rendered"] + counts["cached"], counts["rendered"], counts["cached"]
+    )
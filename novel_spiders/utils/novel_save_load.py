@@ -1,7 +1,160 @@
 import json
-from typing import Dict, List, Optional
+import re
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
+
+from novel_spiders.entities.compact_novel import (
+    CompactNovel,
+    LineTable,
+    compact_chapter_from_pairs,
+)
+
+if TYPE_CHECKING:
+    from novel_spiders.entities.novel import ChapterContent, Novel
+
+# 导出函数只读取属性，也接受紧凑表示（可按需逐章加载）
+# pydantic模型只在需要时导入，只导出的命令不加载pydantic
+NovelLike = Union["Novel", CompactNovel]
+
+# 行分类
+LINE_TEXT = 0
+LINE_BLANK = 1
+LINE_IMAGE = 2
+# 只有标点符号、数字或以#开头，不需要翻译
+LINE_SKIP = 3
+
+_SKIP_CHARS = ".,:;!?。，：；！？ #1234567890＊-+=()*♥"
+# 去掉首尾空白后整行匹配
+_SKIP_LINE_PATTERN = re.compile(
+    r"(?:#|img:).*|[" + re.escape(_SKIP_CHARS) + r"]*", re.DOTALL
+)
+# 首字符不在其中的非空行一定是普通文本，不必再匹配正则
+_SPECIAL_FIRST_CHARS = frozenset(_SKIP_CHARS + "i")
+
+
+class TranslationTable:
+    """预处理过的翻译内容，去掉空翻译，保存去掉首尾空白后的文本供比较"""
+
+    __slots__ = ("_entries",)
+
+    def __init__(self, translates: Dict[str, str]):
+        """
+        :param translates: json key到翻译的字典
+        """
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        for key, translate in translates.items():
+            if not isinstance(translate, str):
+                continue
+            stripped = translate.strip()
+            if stripped:
+                self._entries[key] = (translate, stripped)
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """获取翻译
+        :param key: json key
+        :return: (翻译, 去掉首尾空白的翻译)，没有时为None
+        """
+        return self._entries.get(key)
+
+    def select(self, keys: Iterable[str]) -> Dict[str, str]:
+        """取出一组key的翻译，没有翻译的key跳过
+        :param keys: json key
+        :return: json key到翻译的字典，可再构造为TranslationTable
+        """
+        entries = self._entries
+        return {key: entries[key][0] for key in keys if key in entries}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+Translates = Union[Dict[str, str], TranslationTable]
+
+
+class _SectionIndex(NamedTuple):
+    """章前、本体或章后内容的json key和行分类"""
+
+    keys: List[str]
+    kinds: bytes
+
+
+class ChapterLineIndex(NamedTuple):
+    """一章的json key和行分类"""
+
+    ep_key: str
+    title_key: str
+    prepend: _SectionIndex
+    contents: _SectionIndex
+    append: _SectionIndex
+
+
+class NovelLineIndex:
+    """小说的行索引，每章第一次用到时生成，之后的导出直接复用"""
+
+    __slots__ = ("_chapters",)
+
+    def __init__(self):
+        self._chapters: Dict[int, ChapterLineIndex] = {}
+
+    def chapter(self, chapter) -> ChapterLineIndex:
+        """获取章节的行索引
+        :param chapter: 章节对象（Chapter或CompactChapter）
+        :return: 行索引
+        """
+        index = self._chapters.get(chapter.index)
+        if index is None:
+            index = _build_chapter_index(chapter)
+            self._chapters[chapter.index] = index
+        return index
+
+
+def _build_chapter_index(chapter) -> ChapterLineIndex:
+    prefix = f"ch-{chapter.index}-"
+    sections = []
+    for contents in (
+        chapter.prepend_contents,
+        chapter.contents,
+        chapter.append_contents,
+    ):
+        if isinstance(contents, LineTable):
+            keys, texts = contents.keys, contents.texts
+        else:
+            keys = [content.key for content in contents]
+            texts = [content.content for content in contents]
+        sections.append(
+            _SectionIndex(
+                [prefix + key for key in keys], bytes(map(_classify_line, texts))
+            )
+        )
+    return ChapterLineIndex(
+        _get_ch_ep_json_key(chapter.index),
+        _get_ch_title_json_key(chapter.index),
+        *sections,
+    )
+
 
-from novel_spiders.entities.novel import ChapterContent, Novel
+def _classify_line(line: str) -> int:
+    """行分类，只做一次strip"""
+    stripped = line.strip()
+    if not stripped:
+        return LINE_BLANK
+    if stripped[0] not in _SPECIAL_FIRST_CHARS:
+        return LINE_TEXT
+    if stripped.startswith("img:"):
+        return LINE_IMAGE
+    if _SKIP_LINE_PATTERN.fullmatch(stripped):
+        return LINE_SKIP
+    return LINE_TEXT
 
 
 def load_json_dict(json_str: str) -> Dict:
@@ -9,63 +162,205 @@ def load_json_dict(json_str: str) -> Dict:
     return json.loads(json_str)
 
 
-def novel_to_json(novel: Novel) -> str:
+def novel_to_json(novel: "Novel") -> str:
     """将小说对象转换为json字符串"""
     # return json.dumps(novel, default=lambda o: o.__dict__, ensure_ascii=False, indent=4)
     return novel.model_dump_json(indent=4)
 
 
-def load_novel_from_json(json_str: str) -> Novel:
+def write_novel_json(novel: NovelLike, file: TextIO) -> None:
+    """将小说对象逐章写入json文件，内容与novel_to_json一致，不生成整个json字符串
+    :param novel: 小说对象，紧凑表示按需加载的章节写完即可释放
+    :param file: 以文本模式打开的文件
+    """
+    file.write("{\n")
+    for name in ("title", "description", "author"):
+        file.write(f"    {json.dumps(name)}: ")
+        file.write(json.dumps(getattr(novel, name), ensure_ascii=False))
+        file.write(",\n")
+    file.write('    "chapters": [')
+    first = True
+    for chapter in novel.chapters:
+        data = {
+            "index": chapter.index,
+            "title": chapter.title,
+            "ep_title": chapter.ep_title,
+            "prepend_contents": _contents_to_dicts(chapter.prepend_contents),
+            "contents": _contents_to_dicts(chapter.contents),
+            "append_contents": _contents_to_dicts(chapter.append_contents),
+            "updated_at": chapter.updated_at,
+        }
+        text = json.dumps(data, ensure_ascii=False, indent=4)
+        file.write("\n        " if first else ",\n        ")
+        file.write(text.replace("\n", "\n        "))
+        first = False
+    file.write("]\n}" if first else "\n    ]\n}")
+
+
+def _contents_to_dicts(contents) -> List[Dict[str, str]]:
+    """内容行（ChapterContent列表或LineTable）转换为json对象列表"""
+    return [{"key": content.key, "content": content.content} for content in contents]
+
+
+def load_novel_from_json(json_str: str) -> "Novel":
     """从json字符串中加载小说对象"""
+    from novel_spiders.entities.novel import Novel
+
     return Novel.model_validate_json(json_str)
 
 
-def novel_to_translatable_json(novel: Novel) -> str:
+def load_compact_novel_from_json(json_str: str) -> CompactNovel:
+    """从json字符串中加载紧凑小说，不经过pydantic校验，用于只导出的路径
+    :param json_str: novel_to_json保存的json
+    :return: 紧凑小说
+    """
+    data = json.loads(json_str)
+    chapters = []
+    for chapter in data["chapters"]:
+        sections = tuple(
+            [(c["key"], c["content"]) for c in chapter[name]]
+            for name in ("prepend_contents", "contents", "append_contents")
+        )
+        chapters.append(
+            compact_chapter_from_pairs(
+                chapter["index"],
+                chapter["title"],
+                chapter["ep_title"],
+                chapter.get("updated_at", ""),
+                sections,
+            )
+        )
+    return CompactNovel(
+        title=data["title"],
+        description=data["description"],
+        author=data["author"],
+        chapters=chapters,
+    )
+
+
+def novel_to_translatable_json(
+    novel: NovelLike, line_index: Optional[NovelLineIndex] = None
+) -> str:
     """将小说对象转换为适合翻译的json格式
     :param novel: 小说对象
+    :param line_index: 行索引，与其他导出共用时传入
     :return: json字符串
     """
-    data = {
-        "title": novel.title,
-        "description": novel.description,
-        # "author": novel.author,
-    }
+    data = dict(iter_translatable_lines(novel, line_index))
+    return json.dumps(data, ensure_ascii=False, indent=4)
+
+
+def iter_translatable_lines(
+    novel: NovelLike, line_index: Optional[NovelLineIndex] = None
+) -> Iterator[Tuple[str, str]]:
+    """按章节索引顺序生成需要翻译的(json key, 原文)
+    :param novel: 小说对象
+    :param line_index: 行索引，与其他导出共用时传入
+    :return: (json key, 原文)的迭代器
+    """
+    if line_index is None:
+        line_index = NovelLineIndex()
+    yield "title", novel.title
+    yield "description", novel.description
+    # yield "author", novel.author
 
     # 按章节索引排序
     sorted_chapters = sorted(novel.chapters, key=lambda c: c.index)
 
     for chapter in sorted_chapters:
+        index = line_index.chapter(chapter)
         # 添加章节信息
         # 大章节标题不翻译
-        # data[_get_ch_ep_json_key(chapter.index)] = chapter.ep_title
-        data[_get_ch_title_json_key(chapter.index)] = chapter.title
+        # yield index.ep_key, chapter.ep_title
+        yield index.title_key, chapter.title
+
+        # 章前、本体、章后内容
+        for contents, section in (
+            (chapter.prepend_contents, index.prepend),
+            (chapter.contents, index.contents),
+            (chapter.append_contents, index.append),
+        ):
+            for content, key, kind in zip(contents, section.keys, section.kinds):
+                if kind == LINE_TEXT:
+                    yield key, content.content
+
+
+def novel_to_markdown(
+    novel: NovelLike,
+    translates: Translates,
+    line_index: Optional[NovelLineIndex] = None,
+) -> str:
+    """将小说对象带翻译转换为markdown格式
+    :param novel: 小说对象
+    :param translates: 翻译内容
+    :param line_index: 行索引，与其他导出共用时传入
+    :return: markdown字符串，前面带yaml头
+    """
+    return "".join(iter_novel_markdown(novel, translates, line_index))
 
-        # 处理前置内容
-        for content in chapter.prepend_contents:
-            if _is_skip_line(content.content):
-                continue
-            data[_get_ch_line_json_key(content, chapter.index)] = content.content
 
-        # 处理主要内容
-        for content in chapter.contents:
-            if _is_skip_line(content.content):
-                continue
-            data[_get_ch_line_json_key(content, chapter.index)] = content.content
+def write_novel_markdown(
+    novel: NovelLike,
+    translates: Translates,
+    file: TextIO,
+    line_index: Optional[NovelLineIndex] = None,
+) -> None:
+    """将小说对象带翻译逐章写入文件，不生成整个markdown字符串
+    :param novel: 小说对象
+    :param translates: 翻译内容
+    :param file: 以文本模式打开的文件
+    :param line_index: 行索引，与其他导出共用时传入
+    """
+    for text in iter_novel_markdown(novel, translates, line_index):
+        file.write(text)
 
-        # 处理追加内容
-        for content in chapter.append_contents:
-            if _is_skip_line(content.content):
-                continue
-            data[_get_ch_line_json_key(content, chapter.index)] = content.content
 
-    return json.dumps(data, ensure_ascii=False, indent=4)
+def iter_novel_markdown(
+    novel: NovelLike,
+    translates: Translates,
+    line_index: Optional[NovelLineIndex] = None,
+) -> Iterator[str]:
+    """逐章生成markdown文本，拼接后与novel_to_markdown一致
+    :param novel: 小说对象
+    :param translates: 翻译内容
+    :param line_index: 行索引，与其他导出共用时传入
+    :return: 文本片段的迭代器，每次一章（第一段为yaml头、标题和简介）
+    """
+    if not isinstance(translates, TranslationTable):
+        translates = TranslationTable(translates)
+    if line_index is None:
+        line_index = NovelLineIndex()
+    first = True
+    for lines in _iter_markdown_blocks(novel, translates, line_index):
+        if not lines:
+            continue
+        if first:
+            first = False
+            yield "\n".join(lines)
+        else:
+            yield "\n" + "\n".join(lines)
+
+
+def _iter_markdown_blocks(
+    novel: NovelLike, translates: TranslationTable, line_index: NovelLineIndex
+) -> Iterator[List[str]]:
+    """按章生成markdown行列表，内存中只保留当前章节的行"""
+    yield markdown_header_lines(novel, translates)
 
+    current_ep = ""
+    for chapter in novel.chapters:
+        show_ep = current_ep != chapter.ep_title
+        current_ep = chapter.ep_title
+        yield chapter_markdown_lines(
+            chapter, line_index.chapter(chapter), translates, show_ep
+        )
 
-def novel_to_markdown(novel: Novel, translates: Dict[str, str]) -> str:
-    """将小说对象带翻译转换为markdown格式
+
+def markdown_header_lines(novel: NovelLike, translates: TranslationTable) -> List[str]:
+    """markdown的yaml头、标题和简介
     :param novel: 小说对象
     :param translates: 翻译内容
-    :return: markdown字符串，前面带yaml头
+    :return: 行列表
     """
     lines: List[str] = []
 
@@ -83,108 +378,115 @@ def novel_to_markdown(novel: Novel, translates: Dict[str, str]) -> str:
     # 标题和简介
     _append_content_and_translate(f"# {novel.title}", "title", translates, lines)
     _append_content_and_translate(novel.description, "description", translates, lines)
-
-    current_ep = ""
-    for chapter in novel.chapters:
-        if current_ep != chapter.ep_title:
-            current_ep = chapter.ep_title
-            _append_content_and_translate(
-                f"# {current_ep}", _get_ch_ep_json_key(chapter.index), translates, lines
-            )
-
+    return lines
+
+
+def chapter_markdown_lines(
+    chapter,
+    index: ChapterLineIndex,
+    translates: TranslationTable,
+    show_ep: bool,
+) -> List[str]:
+    """一章的markdown行，只依赖本章内容和翻译，可单独渲染
+    :param chapter: 章节对象（Chapter或CompactChapter）
+    :param index: 章节的行索引
+    :param translates: 翻译内容
+    :param show_ep: 是否在章节前输出大章节标题（与上一章的大章节不同时）
+    :return: 行列表
+    """
+    lines: List[str] = []
+    if show_ep:
         _append_content_and_translate(
-            f"## {chapter.title}",
-            _get_ch_title_json_key(chapter.index),
-            translates,
-            lines,
+            f"# {chapter.ep_title}", index.ep_key, translates, lines
         )
 
-        last_blank = False
-        if len(chapter.prepend_contents) > 0:
-            for content in chapter.prepend_contents:
-                last_blank = _append_content_line(
-                    content, lines, last_blank, chapter.index, translates
-                )
+    _append_content_and_translate(
+        f"## {chapter.title}", index.title_key, translates, lines
+    )
 
-            if not last_blank:
-                lines.append("")
-            lines.append("--------------------")
-            last_blank = False
+    last_blank = False
+    if len(chapter.prepend_contents) > 0:
+        last_blank = _append_section(
+            chapter.prepend_contents, index.prepend, lines, last_blank, translates
+        )
 
-        for content in chapter.contents:
-            last_blank = _append_content_line(
-                content, lines, last_blank, chapter.index, translates
-            )
+        if not last_blank:
+            lines.append("")
+        lines.append("--------------------")
+        last_blank = False
 
-        if len(chapter.append_contents) > 0:
-            if not last_blank:
-                lines.append("")
-            lines.append("--------------------")
-            last_blank = False
-            for content in chapter.append_contents:
-                last_blank = _append_content_line(
-                    content, lines, last_blank, chapter.index, translates
-                )
+    last_blank = _append_section(
+        chapter.contents, index.contents, lines, last_blank, translates
+    )
 
+    if len(chapter.append_contents) > 0:
         if not last_blank:
             lines.append("")
-    return "\n".join(lines)
+        lines.append("--------------------")
+        last_blank = False
+        last_blank = _append_section(
+            chapter.append_contents, index.append, lines, last_blank, translates
+        )
+
+    if not last_blank:
+        lines.append("")
+    return lines
 
 
-def _append_content_line(
-    content: ChapterContent,
+def _append_section(
+    contents,
+    section: _SectionIndex,
     lines: List[str],
     last_blank: bool,
-    index: int,
-    translates: Dict[str, str],
+    translates: TranslationTable,
 ) -> bool:
-    """添加章节内容行
-    :param content: 章节内容
+    """添加章前、本体或章后的所有行
+    :param contents: 内容行（ChapterContent列表或LineTable）
+    :param section: 对应的行索引
     :param lines: 行列表
     :param last_blank: 上一行是否是空行
-    :param index: 章节索引
     :param translates: 翻译内容
-    :return: 当前行是否是空行
+    :return: 最后一行是否是空行
     """
-    if _is_blank_line(content.content):
-        lines.append("")
-        last_blank = True
-    elif _is_image_line(content.content):
-        img_content = content.content.lstrip("img: ")
-        lines.append(img_content)
-        last_blank = False
-    else:
-        _append_content_and_translate(
-            content.content,
-            _get_ch_line_json_key(content, index),
-            translates,
-            lines,
-            prepend_blank_line=not last_blank,
-        )
+    # 逐行调用的热点，内联添加内容和翻译
+    append = lines.append
+    get_translate = translates.get
+    for content, key, kind in zip(contents, section.keys, section.kinds):
+        if kind == LINE_BLANK:
+            append("")
+            last_blank = True
+            continue
+        text = content.content
+        if kind == LINE_IMAGE:
+            append(text.lstrip("img: "))
+        else:
+            if not last_blank:
+                append("")
+            append(text)
+            translate = get_translate(key)
+            # 翻译和原文不一致时才添加翻译
+            if translate is not None and translate[1] != text.strip():
+                append("")
+                append(translate[0])
         last_blank = False
-
     return last_blank
 
 
-def _get_translate(key: str, translates: Dict[str, str]) -> Optional[str]:
-    """获取翻译内容"""
-    return translates.get(key, None)
-
-
-def _append_translate_if_exist(key: str, translates: Dict[str, str], lines: List[str]):
+def _append_translate_if_exist(
+    key: str, translates: TranslationTable, lines: List[str]
+):
     """如果翻译存在则添加到lines"""
-    translate = _get_translate(key, translates)
-    ori = lines[-1].strip()
+    translate = translates.get(key)
     # 翻译和原文不一致时才添加翻译
-    if translate is not None and translate.strip() and translate.strip() != ori:
+    if translate is not None and translate[1] != lines[-1].strip():
         lines.append("")
-        lines.append(translate)
+        lines.append(translate[0])
 
 
 def _append_content_and_translate(
     content: str,
     key: str,
-    translates: Dict[str, str],
+    translates: TranslationTable,
     lines: List[str],
     prepend_blank_line: bool = True,
 ):
@@ -195,7 +497,7 @@ def _append_content_and_translate(
     _append_translate_if_exist(key, translates, lines)
 
 
-def _get_ch_line_json_key(content: ChapterContent, index: int) -> str:
+def _get_ch_line_json_key(content: "ChapterContent", index: int) -> str:
     """获取章节内容的json key"""
     return f"ch-{index}-{content.key}"
 
@@ -212,20 +514,14 @@ def _get_ch_title_json_key(index: int) -> str:
 
 def _is_skip_line(line: str) -> bool:
     """判断是否是需要跳过的行"""
-    return (
-        line.strip() == ""
-        or line.strip().startswith("#")
-        or line.strip().startswith("img:")
-        # 行内容只有纯粹的标点符号或数字时也跳过
-        or all(c in ".,:;!?。，：；！？ #1234567890＊-+=()*♥" for c in line.strip())
-    )
+    return _classify_line(line) != LINE_TEXT
 
 
 def _is_blank_line(line: str) -> bool:
     """判断是否是空行"""
-    return line.strip() == ""
+    return _classify_line(line) == LINE_BLANK
 
 
 def _is_image_line(line: str) -> bool:
     """判断是否是图片行"""
-    return line.strip().startswith("img:")
+    return _classify_line(line) == LINE_IMAGE
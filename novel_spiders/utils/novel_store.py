@@ -0,0 +1,424 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, TYPE_CHECKING
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+from novel_spiders.entities.compact_novel import (
+    CompactChapter,
+    CompactNovel,
+    LazyChapters,
+    compact_chapter_from_pairs,
+)
+
+if TYPE_CHECKING:
+    from novel_spiders.entities.novel import Chapter, Novel
+
+# 按章节索引查询摘要时IN列表的最大长度，低于旧版SQLite的参数个数上限（999）
+_MAX_QUERY_INDEXES = 500
+# 逐章读取时每次从游标取出的行数
+_ITER_BATCH_SIZE = 64
+
+
+class NovelStore:
+    """小说存储（SQLite）
+    小说信息和章节分表保存，每章的内容行压缩为一个块，
+    可单独读取某一章、只写入有变化的章节，不必读写整个小说
+
+    用法：
+        with NovelStore("./data/novels.sqlite3") as store:
+            store.save_novel("n0609jx", novel)
+            chapter = store.load_chapter("n0609jx", 1)
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 数据库文件路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 导出可能在其他线程中按需读取章节，连接由锁保护
+        self._lock = threading.RLock()
+        # 分布式采集时多个工作进程同时写入，等待其他进程的写锁
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS novels (
+                code TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                author TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chapters (
+                code TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                ep_title TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (code, idx)
+            );
+            """)
+        self._db.commit()
+
+    def __enter__(self) -> "NovelStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭数据库"""
+        with self._lock:
+            self._db.close()
+
+    def codes(self) -> List[str]:
+        """已保存的小说编号"""
+        with self._lock:
+            rows = self._db.execute("SELECT code FROM novels ORDER BY code").fetchall()
+        return [row[0] for row in rows]
+
+    def has_novel(self, code: str) -> bool:
+        """是否已保存该小说"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM novels WHERE code = ?", (code,)
+            ).fetchone()
+        return row is not None
+
+    def save_novel(self, code: str, novel: "Novel") -> int:
+        """保存小说，只写入内容有变化的章节，删除小说中已不存在的章节
+        :param code: 小说编号
+        :param novel: 小说对象
+        :return: 写入的章节数
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO novels (code, title, description, author)"
+                " VALUES (?, ?, ?, ?)",
+                (code, novel.title, novel.description, novel.author),
+            )
+            stored = dict(
+                self._db.execute(
+                    "SELECT idx, digest FROM chapters WHERE code = ?", (code,)
+                ).fetchall()
+            )
+            written = self._write_chapters(code, novel.chapters, stored)
+            removed = set(stored) - {chapter.index for chapter in novel.chapters}
+            self._db.executemany(
+                "DELETE FROM chapters WHERE code = ? AND idx = ?",
+                [(code, index) for index in removed],
+            )
+        return written
+
+    def save_chapters(self, code: str, chapters: Sequence["Chapter"]) -> int:
+        """写入或替换部分章节，小说需已保存
+        :param code: 小说编号
+        :param chapters: 章节列表
+        :return: 写入的章节数
+        """
+        if not self.has_novel(code):
+            raise Exception(f"Novel not found in store: {code}")
+        return self.put_chapters(code, chapters)
+
+    def put_chapters(self, code: str, chapters: Sequence["Chapter"]) -> int:
+        """写入或替换部分章节，不要求小说已保存
+        流式采集时逐批写入，全部写完后用finish_novel保存小说信息，
+        中途崩溃时已写入的章节保留，重新采集时按chapter_versions跳过
+        :param code: 小说编号
+        :param chapters: 章节列表
+        :return: 写入的章节数
+        """
+        if not chapters:
+            return 0
+        indexes = [chapter.index for chapter in chapters]
+        with self._lock, self._db:
+            if len(indexes) > _MAX_QUERY_INDEXES:
+                rows = self._db.execute(
+                    "SELECT idx, digest FROM chapters WHERE code = ?", (code,)
+                ).fetchall()
+            else:
+                # 只查询本批章节的摘要，逐批写入时不必每次读取整部小说的摘要
+                rows = self._db.execute(
+                    "SELECT idx, digest FROM chapters WHERE code = ?"
+                    f" AND idx IN ({', '.join('?' * len(indexes))})",
+                    (code, *indexes),
+                ).fetchall()
+            return self._write_chapters(code, chapters, dict(rows))
+
+    def finish_novel(
+        self, code: str, title: str, description: str, author: str, indexes: List[int]
+    ) -> int:
+        """保存小说信息，删除目录中已不存在的章节，流式写入完章节后调用
+        :param code: 小说编号
+        :param title: 标题
+        :param description: 简介
+        :param author: 作者
+        :param indexes: 目录中的章节索引
+        :return: 删除的章节数
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO novels (code, title, description, author)"
+                " VALUES (?, ?, ?, ?)",
+                (code, title, description, author),
+            )
+            stored = self._db.execute(
+                "SELECT idx FROM chapters WHERE code = ?", (code,)
+            ).fetchall()
+            removed = {row[0] for row in stored} - set(indexes)
+            self._db.executemany(
+                "DELETE FROM chapters WHERE code = ? AND idx = ?",
+                [(code, index) for index in removed],
+            )
+        return len(removed)
+
+    def _write_chapters(
+        self, code: str, chapters: Sequence["Chapter"], stored: Dict[int, str]
+    ) -> int:
+        """写入摘要与已保存的不同的章节
+        :param stored: 已保存章节的索引到摘要
+        :return: 写入的章节数
+        """
+        rows = []
+        for chapter in chapters:
+            raw = _encode_contents(chapter)
+            # 标题等元数据也计入摘要，任一变化都重新写入
+            meta = json.dumps(
+                [chapter.title, chapter.ep_title, chapter.updated_at],
+                ensure_ascii=False,
+            )
+            digest = hashlib.sha1(meta.encode("utf-8") + b"\n" + raw).hexdigest()
+            if stored.get(chapter.index) == digest:
+                continue
+            rows.append(
+                (
+                    code,
+                    chapter.index,
+                    chapter.title,
+                    chapter.ep_title,
+                    chapter.updated_at,
+                    digest,
+                    zlib.compress(raw),
+                )
+            )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO chapters"
+            " (code, idx, title, ep_title, updated_at, digest, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def _info_row(self, code: str) -> Optional[Tuple[str, str, str]]:
+        """小说信息的(标题, 简介, 作者)，未保存时为None"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT title, description, author FROM novels WHERE code = ?",
+                (code,),
+            ).fetchone()
+
+    def load_info(self, code: str) -> Optional["Novel"]:
+        """只读取小说信息，不读取章节
+        :param code: 小说编号
+        :return: 章节列表为空的小说对象，未保存时为None
+        """
+        from novel_spiders.entities.novel import Novel
+
+        row = self._info_row(code)
+        if row is None:
+            return None
+        title, description, author = row
+        return Novel(title=title, description=description, author=author, chapters=[])
+
+    def load_novel(self, code: str) -> Optional["Novel"]:
+        """读取整部小说
+        :param code: 小说编号
+        :return: 小说对象，未保存时为None
+        """
+        novel = self.load_info(code)
+        if novel is None:
+            return None
+        novel.chapters = list(self.iter_chapters(code))
+        return novel
+
+    def chapter_indexes(self, code: str) -> List[int]:
+        """已保存的章节索引"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx FROM chapters WHERE code = ? ORDER BY idx", (code,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def chapter_versions(self, code: str) -> Dict[int, str]:
+        """已保存章节的索引到更新时间，不读取章节内容
+        小说信息未保存时（流式采集中断）也返回已写入的章节
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, updated_at FROM chapters WHERE code = ?", (code,)
+            ).fetchall()
+        return dict(rows)
+
+    def set_chapter_versions(self, code: str, versions: Dict[int, str]) -> None:
+        """只更新已保存章节的更新时间，不改动内容，用于给旧数据补上目录中的更新时间
+        :param code: 小说编号
+        :param versions: 章节索引到更新时间
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE chapters SET updated_at = ? WHERE code = ? AND idx = ?",
+                [(version, code, index) for index, version in versions.items()],
+            )
+
+    def load_chapter(self, code: str, index: int) -> Optional["Chapter"]:
+        """读取单个章节
+        :param code: 小说编号
+        :param index: 章节索引
+        :return: 章节对象，不存在时为None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT idx, title, ep_title, updated_at, data FROM chapters"
+                " WHERE code = ? AND idx = ?",
+                (code, index),
+            ).fetchone()
+        return None if row is None else _decode_chapter(*row)
+
+    def iter_chapters(self, code: str) -> Iterator["Chapter"]:
+        """按索引顺序逐章读取，只执行一次查询
+        :param code: 小说编号
+        :return: 章节对象的迭代器
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT idx, title, ep_title, updated_at, data FROM chapters"
+                " WHERE code = ? ORDER BY idx",
+                (code,),
+            )
+        try:
+            while True:
+                # 一次查询，逐批取出并解码，不把整部小说的原始数据读入内存
+                with self._lock:
+                    rows = cursor.fetchmany(_ITER_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _decode_chapter(*row)
+        finally:
+            cursor.close()
+
+    def load_compact_chapter(self, code: str, index: int) -> Optional[CompactChapter]:
+        """读取单个章节为紧凑表示，不经过pydantic校验
+        :param code: 小说编号
+        :param index: 章节索引
+        :return: 紧凑章节，不存在时为None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT idx, title, ep_title, updated_at, data FROM chapters"
+                " WHERE code = ? AND idx = ?",
+                (code, index),
+            ).fetchone()
+        if row is None:
+            return None
+        index, title, ep_title, updated_at, data = row
+        return compact_chapter_from_pairs(
+            index, title, ep_title, updated_at, json.loads(zlib.decompress(data))
+        )
+
+    def load_compact(
+        self, code: str, keep_loaded: bool = False
+    ) -> Optional[CompactNovel]:
+        """读取小说为紧凑表示，章节在访问时才从数据库加载，不经过pydantic
+        :param code: 小说编号
+        :param keep_loaded: 是否保留已加载的章节，为False时遍历导出只占一章的内存
+        :return: 紧凑小说，未保存时为None
+        """
+        row = self._info_row(code)
+        if row is None:
+            return None
+        title, description, author = row
+
+        def load(index: int) -> CompactChapter:
+            chapter = self.load_compact_chapter(code, index)
+            if chapter is None:
+                raise Exception(f"Chapter {index} of {code} not found in store")
+            return chapter
+
+        return CompactNovel(
+            title=title,
+            description=description,
+            author=author,
+            chapters=LazyChapters(self.chapter_indexes(code), load, keep_loaded),
+        )
+
+    def delete_novel(self, code: str) -> None:
+        """删除小说及其章节"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM chapters WHERE code = ?", (code,))
+            self._db.execute("DELETE FROM novels WHERE code = ?", (code,))
+
+    def migrate_json(self, code: str, json_path: str) -> "Novel":
+        """从旧的{code}.json导入，原文件保留
+        :param code: 小说编号
+        :param json_path: json文件路径
+        :return: 导入的小说对象
+        """
+        from novel_spiders.entities.novel import Novel
+
+        with io.open(json_path, "r", encoding="utf-8") as f:
+            novel = Novel.model_validate_json(f.read())
+        self.save_novel(code, novel)
+        return novel
+
+    def migrate_data_root(self, data_root: str) -> List[str]:
+        """导入数据目录下所有./{code}/{code}.json，已导入的跳过
+        :param data_root: 数据根目录，如./data
+        :return: 导入的小说编号
+        """
+        migrated = []
+        for code in sorted(os.listdir(data_root)):
+            json_path = os.path.join(data_root, code, f"{code}.json")
+            if not os.path.isfile(json_path) or self.has_novel(code):
+                continue
+            try:
+                self.migrate_json(code, json_path)
+            except Exception as e:
+                print(f"Error migrating {json_path}: {e}")
+                continue
+            migrated.append(code)
+        return migrated
+
+
+def _encode_contents(chapter: "Chapter") -> bytes:
+    """章前、本体、章后的内容行编码为[[key, content], ...]三元组json"""
+    data = [
+        [[c.key, c.content] for c in contents]
+        for contents in (
+            chapter.prepend_contents,
+            chapter.contents,
+            chapter.append_contents,
+        )
+    ]
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_chapter(
+    index: int, title: str, ep_title: str, updated_at: str, data: bytes
+) -> "Chapter":
+    from novel_spiders.entities.novel import Chapter, ChapterContent
+
+    prepend, contents, append = json.loads(zlib.decompress(data))
+    return Chapter(
+        index=index,
+        title=title,
+        ep_title=ep_title,
+        updated_at=updated_at,
+        prepend_contents=[ChapterContent(key=k, content=c) for k, c in prepend],
+        contents=[ChapterContent(key=k, content=c) for k, c in contents],
+        append_contents=[ChapterContent(key=k, content=c) for k, c in append],
+    )
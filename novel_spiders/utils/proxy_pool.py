@@ -0,0 +1,214 @@
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit, urlunsplit
+import asyncio
+import itertools
+import time
+
+# 选择代理的策略
+PROXY_STRATEGIES = ("least_outstanding", "latency")
+
+
+class ProxyState:
+    """代理的状态和统计"""
+
+    __slots__ = (
+        "url",
+        "outstanding",
+        "latency",
+        "failures",
+        "ejections",
+        "ejected_until",
+        "requests",
+        "errors",
+        "_order",
+    )
+
+    def __init__(self, url: str, order: int):
+        """
+        :param url: 代理，为空字符串时直连
+        :param order: 顺序，负载相同时轮流选择
+        """
+        self.url = url
+        self.outstanding = 0
+        # 平滑延迟（秒），还没有成功的请求时为None
+        self.latency: Optional[float] = None
+        # 连续失败次数
+        self.failures = 0
+        # 连续被剔除的次数，每次剔除时间加倍
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._order = order
+
+    @property
+    def label(self) -> str:
+        """去掉用户名和密码的代理，用于日志和指标"""
+        if not self.url:
+            return "direct"
+        parts = urlsplit(self.url)
+        host = parts.hostname or ""
+        if parts.port is not None:
+            host = f"{host}:{parts.port}"
+        return urlunsplit((parts.scheme, host, parts.path, "", ""))
+
+    def is_ejected(self, now: Optional[float] = None) -> bool:
+        """是否暂时被剔除"""
+        return self.ejected_until > (time.monotonic() if now is None else now)
+
+
+class ProxyPool:
+    """代理池，把请求分摊到多个出口
+    - least_outstanding：选择进行中（含等待限流）的请求最少的代理
+    - latency：选择 (进行中的请求数 + 1) * 平滑延迟 最小的代理，即预计最快完成的代理
+    连续失败或被限流（429/503）的代理暂时剔除，期满后自动恢复，也可由健康检查恢复
+
+    用法：
+        pool = ProxyPool(["socks5://127.0.0.1:8866", "socks5://127.0.0.1:8867"])
+        client = AsyncHttpClient(proxy_pool=pool)
+    """
+
+    def __init__(
+        self,
+        proxies: Iterable[str],
+        strategy: str = "least_outstanding",
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 600.0,
+    ):
+        """
+        :param proxies: 代理列表，空字符串表示直连，重复的忽略
+        :param strategy: 选择策略，见PROXY_STRATEGIES
+        :param max_failures: 连续失败多少次后剔除
+        :param eject_seconds: 第一次剔除的时间（秒），之后每次连续剔除加倍
+        :param max_eject_seconds: 剔除时间上限（秒）
+        """
+        urls = list(dict.fromkeys(p.strip() for p in proxies))
+        if not urls:
+            raise ValueError("ProxyPool needs at least one proxy")
+        if strategy not in PROXY_STRATEGIES:
+            raise ValueError(
+                f"Unknown proxy strategy: {strategy}, available: {list(PROXY_STRATEGIES)}"
+            )
+        self.strategy = strategy
+        self.max_failures = max(1, max_failures)
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._states = [ProxyState(url, i) for i, url in enumerate(urls)]
+        self._by_url: Dict[str, ProxyState] = {s.url: s for s in self._states}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def proxies(self) -> List[ProxyState]:
+        """所有代理的状态"""
+        return list(self._states)
+
+    def get(self, url: str) -> ProxyState:
+        """按代理网址获取状态"""
+        return self._by_url[url]
+
+    def healthy(self) -> List[ProxyState]:
+        """当前没有被剔除的代理"""
+        now = time.monotonic()
+        return [s for s in self._states if not s.is_ejected(now)]
+
+    def acquire(self, exclude: Sequence[ProxyState] = ()) -> ProxyState:
+        """选择一个代理并计入进行中的请求，请求结束后需调用release
+        全部被剔除时选择最早恢复的代理，不会因为没有可用代理而停止
+        :param exclude: 尽量不选择的代理（如本次请求已失败过的代理）
+        :return: 代理状态
+        """
+        candidates = [s for s in self.healthy() if s not in exclude]
+        if not candidates:
+            candidates = self.healthy()
+        if not candidates:
+            state = min(self._states, key=lambda s: s.ejected_until)
+        else:
+            # 负载相同时从上次选择之后的代理开始轮流，避免总是选第一个
+            start = next(self._counter) % len(self._states)
+            state = min(
+                candidates,
+                key=lambda s: (self._score(s), (s._order - start) % len(self._states)),
+            )
+        state.outstanding += 1
+        state.requests += 1
+        return state
+
+    def _score(self, state: ProxyState) -> float:
+        if self.strategy == "least_outstanding":
+            return state.outstanding
+        latency = state.latency
+        if latency is None:
+            # 还没有延迟数据的代理按已知的最小延迟估计，让新代理也能分到请求
+            known = [s.latency for s in self._states if s.latency is not None]
+            latency = min(known) if known else 0.0
+        return (state.outstanding + 1) * latency
+
+    def release(self, state: ProxyState) -> None:
+        """请求结束（成功或失败都要调用）"""
+        state.outstanding = max(0, state.outstanding - 1)
+
+    def on_success(self, state: ProxyState, latency: float) -> None:
+        """请求成功，清除失败计数并更新平滑延迟
+        :param state: 代理状态
+        :param latency: 本次请求耗时（秒）
+        """
+        state.failures = 0
+        state.ejections = 0
+        state.latency = (
+            latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+        )
+
+    def on_failure(self, state: ProxyState) -> None:
+        """连接错误、超时或代理返回的网关错误，连续失败达到上限时剔除"""
+        state.errors += 1
+        state.failures += 1
+        if state.failures >= self.max_failures:
+            self.eject(state)
+
+    def on_throttle(
+        self, state: ProxyState, retry_after: Optional[float] = None
+    ) -> None:
+        """出口被站点限流，立即剔除，至少到Retry-After给出的时间"""
+        state.errors += 1
+        self.eject(state, retry_after)
+
+    def eject(self, state: ProxyState, at_least: Optional[float] = None) -> None:
+        """暂时剔除代理，连续剔除时时间加倍
+        :param state: 代理状态
+        :param at_least: 最少剔除的时间（秒）
+        """
+        seconds = min(self.max_eject_seconds, self.eject_seconds * (2**state.ejections))
+        if at_least is not None:
+            seconds = max(seconds, at_least)
+        state.ejections += 1
+        state.failures = 0
+        state.ejected_until = max(state.ejected_until, time.monotonic() + seconds)
+        print(f"Proxy {state.label} ejected for {seconds:.0f}s")
+
+    def restore(self, state: ProxyState) -> None:
+        """健康检查通过，恢复代理"""
+        state.ejected_until = 0.0
+        state.failures = 0
+
+    async def check(
+        self, probe: Callable[[ProxyState], Awaitable[bool]]
+    ) -> Dict[str, bool]:
+        """并发检查所有代理，通过的恢复，失败的剔除
+        :param probe: 通过指定代理发出探测请求，返回是否成功
+        :return: 代理（去掉密码）到是否健康的字典
+        """
+        results = await asyncio.gather(
+            *(probe(s) for s in self._states), return_exceptions=True
+        )
+        health: Dict[str, bool] = {}
+        for state, ok in zip(self._states, results):
+            if ok is True:
+                self.restore(state)
+            elif not state.is_ejected():
+                self.eject(state)
+            health[state.label] = ok is True
+        return health
@@ -0,0 +1,213 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import random
+import time
+
+
+@dataclass
+class RateLimitConfig:
+    """限流与重试参数"""
+
+    # 每个host每秒最多发起的请求数，<=0时不限速
+    requests_per_second: float = 4.0
+    # 令牌桶容量，允许的瞬时突发请求数
+    burst: int = 4
+    # 自适应并发的下限和初始值，上限为客户端的max_concurrency
+    min_concurrency: int = 1
+    initial_concurrency: int = 2
+    # 每个并发窗口内全部成功时增加的并发数（加性增）
+    additive_increase: float = 1.0
+    # 出错、被限流或延迟突增时并发数乘以此系数（乘性减）
+    decrease_factor: float = 0.5
+    # 延迟超过平滑延迟的多少倍视为延迟突增
+    latency_spike_factor: float = 3.0
+    # 最大重试次数
+    max_retry: int = 3
+    # 指数退避的基数和上限（秒）
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+
+
+# 视为被限流或服务端过载的状态码
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = 1.0,
+    cap: float = 60.0,
+    retry_after: Optional[float] = None,
+) -> float:
+    """计算第attempt次重试前的等待时间，指数退避加全抖动
+    :param attempt: 已失败的次数，0起
+    :param base: 退避基数（秒）
+    :param cap: 退避上限（秒）
+    :param retry_after: 服务端Retry-After给出的等待时间，存在时不少于此值
+    :return: 等待秒数
+    """
+    delay = random.uniform(0, min(cap, base * (2**attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(cap, retry_after))
+    return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After头，只支持秒数格式
+    :param value: 头的值
+    :return: 等待秒数，无法解析时为None
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value.strip()))
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """令牌桶限速"""
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        :param rate: 每秒补充的令牌数，<=0时不限速
+        :param capacity: 桶容量
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """取出一个令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostLimiter:
+    """单个host的限流器：令牌桶限速 + AIMD自适应并发"""
+
+    def __init__(self, config: RateLimitConfig, max_concurrency: int):
+        """
+        :param config: 限流参数
+        :param max_concurrency: 并发上限
+        """
+        self.config = config
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(config.min_concurrency, self.max_concurrency))
+        self.limit = float(
+            max(
+                self.min_concurrency,
+                min(config.initial_concurrency, self.max_concurrency),
+            )
+        )
+        self.latency: Optional[float] = None
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._bucket = TokenBucket(config.requests_per_second, config.burst)
+        self._cond = asyncio.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        """正在进行的请求数"""
+        return self._in_flight
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个并发名额和一个令牌，退出时归还名额"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        try:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self._bucket.acquire()
+            yield
+        finally:
+            async with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        """请求成功，延迟正常时加性增加并发，延迟突增时减少并发
+        :param latency: 本次请求耗时（秒）
+        """
+        if (
+            self.latency is not None
+            and latency > self.latency * self.config.latency_spike_factor
+        ):
+            self._decrease()
+        else:
+            self.limit = min(
+                float(self.max_concurrency),
+                self.limit + self.config.additive_increase / self.limit,
+            )
+        # 平滑延迟
+        self.latency = (
+            latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        )
+
+    def on_failure(self, retry_after: Optional[float] = None) -> None:
+        """请求出错或被限流，乘性减少并发
+        :param retry_after: 服务端要求的等待时间，存在时整个host暂停
+        """
+        self._decrease()
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _decrease(self) -> None:
+        """乘性减少并发，同一个延迟窗口内只减一次，避免并发的失败把并发数压到底"""
+        now = time.monotonic()
+        window = self.latency if self.latency is not None else 1.0
+        if now - self._last_decrease < window:
+            return
+        self._last_decrease = now
+        self.limit = max(
+            float(self.min_concurrency), self.limit * self.config.decrease_factor
+        )
+
+
+class RateLimiter:
+    """按host分别限流，使用代理池时每个出口（代理）分别计算"""
+
+    def __init__(
+        self, config: Optional[RateLimitConfig] = None, max_concurrency: int = 5
+    ):
+        """
+        :param config: 限流参数
+        :param max_concurrency: 每个host的并发上限
+        """
+        self.config = config or RateLimitConfig()
+        self.max_concurrency = max_concurrency
+        self._hosts: Dict[Tuple[str, str], HostLimiter] = {}
+
+    def for_url(self, url: str, proxy: str = "") -> HostLimiter:
+        """获取url所在host的限流器
+        :param url: 网址
+        :param proxy: 经过的代理，不同出口的限流互不影响
+        """
+        key = (proxy, urlsplit(url).netloc)
+        limiter = self._hosts.get(key)
+        if limiter is None:
+            limiter = HostLimiter(self.config, self.max_concurrency)
+            self._hosts[key] = limiter
+        return limiter
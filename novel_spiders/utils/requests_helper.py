@@ -1,6 +1,36 @@
-from typing import Dict, Optional
-import requests
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+import asyncio
+import importlib.util
+import httpx
 import os
+import time
+
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.proxy_pool import ProxyPool, ProxyState
+from novel_spiders.utils.rate_limiter import (
+    RateLimitConfig,
+    RateLimiter,
+    THROTTLE_STATUS_CODES,
+    backoff_delay,
+    parse_retry_after,
+)
+from novel_spiders.utils.response_cache import ResponseCache
+
+# 下载图片时每次写入的字节数
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+
+class ConditionalPage(NamedTuple):
+    """条件请求的结果"""
+
+    # 网页内容，未修改（304）时为None
+    text: Optional[str]
+    # 下次条件请求使用的ETag和Last-Modified，未修改时为请求时的值
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
 
 
 def get_webpage(
@@ -11,14 +41,15 @@ def get_webpage(
     max_retry=3,
 ) -> Optional[str]:
     """获取网页内容"""
+    # 同步接口只有旧代码使用，requests在调用时才导入
+    import requests
+
     proxies = {} if not proxy.strip() else {"http": proxy, "https": proxy}
 
     if headers is None:
         headers = {}
     if headers.get("User-Agent") is None:
-        headers["User-Agent"] = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-        )
+        headers["User-Agent"] = DEFAULT_USER_AGENT
 
     tried = 0
     while tried < max_retry:
@@ -26,9 +57,13 @@ def get_webpage(
             resp = requests.get(url, proxies=proxies, cookies=cookies, headers=headers)
             if resp.status_code == 200:
                 return resp.text
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
         except Exception as e:
             print(f"Error: {e}")
+            retry_after = None
         tried += 1
+        if tried < max_retry:
+            time.sleep(backoff_delay(tried - 1, retry_after=retry_after))
     return None
 
 
@@ -49,25 +84,457 @@ def download_image(
     :param max_retry: 最大重试次数
     :return: 是否成功
     """
+    import requests
+
     proxies = {} if not proxy.strip() else {"http": proxy, "https": proxy}
 
     if headers is None:
         headers = {}
     if headers.get("User-Agent") is None:
-        headers["User-Agent"] = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-        )
+        headers["User-Agent"] = DEFAULT_USER_AGENT
 
     tried = 0
     while tried < max_retry:
         try:
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            resp = requests.get(url, proxies=proxies, cookies=cookies, headers=headers)
-            if resp.status_code == 200:
-                with open(save_path, "wb") as f:
-                    f.write(resp.content)
-                return True
+            with requests.get(
+                url, proxies=proxies, cookies=cookies, headers=headers, stream=True
+            ) as resp:
+                if resp.status_code == 200:
+                    # 分块写入临时文件后改名，中断时不会留下不完整的图片
+                    tmp_path = f"{save_path}.part"
+                    with open(tmp_path, "wb") as f:
+                        for chunk in resp.iter_content(IMAGE_CHUNK_SIZE):
+                            f.write(chunk)
+                    os.replace(tmp_path, save_path)
+                    return True
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
         except Exception as e:
             print(f"Error downloading image: {e}")
+            retry_after = None
         tried += 1
+        if tried < max_retry:
+            time.sleep(backoff_delay(tried - 1, retry_after=retry_after))
     return False
+
+
+def _is_permanent_failure(status_code: int) -> bool:
+    """是否是重试也不会成功的客户端错误，限流（429）和请求超时（408）除外"""
+    return (
+        400 <= status_code < 500
+        and status_code != 408
+        and status_code not in THROTTLE_STATUS_CODES
+    )
+
+
+def _http2_available() -> bool:
+    """是否安装了HTTP/2支持（h2）"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class AsyncHttpClient:
+    """异步HTTP客户端，连接池复用keep-alive连接，信息页、章节和图片共用
+    每个host单独限速并自适应调整并发，失败时指数退避重试
+    使用代理池时每个代理一个连接池，请求分摊到各代理，限速和并发按代理分别计算
+
+    用法：
+        async with AsyncHttpClient(proxy="socks5://127.0.0.1:8866") as client:
+            html = await client.get_webpage(url)
+    """
+
+    def __init__(
+        self,
+        proxy: str = "",
+        cookies: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        max_concurrency: int = 5,
+        rate_limit: Optional[RateLimitConfig] = None,
+        timeout: float = 30.0,
+        http2: bool = True,
+        cache: Optional[ResponseCache] = None,
+        metrics: Optional[Metrics] = None,
+        proxy_pool: Optional[ProxyPool] = None,
+    ):
+        """
+        :param proxy: 代理，支持http/socks5
+        :param cookies: 所有请求附带的cookies
+        :param headers: 所有请求附带的请求头
+        :param max_concurrency: 最大并发请求数，同时也是连接池大小和每个host的并发上限
+        :param rate_limit: 限流与重试参数
+        :param timeout: 单次请求超时（秒）
+        :param http2: 是否尝试使用HTTP/2，未安装h2时自动退回HTTP/1.1
+        :param cache: 网页响应缓存，为None时不缓存
+        :param metrics: 记录请求耗时、字节数、重试和缓存命中等指标，为None时不记录
+        :param proxy_pool: 代理池，传入时忽略proxy，max_concurrency为每个代理的并发上限
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        headers = dict(headers or {})
+        if headers.get("User-Agent") is None:
+            headers["User-Agent"] = DEFAULT_USER_AGENT
+
+        self.max_concurrency = max_concurrency
+        self.proxy_pool = proxy_pool
+        # 总并发数，使用代理池时随代理数增加
+        self.total_concurrency = max_concurrency * (
+            1 if proxy_pool is None else len(proxy_pool)
+        )
+        self.cache = cache
+        self.metrics = metrics
+        self._cookies = dict(cookies or {})
+        self.rate_limit = rate_limit or RateLimitConfig()
+        self.rate_limiter = RateLimiter(self.rate_limit, max_concurrency)
+        self._semaphore = asyncio.Semaphore(self.total_concurrency)
+        proxies = (
+            [proxy.strip()]
+            if proxy_pool is None
+            else [s.url for s in proxy_pool.proxies]
+        )
+        # 代理（直连为空字符串）-> 连接池
+        self._clients: Dict[str, httpx.AsyncClient] = {
+            p: httpx.AsyncClient(
+                proxy=p or None,
+                cookies=cookies,
+                headers=headers,
+                timeout=timeout,
+                http2=http2 and _http2_available(),
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency,
+                ),
+            )
+            for p in proxies
+        }
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        for client in self._clients.values():
+            await client.aclose()
+
+    def _trace_hook(self, metrics: Metrics) -> Callable[[str, dict], Awaitable[None]]:
+        """httpcore的trace回调，记录建立连接（含DNS和代理握手）、TLS握手、
+        发送请求头、等待响应头和读取响应体各阶段的耗时
+        """
+        started: Dict[str, float] = {}
+
+        async def trace(event: str, info: dict) -> None:
+            name, _, state = event.rpartition(".")
+            phase = name.rpartition(".")[2]
+            if state == "started":
+                started[phase] = time.perf_counter()
+            elif phase in started:
+                elapsed = time.perf_counter() - started.pop(phase)
+                metrics.observe("http_phase_seconds", elapsed, phase=phase)
+
+        return trace
+
+    async def _get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        consume: Optional[Callable[[httpx.Response], Awaitable[None]]] = None,
+        kind: str = "page",
+    ) -> Optional[httpx.Response]:
+        """带限流和重试的GET请求
+        :param url: 网址
+        :param headers: 本次请求额外附带的请求头，带条件请求头时304也视为成功
+        :param consume: 流式读取响应体的回调，传入时不缓存响应体，回调出错视为请求失败并重试
+        :param kind: 记录指标时的请求类型，如page、image
+        :return: 状态码200（或304）的响应，重试用尽时为None
+        """
+        ok_status = (200, 304) if headers else (200,)
+        config = self.rate_limit
+        metrics = self.metrics
+        pool = self.proxy_pool
+        extensions = {} if metrics is None else {"trace": self._trace_hook(metrics)}
+        tried = 0
+        # 本次请求失败过的代理，重试时尽量换一个
+        failed_proxies: List[ProxyState] = []
+        while tried < config.max_retry:
+            retry_after: Optional[float] = None
+            reason = ""
+            proxy = None if pool is None else pool.acquire(failed_proxies)
+            try:
+                resp = await self._send(
+                    url, headers, consume, kind, ok_status, proxy, extensions
+                )
+            finally:
+                if proxy is not None:
+                    pool.release(proxy)
+            if isinstance(resp, httpx.Response) and resp.status_code in ok_status:
+                return resp
+            if isinstance(resp, httpx.Response):
+                reason = str(resp.status_code)
+                if _is_permanent_failure(resp.status_code):
+                    # 404、403、410等重试也不会成功，不浪费请求
+                    if metrics is not None:
+                        metrics.inc(
+                            "http_retries_total",
+                            kind=kind,
+                            reason=reason,
+                            result="gave_up",
+                        )
+                    return None
+                if resp.status_code in THROTTLE_STATUS_CODES and proxy is None:
+                    # 使用代理池时被限流的代理已剔除，换代理重试不必等待
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            else:
+                reason = resp
+            if proxy is not None:
+                failed_proxies.append(proxy)
+            tried += 1
+            if metrics is not None:
+                result = "retry" if tried < config.max_retry else "gave_up"
+                metrics.inc(
+                    "http_retries_total", kind=kind, reason=reason, result=result
+                )
+            if tried < config.max_retry:
+                await asyncio.sleep(
+                    backoff_delay(
+                        tried - 1, config.backoff_base, config.backoff_max, retry_after
+                    )
+                )
+        return None
+
+    async def _send(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        consume: Optional[Callable[[httpx.Response], Awaitable[None]]],
+        kind: str,
+        ok_status: tuple,
+        proxy: Optional[ProxyState],
+        extensions: dict,
+    ) -> "httpx.Response | str":
+        """经限流器发出一次请求，并把结果反馈给限流器和代理池
+        :return: 响应，出错时为异常类型名
+        """
+        metrics = self.metrics
+        pool = self.proxy_pool
+        assert proxy is None or pool is not None
+        proxy_url = "" if proxy is None else proxy.url
+        client = self._clients[proxy_url]
+        limiter = self.rate_limiter.for_url(url, proxy_url)
+        wait_start = time.perf_counter()
+        async with limiter.slot():
+            start = time.monotonic()
+            try:
+                async with self._semaphore:
+                    sent = time.perf_counter()
+                    if metrics is not None:
+                        metrics.observe(
+                            "rate_limit_wait_seconds", sent - wait_start, kind=kind
+                        )
+                        metrics.add("http_in_flight", 1)
+                    try:
+                        request = client.build_request(
+                            "GET", url, headers=headers, extensions=extensions
+                        )
+                        resp = await client.send(request, stream=consume is not None)
+                        try:
+                            if consume is not None and resp.status_code in ok_status:
+                                await consume(resp)
+                        finally:
+                            await resp.aclose()
+                    finally:
+                        if metrics is not None:
+                            metrics.add("http_in_flight", -1)
+                            metrics.observe(
+                                "http_request_seconds",
+                                time.perf_counter() - sent,
+                                kind=kind,
+                            )
+            except Exception as e:
+                print(f"Error: {e}")
+                limiter.on_failure()
+                if proxy is not None:
+                    pool.on_failure(proxy)
+                    self._record_proxy(proxy, "error")
+                reason = type(e).__name__
+                if metrics is not None:
+                    metrics.inc("http_errors_total", kind=kind, error=reason)
+                return reason
+
+        latency = time.monotonic() - start
+        if metrics is not None:
+            metrics.inc("http_responses_total", kind=kind, status=resp.status_code)
+            metrics.inc(
+                "http_response_bytes_total", resp.num_bytes_downloaded, kind=kind
+            )
+        if resp.status_code in THROTTLE_STATUS_CODES:
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            limiter.on_failure(retry_after)
+            if proxy is not None:
+                # 出口被限流，暂时不再使用该代理
+                pool.on_throttle(proxy, retry_after)
+                self._record_proxy(proxy, "throttled")
+        elif resp.status_code >= 500:
+            limiter.on_failure()
+            if proxy is not None:
+                # 包括代理自身返回的502/504
+                pool.on_failure(proxy)
+                self._record_proxy(proxy, "error")
+        else:
+            # 404等客户端错误与服务端负载无关
+            limiter.on_success(latency)
+            if proxy is not None:
+                pool.on_success(proxy, latency)
+                self._record_proxy(proxy, "ok")
+        return resp
+
+    def _record_proxy(self, proxy: ProxyState, result: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc("proxy_requests_total", proxy=proxy.label, result=result)
+        self._record_proxy_state(proxy)
+
+    async def check_proxies(self, url: str, timeout: float = 10.0) -> Dict[str, bool]:
+        """通过每个代理请求一次url检查健康状态，通过的恢复，失败的剔除，不使用缓存和重试
+        :param url: 探测网址
+        :param timeout: 探测超时（秒）
+        :return: 代理（去掉密码）到是否健康的字典，没有代理池时为空
+        """
+        pool = self.proxy_pool
+        if pool is None:
+            return {}
+
+        async def probe(proxy: ProxyState) -> bool:
+            client = self._clients[proxy.url]
+            try:
+                resp = await client.get(url, timeout=timeout)
+                await resp.aclose()
+            except Exception as e:
+                print(f"Error checking proxy {proxy.label}: {e}")
+                return False
+            # 被站点限流的出口也视为不健康
+            return resp.status_code < 500 and resp.status_code != 429
+
+        health = await pool.check(probe)
+        for proxy in pool.proxies:
+            self._record_proxy_state(proxy)
+        return health
+
+    def _record_proxy_state(self, proxy: ProxyState) -> None:
+        if self.metrics is not None:
+            self.metrics.set(
+                "proxy_ejected", int(proxy.is_ejected()), proxy=proxy.label
+            )
+
+    async def get_webpage(
+        self, url: str, version: Optional[str] = None
+    ) -> Optional[str]:
+        """获取网页内容，有缓存时用条件请求重新验证，离线模式下只读缓存
+        :param url: 网址
+        :param version: 内容版本（如目录中的章节更新时间），与缓存的版本相同时直接用缓存，不访问网络
+        :return: 网页内容，失败时为None
+        """
+        cache = self.cache
+        if cache is None:
+            resp = await self._get(url)
+            return None if resp is None else resp.text
+
+        # 缓存的读写涉及SQLite和文件，在线程中进行，不阻塞事件循环
+        cached = await asyncio.to_thread(cache.get, url, self._cookies)
+        if cache.cache_only:
+            self._count_cache("offline_hit" if cached is not None else "offline_miss")
+            return None if cached is None else cached.text
+        if cached is not None and version and cached.version == version:
+            self._count_cache("fresh")
+            return cached.text
+
+        resp = await self._get(
+            url, None if cached is None else cached.conditional_headers()
+        )
+        if resp is None:
+            return None
+        if resp.status_code == 304 and cached is not None:
+            self._count_cache("revalidated")
+            await asyncio.to_thread(cache.touch, url, self._cookies, version or None)
+            return cached.text
+        self._count_cache("miss" if cached is None else "changed")
+
+        await asyncio.to_thread(
+            cache.put,
+            url,
+            resp.content,
+            resp.encoding or "utf-8",
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+            self._cookies,
+            version or None,
+        )
+        return resp.text
+
+    async def get_conditional(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        kind: str = "poll",
+    ) -> Optional[ConditionalPage]:
+        """用上次的ETag和Last-Modified发送条件请求，不读写响应缓存，用于轮询作品是否有更新
+        :param url: 网址
+        :param etag: 上次响应的ETag
+        :param last_modified: 上次响应的Last-Modified
+        :param kind: 记录指标时的请求类型
+        :return: 请求结果，未修改时text为None，失败时为None
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        resp = await self._get(url, headers or None, kind=kind)
+        if resp is None:
+            return None
+        if resp.status_code == 304:
+            return ConditionalPage(
+                None,
+                resp.headers.get("ETag") or etag,
+                resp.headers.get("Last-Modified") or last_modified,
+            )
+        return ConditionalPage(
+            resp.text, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        )
+
+    async def download_image(self, url: str, save_path: str) -> bool:
+        """分块下载图片到临时文件，完成后改名为保存路径，中断时不会留下不完整的图片
+        :param url: 图片URL
+        :param save_path: 保存路径
+        :return: 是否成功
+        """
+        if self.cache is not None and self.cache.cache_only:
+            # 离线模式不访问网络，图片保留原URL
+            return False
+
+        tmp_path = f"{save_path}.part"
+
+        async def write_body(resp: httpx.Response) -> None:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                async for chunk in resp.aiter_bytes(IMAGE_CHUNK_SIZE):
+                    f.write(chunk)
+
+        resp = await self._get(url, consume=write_body, kind="image")
+        try:
+            if resp is None:
+                return False
+            os.replace(tmp_path, save_path)
+        except Exception as e:
+            print(f"Error downloading image: {e}")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return True
+
+    def _count_cache(self, result: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc("cache_requests_total", result=result)
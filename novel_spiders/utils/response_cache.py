@@ -0,0 +1,297 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+@dataclass
+class CachedResponse:
+    """缓存的响应"""
+
+    body: bytes
+    encoding: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # 调用方给出的内容版本（如目录中的章节更新时间），版本相同时可不重新验证
+    version: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """按响应编码解码后的内容"""
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """重新验证用的条件请求头"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """磁盘响应缓存
+    以URL和相关cookies为键，响应体按内容哈希压缩存储（相同内容只存一份），
+    同时保存ETag/Last-Modified用于条件请求，总大小超过上限时按最近最少使用淘汰
+    可在多个线程中调用（异步客户端通过asyncio.to_thread调用），读取时的访问时间成批写入
+    """
+
+    # 积累多少次读取后写入一次访问时间
+    ACCESS_FLUSH_SIZE = 256
+    # 超过上限时淘汰到上限的此比例，不必每次写入都淘汰
+    EVICT_LOW_WATER = 0.9
+    # 淘汰时每次查询的条目数
+    EVICT_BATCH_SIZE = 64
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        cache_only: bool = False,
+        cookie_names: Optional[Iterable[str]] = None,
+    ):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 压缩后响应体的总大小上限
+        :param cache_only: 离线模式，只读缓存不访问网络，未缓存的页面视为获取失败
+        :param cookie_names: 影响页面内容、需要计入键的cookie名，为None时全部计入
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self.cookie_names = None if cookie_names is None else frozenset(cookie_names)
+
+        os.makedirs(os.path.join(cache_dir, "bodies"), exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False
+        )
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS bodies (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                accessed_at REAL NOT NULL,
+                version TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+            CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+            """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if "version" not in columns:
+            # 旧版本创建的缓存没有版本列
+            self._db.execute("ALTER TABLE entries ADD COLUMN version TEXT")
+        self._db.commit()
+        # 尚未写入的访问时间：键 -> 时间
+        self._accessed: Dict[str, float] = {}
+        self._total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM bodies"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        """写入积累的访问时间并关闭索引数据库"""
+        with self._lock:
+            self._flush_accessed()
+            self._db.commit()
+            self._db.close()
+
+    def make_key(self, url: str, cookies: Optional[Dict[str, str]] = None) -> str:
+        """生成缓存键
+        :param url: 网址
+        :param cookies: 请求附带的cookies
+        :return: 键
+        """
+        parts = [url]
+        for name, value in sorted((cookies or {}).items()):
+            if self.cookie_names is None or name in self.cookie_names:
+                parts.append(f"{name}={value}")
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "bodies", digest[:2], f"{digest}.z")
+
+    def get(
+        self, url: str, cookies: Optional[Dict[str, str]] = None
+    ) -> Optional[CachedResponse]:
+        """读取缓存并更新访问时间
+        :param url: 网址
+        :param cookies: 请求附带的cookies
+        :return: 缓存的响应，不存在时为None
+        """
+        key = self.make_key(url, cookies)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, encoding, etag, last_modified, version"
+                " FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        digest, encoding, etag, last_modified, version = row
+        try:
+            with open(self._body_path(digest), "rb") as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            # 响应体文件丢失或损坏，当作未缓存
+            with self._lock:
+                self._delete_entry(key, digest)
+                self._db.commit()
+            return None
+
+        with self._lock:
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._db.commit()
+        return CachedResponse(body, encoding, etag, last_modified, version)
+
+    def put(
+        self,
+        url: str,
+        body: bytes,
+        encoding: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        cookies: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
+    ) -> None:
+        """写入缓存，超过大小上限时淘汰最久未使用的条目
+        :param url: 网址
+        :param body: 响应体
+        :param encoding: 响应编码
+        :param etag: ETag
+        :param last_modified: Last-Modified
+        :param cookies: 请求附带的cookies
+        :param version: 内容版本
+        """
+        key = self.make_key(url, cookies)
+        digest = hashlib.sha256(body).hexdigest()
+        data = zlib.compress(body)
+
+        with self._lock:
+            if (
+                self._db.execute(
+                    "SELECT 1 FROM bodies WHERE digest = ?", (digest,)
+                ).fetchone()
+                is None
+            ):
+                path = self._body_path(digest)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._db.execute(
+                    "INSERT INTO bodies (digest, size) VALUES (?, ?)",
+                    (digest, len(data)),
+                )
+                self._total += len(data)
+
+            old = self._db.execute(
+                "SELECT digest FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._accessed.pop(key, None)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (key, url, digest, encoding, etag, last_modified, accessed_at,"
+                " version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, digest, encoding, etag, last_modified, time.time(), version),
+            )
+            if old is not None and old[0] != digest:
+                self._delete_body_if_unused(old[0])
+            self._evict()
+            self._db.commit()
+
+    def touch(
+        self,
+        url: str,
+        cookies: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
+    ) -> None:
+        """重新验证通过（304）时更新访问时间
+        :param url: 网址
+        :param cookies: 请求附带的cookies
+        :param version: 内容版本，为None时不改动
+        """
+        key = self.make_key(url, cookies)
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ?, version = COALESCE(?, version)"
+                " WHERE key = ?",
+                (time.time(), version, key),
+            )
+            self._db.commit()
+
+    def total_bytes(self) -> int:
+        """压缩后响应体的总大小"""
+        return self._total
+
+    def _flush_accessed(self) -> None:
+        """写入积累的访问时间，由调用方提交"""
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict(self) -> None:
+        """超过上限时按访问时间从旧到新成批淘汰，直到总大小不超过上限的EVICT_LOW_WATER"""
+        if self._total <= self.max_bytes:
+            return
+        self._flush_accessed()
+        low_water = self.max_bytes * self.EVICT_LOW_WATER
+        while self._total > low_water:
+            rows = self._db.execute(
+                "SELECT key, digest FROM entries ORDER BY accessed_at LIMIT ?",
+                (self.EVICT_BATCH_SIZE,),
+            ).fetchall()
+            if not rows:
+                break
+            for key, digest in rows:
+                if self._total <= low_water:
+                    break
+                self._delete_entry(key, digest)
+
+    def _delete_entry(self, key: str, digest: str) -> int:
+        """删除条目，响应体不再被引用时一并删除
+        :return: 释放的字节数
+        """
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return self._delete_body_if_unused(digest)
+
+    def _delete_body_if_unused(self, digest: str) -> int:
+        """响应体不再被任何条目引用时删除
+        :return: 释放的字节数
+        """
+        if (
+            self._db.execute(
+                "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            is not None
+        ):
+            return 0
+        row = self._db.execute(
+            "SELECT size FROM bodies WHERE digest = ?", (digest,)
+        ).fetchone()
+        self._db.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+        try:
+            os.remove(self._body_path(digest))
+        except FileNotFoundError:
+            pass
+        size = 0 if row is None else row[0]
+        self._total -= size
+        return size
@@ -0,0 +1,204 @@
+from typing import Dict, List, Optional
+import hashlib
+import io
+import json
+import os
+
+from novel_spiders.utils.novel_save_load import (
+    NovelLike,
+    NovelLineIndex,
+    iter_translatable_lines,
+)
+
+
+def text_hash(text: str) -> str:
+    """原文的内容哈希，用于判断翻译后原文是否改动"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def diff_translatable(
+    novel: NovelLike,
+    translates: Dict[str, str],
+    hashes: Dict[str, str],
+    line_index: Optional[NovelLineIndex] = None,
+    snapshot: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """找出需要翻译的行：没有翻译的，或翻译时的原文哈希与当前原文不一致的
+    旧的翻译没有记录哈希，按交给翻译的原文快照补记哈希，快照中没有的行视为与当前原文一致
+    :param novel: 小说对象
+    :param translates: 已有的翻译
+    :param hashes: 已翻译行的原文哈希，会补记缺少的哈希
+    :param line_index: 行索引，与其他导出共用时传入
+    :param snapshot: 交给翻译的原文（{code}_untrans.json），翻译后原文的改动据此发现
+    :return: json key到原文的字典，格式与novel_to_translatable_json一致
+    """
+    if snapshot is None:
+        snapshot = {}
+    delta: Dict[str, str] = {}
+    for key, text in iter_translatable_lines(novel, line_index):
+        translate = translates.get(key)
+        if not isinstance(translate, str) or not translate.strip():
+            delta[key] = text
+            continue
+        current = text_hash(text)
+        recorded = hashes.get(key)
+        if recorded is None:
+            source = snapshot.get(key)
+            recorded = current if not isinstance(source, str) else text_hash(source)
+            hashes[key] = recorded
+        if recorded != current:
+            delta[key] = text
+    return delta
+
+
+def merge_translations(
+    translates: Dict[str, str],
+    hashes: Dict[str, str],
+    delta: Dict[str, str],
+    delta_translated: Dict[str, str],
+) -> List[str]:
+    """把增量翻译结果合并到总翻译中，并记录翻译时的原文哈希
+    :param translates: 总翻译，原地更新
+    :param hashes: 原文哈希，原地更新
+    :param delta: 导出的增量原文
+    :param delta_translated: 增量的翻译结果
+    :return: 合并的json key
+    """
+    merged = []
+    for key, translate in delta_translated.items():
+        source = delta.get(key)
+        # 不在增量中的key不是这次导出的，不合并
+        if source is None or not isinstance(translate, str) or not translate.strip():
+            continue
+        translates[key] = translate
+        hashes[key] = text_hash(source)
+        merged.append(key)
+    return merged
+
+
+class TranslationFiles:
+    """一部小说的翻译相关文件
+    {code}_untrans.json：首次导出的待翻译原文
+    {code}_trans.json：总翻译
+    {code}_trans.hashes.json：已翻译行翻译时的原文哈希
+    {code}_delta.json：导出的增量原文
+    {code}_delta_trans.json：增量的翻译结果
+    """
+
+    def __init__(self, data_root: str, code: str):
+        """
+        :param data_root: 小说数据目录
+        :param code: 小说编号
+        """
+        self.data_root = data_root
+        self.code = code
+
+    @property
+    def untrans_path(self) -> str:
+        """首次导出的待翻译原文路径，旧的翻译按它补记原文哈希"""
+        return os.path.join(self.data_root, f"{self.code}_untrans.json")
+
+    @property
+    def trans_path(self) -> str:
+        """总翻译路径"""
+        return os.path.join(self.data_root, f"{self.code}_trans.json")
+
+    @property
+    def legacy_trans_path(self) -> str:
+        """AITranslator 出来的默认文件名，忘了改名时的兼容"""
+        return os.path.join(self.data_root, "合并结果.json")
+
+    @property
+    def hashes_path(self) -> str:
+        """原文哈希路径"""
+        return os.path.join(self.data_root, f"{self.code}_trans.hashes.json")
+
+    @property
+    def delta_path(self) -> str:
+        """增量原文路径"""
+        return os.path.join(self.data_root, f"{self.code}_delta.json")
+
+    @property
+    def delta_trans_path(self) -> str:
+        """增量翻译结果路径"""
+        return os.path.join(self.data_root, f"{self.code}_delta_trans.json")
+
+    def load_translates(self) -> Dict[str, str]:
+        """读取总翻译，没有时为空字典"""
+        path = self.trans_path
+        if not os.path.exists(path):
+            path = self.legacy_trans_path
+        return _load_json(path)
+
+    def load_hashes(self) -> Dict[str, str]:
+        """读取原文哈希，没有时为空字典"""
+        return _load_json(self.hashes_path)
+
+    def save_translates(self, translates: Dict[str, str]) -> None:
+        """保存总翻译"""
+        _save_json(self.trans_path, translates)
+
+    def save_hashes(self, hashes: Dict[str, str]) -> None:
+        """保存原文哈希"""
+        _save_json(self.hashes_path, hashes)
+
+    def export_delta(
+        self,
+        novel: NovelLike,
+        translates: Dict[str, str],
+        line_index: Optional[NovelLineIndex] = None,
+    ) -> Dict[str, str]:
+        """导出需要翻译的增量，没有增量时删除旧的增量文件
+        :param novel: 小说对象
+        :param translates: 总翻译
+        :param line_index: 行索引，与其他导出共用时传入
+        :return: 增量原文
+        """
+        hashes = self.load_hashes()
+        delta = diff_translatable(
+            novel, translates, hashes, line_index, _load_json(self.untrans_path)
+        )
+        self.save_hashes(hashes)
+        if delta:
+            _save_json(self.delta_path, delta)
+        elif os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        return delta
+
+    def merge_delta(self, translates: Dict[str, str]) -> List[str]:
+        """合并增量的翻译结果到总翻译并保存，合并后删除增量文件
+        增量原文不存在时无法确认翻译对应的原文，不合并并保留翻译结果
+        :param translates: 总翻译，原地更新
+        :return: 合并的json key
+        """
+        if not os.path.exists(self.delta_trans_path):
+            return []
+        if not os.path.exists(self.delta_path):
+            raise Exception(
+                f"{self.delta_path} not found, keep {self.delta_trans_path} unmerged"
+            )
+        delta = _load_json(self.delta_path)
+        delta_translated = _load_json(self.delta_trans_path)
+        hashes = self.load_hashes()
+        merged = merge_translations(translates, hashes, delta, delta_translated)
+        self.save_translates(translates)
+        self.save_hashes(hashes)
+        for path in (self.delta_path, self.delta_trans_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return merged
+
+
+def _load_json(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with io.open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_json(path: str, data: Dict[str, str]) -> None:
+    # 先写临时文件再替换，中途崩溃不会损坏总翻译
+    tmp_path = f"{path}.tmp"
+    with io.open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data, ensure_ascii=False, indent=4))
+    os.replace(tmp_path, path)
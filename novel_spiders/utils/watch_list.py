@@ -0,0 +1,215 @@
+from typing import Iterable, List, NamedTuple, Optional
+import os
+import random
+import sqlite3
+import threading
+import time
+
+_ENTRY_COLUMNS = "code, site, etag, last_modified, digest, interval, next_poll_at"
+
+
+class WatchEntry(NamedTuple):
+    """关注的小说及其轮询状态"""
+
+    code: str
+    site: str
+    # 上次作品信息页响应的ETag和Last-Modified，用于条件请求
+    etag: Optional[str]
+    last_modified: Optional[str]
+    # 上次作品信息的摘要，服务器不支持条件请求时用于判断是否有更新
+    digest: Optional[str]
+    # 当前的轮询间隔（秒）
+    interval: float
+    next_poll_at: float
+
+
+class WatchList:
+    """关注的小说列表及自适应的轮询计划（SQLite）
+    有更新时缩短轮询间隔，没有更新时逐渐延长，经常更新的小说轮询得更频繁
+
+    用法：
+        with WatchList("./data/watch.sqlite3") as watch_list:
+            watch_list.follow(["n0609jx"], "syosetu18")
+            for entry in watch_list.due(100):
+                ...
+                watch_list.record_poll(entry.code, changed, etag, last_modified, digest)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        min_interval: float = 600.0,
+        max_interval: float = 86400.0,
+        initial_interval: float = 3600.0,
+        speedup: float = 0.5,
+        slowdown: float = 1.5,
+        jitter: float = 0.1,
+    ):
+        """
+        :param path: 数据库文件路径
+        :param min_interval: 轮询间隔下限（秒），也是失败后重试的间隔
+        :param max_interval: 轮询间隔上限（秒）
+        :param initial_interval: 新关注的小说的轮询间隔（秒）
+        :param speedup: 有更新时间隔乘以的系数
+        :param slowdown: 没有更新时间隔乘以的系数
+        :param jitter: 下次轮询时间的随机偏移比例，避免大量小说同时到期
+        """
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.initial_interval = min(max(initial_interval, min_interval), max_interval)
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.jitter = jitter
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 协程中通过线程调用，连接由锁保护
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # 每次轮询都写入一条记录，WAL下提交时不必每次同步到磁盘
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS watched (
+                code TEXT PRIMARY KEY,
+                site TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                digest TEXT,
+                interval REAL NOT NULL,
+                next_poll_at REAL NOT NULL DEFAULT 0,
+                polls INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0,
+                last_changed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS watched_next_poll ON watched (next_poll_at);
+            """)
+
+    def __enter__(self) -> "WatchList":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭数据库"""
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM watched").fetchone()[0]
+
+    def follow(self, codes: Iterable[str], site: str) -> int:
+        """关注小说，新关注的小说立即到期，已关注的只更新站点
+        :param codes: 小说编号
+        :param site: 站点适配器名
+        :return: 新关注的小说数
+        """
+        codes = list(codes)
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT INTO watched (code, site, interval) VALUES (?, ?, ?)"
+                " ON CONFLICT (code) DO NOTHING",
+                [(code, site, self.initial_interval) for code in codes],
+            )
+            added = self._db.total_changes - before
+            self._db.executemany(
+                "UPDATE watched SET site = ? WHERE code = ? AND site != ?",
+                [(site, code, site) for code in codes],
+            )
+        return added
+
+    def unfollow(self, codes: Iterable[str]) -> None:
+        """取消关注"""
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM watched WHERE code = ?", [(code,) for code in codes]
+            )
+
+    def entries(self) -> List[WatchEntry]:
+        """所有关注的小说，按下次轮询时间排序"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM watched ORDER BY next_poll_at"
+            ).fetchall()
+        return [WatchEntry(*row) for row in rows]
+
+    def due(self, limit: int, now: Optional[float] = None) -> List[WatchEntry]:
+        """已到轮询时间的小说，最早到期的在前
+        :param limit: 最多返回的数量
+        :param now: 当前时间，为None时用time.time()
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_ENTRY_COLUMNS} FROM watched WHERE next_poll_at <= ?"
+                " ORDER BY next_poll_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        return [WatchEntry(*row) for row in rows]
+
+    def next_poll_at(self) -> Optional[float]:
+        """最早的下次轮询时间，没有关注的小说时为None"""
+        with self._lock:
+            row = self._db.execute("SELECT MIN(next_poll_at) FROM watched").fetchone()
+        return row[0]
+
+    def record_poll(
+        self,
+        code: str,
+        changed: bool,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        digest: Optional[str],
+        now: Optional[float] = None,
+    ) -> float:
+        """记录一次成功的轮询（有更新时应在处理完更新后调用），按结果调整轮询间隔
+        :param code: 小说编号
+        :param changed: 是否有更新
+        :param etag: 本次响应的ETag
+        :param last_modified: 本次响应的Last-Modified
+        :param digest: 本次作品信息的摘要
+        :param now: 当前时间，为None时用time.time()
+        :return: 新的轮询间隔（秒）
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT interval FROM watched WHERE code = ?", (code,)
+            ).fetchone()
+            if row is None:
+                raise Exception(f"Novel not followed: {code}")
+            factor = self.speedup if changed else self.slowdown
+            interval = min(self.max_interval, max(self.min_interval, row[0] * factor))
+            self._db.execute(
+                "UPDATE watched SET etag = ?, last_modified = ?, digest = ?,"
+                " interval = ?, next_poll_at = ?, polls = polls + 1,"
+                " changes = changes + ?,"
+                " last_changed_at = CASE WHEN ? THEN ? ELSE last_changed_at END"
+                " WHERE code = ?",
+                (
+                    etag,
+                    last_modified,
+                    digest,
+                    interval,
+                    now + self._jittered(interval),
+                    int(changed),
+                    int(changed),
+                    now,
+                    code,
+                ),
+            )
+        return interval
+
+    def record_failure(self, code: str, now: Optional[float] = None) -> None:
+        """轮询或处理更新失败，保留上次的状态，间隔下限后重试"""
+        now = time.time() if now is None else now
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE watched SET next_poll_at = ? WHERE code = ?",
+                (now + self._jittered(self.min_interval), code),
+            )
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,275 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+import os
+import sqlite3
+import threading
+import time
+
+from novel_spiders.entities.novel import TocEntry
+from novel_spiders.utils.rate_limiter import backoff_delay
+
+# 任务状态
+TASK_PENDING = "pending"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+
+class WorkTask(NamedTuple):
+    """租用的章节任务"""
+
+    id: int
+    code: str
+    site: str
+    entry: TocEntry
+    # 包括本次在内的租用次数
+    attempts: int
+
+
+class WorkQueue:
+    """持久化的章节任务队列（SQLite），供协调者和多个工作进程共用
+    - 协调者按目录把需要获取的章节加入队列，等待全部完成后从存储中读取小说
+    - 工作进程租用一批任务，租期内完成或失败；进程崩溃时租期过后任务自动回到队列
+    - 失败的任务按指数退避延后重试，超过次数上限后标记为失败
+    同一小说的同一章节只有一个任务，重新加入时重置为待处理
+
+    用法：
+        queue = WorkQueue("./data/queue.sqlite3")
+        queue.enqueue("n0000aa", "syosetu18", entries)
+        tasks = queue.lease("worker-1", 8)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 120.0,
+        max_attempts: int = 5,
+        retry_base: float = 2.0,
+        retry_max: float = 120.0,
+    ):
+        """
+        :param path: 数据库文件路径，可由同一台机器上的多个进程同时打开
+        :param lease_seconds: 租期（秒），工作进程需在租期内完成或续租
+        :param max_attempts: 每个任务最多租用的次数
+        :param retry_base: 失败后重试的退避基数（秒）
+        :param retry_max: 失败后重试的退避上限（秒）
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 协程中通过线程调用，连接由锁保护
+        self._lock = threading.RLock()
+        # 手动管理事务，租用时用BEGIN IMMEDIATE保证同一任务只租给一个进程
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code TEXT NOT NULL,
+                site TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                entry TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_until REAL,
+                error TEXT,
+                UNIQUE (code, idx)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, available_at);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """)
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭数据库"""
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """写事务，开始时即获取写锁"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def enqueue(self, code: str, site: str, entries: Sequence[TocEntry]) -> int:
+        """加入章节任务，已有的任务（包括已完成和失败的）重置为待处理
+        :param code: 小说编号
+        :param site: 站点适配器名
+        :param entries: 需要获取的章节
+        :return: 加入的任务数
+        """
+        rows = [
+            (code, site, entry.index, entry.model_dump_json(), TASK_PENDING)
+            for entry in entries
+        ]
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT INTO tasks (code, site, idx, entry, state) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (code, idx) DO UPDATE SET"
+                " site = excluded.site, entry = excluded.entry, state = excluded.state,"
+                " attempts = 0, available_at = 0, lease_owner = NULL,"
+                " lease_until = NULL, error = NULL",
+                rows,
+            )
+        return len(rows)
+
+    def lease(
+        self, worker: str, limit: int, lease_seconds: Optional[float] = None
+    ) -> List[WorkTask]:
+        """租用可处理的任务：待处理且已到重试时间的，或租期已过（工作进程崩溃）的
+        租期已过且次数用尽的任务标记为失败
+        :param worker: 工作进程标识
+        :param limit: 最多租用的任务数
+        :param lease_seconds: 租期（秒），为None时用默认租期
+        :return: 租到的任务，按小说和章节顺序
+        """
+        now = time.time()
+        lease_until = now + (
+            self.lease_seconds if lease_seconds is None else lease_seconds
+        )
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE tasks SET state = ?, error = 'lease expired', lease_owner = NULL"
+                " WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (TASK_FAILED, TASK_LEASED, now, self.max_attempts),
+            )
+            rows = db.execute(
+                "SELECT id, code, site, entry, attempts FROM tasks"
+                " WHERE (state = ? AND available_at <= ?)"
+                " OR (state = ? AND lease_until < ?)"
+                " ORDER BY code, idx LIMIT ?",
+                (TASK_PENDING, now, TASK_LEASED, now, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE tasks SET state = ?, attempts = attempts + 1,"
+                " lease_owner = ?, lease_until = ? WHERE id = ?",
+                [(TASK_LEASED, worker, lease_until, row[0]) for row in rows],
+            )
+        return [
+            WorkTask(
+                task_id, code, site, TocEntry.model_validate_json(entry), attempts + 1
+            )
+            for task_id, code, site, entry, attempts in rows
+        ]
+
+    def extend(
+        self,
+        worker: str,
+        tasks: Sequence[WorkTask],
+        lease_seconds: Optional[float] = None,
+    ) -> int:
+        """续租仍在处理的任务
+        :return: 续租成功的任务数（租期已过并被其他进程租走的不算）
+        """
+        lease_until = time.time() + (
+            self.lease_seconds if lease_seconds is None else lease_seconds
+        )
+        with self._transaction() as db:
+            cursor = db.executemany(
+                "UPDATE tasks SET lease_until = ?"
+                " WHERE id = ? AND state = ? AND lease_owner = ?",
+                [(lease_until, task.id, TASK_LEASED, worker) for task in tasks],
+            )
+            return cursor.rowcount
+
+    def complete(self, worker: str, task: WorkTask) -> bool:
+        """任务完成
+        :return: 是否仍由该工作进程持有（租期过后被其他进程租走时为False，结果仍可使用）
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = ?, lease_owner = NULL, lease_until = NULL,"
+                " error = NULL WHERE id = ? AND state = ? AND lease_owner = ?",
+                (TASK_DONE, task.id, TASK_LEASED, worker),
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, worker: str, task: WorkTask, error: str) -> bool:
+        """任务失败，次数未用尽时按退避延后重试，否则标记为失败
+        :return: 是否仍由该工作进程持有
+        """
+        if task.attempts >= self.max_attempts:
+            state, available_at = TASK_FAILED, 0.0
+        else:
+            state = TASK_PENDING
+            available_at = time.time() + backoff_delay(
+                task.attempts - 1, self.retry_base, self.retry_max
+            )
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = ?, available_at = ?, lease_owner = NULL,"
+                " lease_until = NULL, error = ?"
+                " WHERE id = ? AND state = ? AND lease_owner = ?",
+                (state, available_at, error, task.id, TASK_LEASED, worker),
+            )
+            return cursor.rowcount > 0
+
+    def counts(self, code: Optional[str] = None) -> Dict[str, int]:
+        """各状态的任务数
+        :param code: 小说编号，为None时统计所有小说
+        """
+        counts = {TASK_PENDING: 0, TASK_LEASED: 0, TASK_DONE: 0, TASK_FAILED: 0}
+        with self._lock:
+            if code is None:
+                rows = self._db.execute(
+                    "SELECT state, COUNT(*) FROM tasks GROUP BY state"
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT state, COUNT(*) FROM tasks WHERE code = ? GROUP BY state",
+                    (code,),
+                ).fetchall()
+        counts.update(rows)
+        return counts
+
+    def failed(self, code: str) -> Dict[int, str]:
+        """失败的章节索引到错误信息"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, error FROM tasks WHERE code = ? AND state = ? ORDER BY idx",
+                (code, TASK_FAILED),
+            ).fetchall()
+        return {index: error or "" for index, error in rows}
+
+    def purge(self, code: str) -> None:
+        """删除小说的所有任务"""
+        with self._transaction() as db:
+            db.execute("DELETE FROM tasks WHERE code = ?", (code,))
+
+    @property
+    def closed(self) -> bool:
+        """协调者是否已不再加入任务，工作进程处理完剩余任务后退出"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'closed'"
+            ).fetchone()
+        return row is not None and row[0] == "1"
+
+    @closed.setter
+    def closed(self, value: bool) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('closed', ?)",
+                ("1" if value else "0",),
+            )
@@ -0,0 +1,30 @@
+from typing import Optional
+
+from novel_spiders.entities.novel import Chapter, ChapterContent
+
+
+def make_chapter(
+    index: int,
+    text: Optional[str] = None,
+    updated_at: str = "",
+    ep_title: str = "",
+    prepend: Optional[str] = None,
+) -> Chapter:
+    """测试用的章节，标题为第{index}話
+    :param index: 章节索引
+    :param text: 本文的一行，为None时没有本文
+    :param updated_at: 更新时间
+    :param ep_title: 大章节标题
+    :param prepend: 章前的一行，为None时没有章前内容
+    """
+    return Chapter(
+        index=index,
+        title=f"第{index}話",
+        ep_title=ep_title,
+        prepend_contents=(
+            [] if prepend is None else [ChapterContent(key="p1", content=prepend)]
+        ),
+        contents=[] if text is None else [ChapterContent(key="1", content=text)],
+        append_contents=[],
+        updated_at=updated_at,
+    )
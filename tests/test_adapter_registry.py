@@ -0,0 +1,45 @@
+import pickle
+
+from novel_spiders.adapters.registry import (
+    available_adapters,
+    get_adapter,
+    register_adapter,
+)
+from novel_spiders.adapters.syosetu_adapter import SyosetuAdapter, Syosetu18Adapter
+from novel_spiders.spiders.novel_spider import NovelSpider
+
+
+class _MirrorAdapter(SyosetuAdapter):
+    name = "test-mirror"
+    BASE_URL = "https://mirror.example"
+
+
+def test_main():
+    """内置适配器按名称创建，注册的适配器可用于NovelSpider，适配器可pickle"""
+    assert {"syosetu", "syosetu18"} <= set(available_adapters())
+
+    adapter = get_adapter("syosetu18")
+    assert isinstance(adapter, Syosetu18Adapter)
+    assert adapter.COOKIES == {"over18": "yes"}
+    assert adapter.toc_url("n0000aa") == "https://novel18.syosetu.com/n0000aa/"
+    assert get_adapter("syosetu", base_url="http://127.0.0.1:1/").chapter_url(
+        "n0000aa", 3
+    ) == ("http://127.0.0.1:1/n0000aa/3/")
+    assert adapter.toc_page_url("https://x/n0000aa/?p=9", 2) == "https://x/n0000aa/?p=2"
+    assert adapter.toc_page_number("https://x/n0000aa/?p=9") == 9
+
+    register_adapter(_MirrorAdapter)
+    spider = NovelSpider(get_adapter("test-mirror"))
+    assert spider.adapter.info_url("n1") == (
+        "https://mirror.example/novelview/infotop/ncode/n1/"
+    )
+    assert (
+        pickle.loads(pickle.dumps(spider.adapter)).base_url == spider.adapter.base_url
+    )
+
+    try:
+        get_adapter("no-such-site")
+    except ValueError:
+        pass
+    else:
+        assert False, "unknown adapter should raise ValueError"
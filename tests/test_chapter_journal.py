@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+from novel_spiders.utils.chapter_journal import ChapterJournal
+from tests.helpers import make_chapter
+
+
+def test_main():
+    """写入中途崩溃留下的不完整行在读取时截掉，之后追加的章节不受影响"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "n1.journal.jsonl")
+        with ChapterJournal(path, sync_every=2) as journal:
+            assert journal.load() == {}
+            journal.append(make_chapter(1, "本文"))
+            journal.append(make_chapter(2, "本文"))
+        size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(make_chapter(3, "本文").model_dump_json().encode("utf-8")[:20])
+
+        with ChapterJournal(path) as journal:
+            assert sorted(journal.load()) == [1, 2]
+            assert os.path.getsize(path) == size
+            journal.append(make_chapter(3, "本文"))
+        journal = ChapterJournal(path)
+        assert sorted(journal.load()) == [1, 2, 3]
+        journal.clear()
+        assert not os.path.exists(path)
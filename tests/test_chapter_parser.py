@@ -0,0 +1,51 @@
+import glob
+import io
+import os
+
+from novel_spiders.parsers.syosetu_chapter_parser import PARSER_BACKENDS
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_main():
+    """所有解析器在保存的章节页上的结果与BeautifulSoup参照实现一致，未做任何设置的爬虫也能解析章节"""
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, "chapter_*.html")))
+    assert paths, "no chapter fixtures"
+
+    reference = PARSER_BACKENDS["soup"]
+    for path in paths:
+        with io.open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        expected = reference(html)
+        for name, parser in PARSER_BACKENDS.items():
+            actual = parser(html)
+            assert actual == expected, f"{name} differs from soup on {path}"
+
+    # 页面中少见的写法：嵌套的行、未闭合的元素、CDATA、没有alt的图片
+    for body in [
+        '<p id="L1">a<p id="L2">b</p></p>',
+        '<p id="L1">a<span><p id="L2">b</span>c</p>d</p>',
+        '<p id="L1">a<p id="L2">b<a><img src="s" alt="q"></a></p>c</p><p id="L3">d</p>',
+        '<p id="L1"><a>t</a><p id="L2"><a><img src="s"></a></p></p>',
+        '<p id="L1">x<![CDATA[in & <b>]]>y</p>',
+        '<p id="Lp1">q<p id="L1">z',
+    ]:
+        html = (
+            '<article class="p-novel"><h1 class="p-novel__title">題</h1>'
+            f"{body}</article>"
+        )
+        expected = reference(html)
+        for name, parser in PARSER_BACKENDS.items():
+            assert parser(html) == expected, f"{name} differs from soup on {body}"
+
+    # 只创建爬虫、不设置任何属性，图片保存到默认的assets目录
+    with io.open(
+        os.path.join(FIXTURE_DIR, "chapter_images.html"), encoding="utf-8"
+    ) as f:
+        chapter, images = Syosetu18Spider()._parse_single_chapter(f.read(), 1)
+    assert chapter.index == 1 and chapter.contents
+    assert images and all(
+        image.save_path.startswith(os.path.join(".", "assets", "imgs"))
+        for image in images
+    )
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import tempfile
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.chapter_sink import OrderedChapterSink
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from tests.helpers import make_chapter
+
+
+async def _put_all(sink: OrderedChapterSink, indexes, close: bool = True) -> None:
+    for index in indexes:
+        await sink.put(make_chapter(index))
+    if close:
+        await sink.close()
+
+
+def test_main():
+    """乱序到达的章节按索引顺序写入，缺失的章节超过缓冲区后跳过，流式采集中断后继续，旧数据补上更新时间"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = NovelStore(os.path.join(tmp_dir, "sink.sqlite3"))
+        written = []
+        put_chapters = store.put_chapters
+        store.put_chapters = lambda code, chapters: (
+            written.extend(c.index for c in chapters) or put_chapters(code, chapters)
+        )
+        sink = OrderedChapterSink(store, "a", range(1, 9), buffer_size=3, batch_size=2)
+        asyncio.run(_put_all(sink, [3, 2, 1, 6, 5, 4]))
+        assert written == [1, 2, 3, 4, 5, 6]
+        assert sink.peak_buffered == 3
+        # 第2章失败，缓冲区超过上限后跳过，不等到结束
+        written.clear()
+        sink = OrderedChapterSink(store, "b", range(1, 9), buffer_size=2, batch_size=1)
+        asyncio.run(_put_all(sink, [1, 3, 4, 5, 6, 8], close=False))
+        assert written == [1, 3, 4, 5, 6]
+        asyncio.run(sink.close())
+        assert written == [1, 3, 4, 5, 6, 8]
+        assert not store.has_novel("b")
+        store.close()
+
+        config = StubConfig(chapters=20, retry_after=None, seed=3)
+        with StubServer(config) as server:
+            spider = Syosetu18Spider()
+            patch_spider(spider, server.base_url)
+            spider.resource_name = config.code
+            spider.data_root = tmp_dir
+            spider.http2 = False
+            spider.parse_workers = 0
+            spider.rate_limit = RateLimitConfig(
+                requests_per_second=0, backoff_base=0.01, backoff_max=0.05
+            )
+            full = NovelStore(os.path.join(tmp_dir, "full.sqlite3"))
+            plan = asyncio.run(spider.stream_novel(full, window=4))
+            assert len(plan.entries) == 20
+            chapters = full.load_novel(config.code).chapters
+            assert [c.index for c in chapters] == list(range(1, 21))
+
+            # 模拟中断：只写入了部分章节，小说信息未保存
+            resumed = NovelStore(os.path.join(tmp_dir, "resumed.sqlite3"))
+            resumed.put_chapters(config.code, chapters[:12])
+            assert not resumed.has_novel(config.code)
+            before = server.requests["chapter"]
+            plan = asyncio.run(spider.stream_novel(resumed, window=4))
+            assert [e.index for e in plan.entries] == list(range(13, 21))
+            assert server.requests["chapter"] - before == 8
+            assert resumed.load_novel(config.code) == full.load_novel(config.code)
+
+            # 旧数据没有更新时间时视为未改动，只补上目录中的时间，之后的改稿能被发现
+            resumed.set_chapter_versions(config.code, {1: "", 2: ""})
+            before = server.requests["chapter"]
+            plan = asyncio.run(spider.stream_novel(resumed))
+            assert not plan.entries and server.requests["chapter"] == before
+            versions = resumed.chapter_versions(config.code)
+            assert versions[1] == versions[2] == "2024/01/01 12:00"
+            server.config.revised[2] = "2024/02/01 12:00"
+            plan = asyncio.run(spider.stream_novel(resumed))
+            assert [e.index for e in plan.entries] == [2]
+            full.close()
+            resumed.close()
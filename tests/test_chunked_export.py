@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import tempfile
+
+from benchmarks.synthetic import make_novel
+from novel_spiders.entities.compact_novel import CompactNovel
+from novel_spiders.utils.chunked_export import (
+    MANIFEST_NAME,
+    ChunkLimit,
+    export_translatable_chunks,
+    merge_translated_chunks,
+    translated_chunk_path,
+)
+from novel_spiders.utils.novel_save_load import (
+    load_novel_from_json,
+    novel_to_translatable_json,
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _load(path: str):
+    with io.open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_main():
+    """分块不超过上限且不拆开章节，文件大小与清单一致，合并各块内容与整体导出一致，翻译结果按清单合并"""
+    novel = make_novel(30, 10)
+    expected = json.loads(novel_to_translatable_json(novel))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        limit = ChunkLimit(max_lines=40)
+        chunks = export_translatable_chunks(novel, tmp_dir, limit, workers=0)
+        assert len(chunks) > 1
+        merged = {}
+        last_chapter = -1
+        for chunk in chunks:
+            data = _load(os.path.join(tmp_dir, chunk["file"]))
+            assert len(data) == chunk["lines"] <= 40
+            # 章节按顺序且不跨块
+            assert chunk["first_chapter"] > last_chapter
+            last_chapter = chunk["last_chapter"]
+            merged.update(data)
+        assert list(merged.items()) == list(expected.items())
+        manifest = _load(os.path.join(tmp_dir, MANIFEST_NAME))
+        assert manifest["lines"] == len(expected)
+        assert manifest["limit"] == {"max_bytes": 0, "max_tokens": 0, "max_lines": 40}
+
+        # 多进程、紧凑表示、按字节和token分块的结果一致
+        for limit, workers in [
+            (ChunkLimit(max_bytes=4000), 2),
+            (ChunkLimit(max_tokens=800, max_lines=1000), 0),
+        ]:
+            chunks = export_translatable_chunks(
+                CompactNovel.from_novel(novel), tmp_dir, limit, workers
+            )
+            assert len(chunks) > 1
+            merged = {}
+            for chunk in chunks:
+                assert not limit.exceeded(chunk["bytes"], chunk["tokens"], 0)
+                merged.update(_load(os.path.join(tmp_dir, chunk["file"])))
+            assert merged == expected
+        # 重新导出时删除多余的旧分块
+        files = sorted(f for f in os.listdir(tmp_dir) if f.startswith("part-"))
+        assert files == [chunk["file"] for chunk in chunks]
+
+        # 翻译结果按清单合并，缺少的分块跳过
+        for chunk in chunks[:-1]:
+            data = _load(os.path.join(tmp_dir, chunk["file"]))
+            with io.open(
+                translated_chunk_path(tmp_dir, chunk), "w", encoding="utf-8"
+            ) as f:
+                json.dump({k: f"訳:{v}" for k, v in data.items()}, f)
+        translates = merge_translated_chunks(tmp_dir)
+        assert translates["title"] == f"訳:{novel.title}"
+        assert len(translates) == len(expected) - chunks[-1]["lines"]
+        assert not os.path.exists(translated_chunk_path(tmp_dir, chunks[-1]))
+
+    # 字节上限包括括号和分隔符
+    with io.open(
+        os.path.join(FIXTURE_DIR, "export_novel.json"), "r", encoding="utf-8"
+    ) as f:
+        novel = load_novel_from_json(f.read())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chunks = export_translatable_chunks(
+            novel, tmp_dir, ChunkLimit(max_bytes=600), workers=0
+        )
+        assert len(chunks) > 1
+        for chunk in chunks:
+            size = os.path.getsize(os.path.join(tmp_dir, chunk["file"]))
+            assert size == chunk["bytes"] <= 600
@@ -0,0 +1,74 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import make_novel
+from novel_spiders.utils.novel_save_load import novel_to_json
+from novel_spiders.utils.novel_store import NovelStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在新进程中运行导出命令，输出退出码和已加载的重型依赖
+_SCRIPT = """
+import sys
+import main
+
+code = main.main(sys.argv[1:])
+heavy = ("httpx", "bs4", "requests", "pydantic", "asyncio")
+print(code, ",".join(m for m in heavy if m in sys.modules))
+"""
+
+
+def _run(cwd, *argv):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.run(
+        [sys.executable, "-c", _SCRIPT, *argv],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=cwd,
+        env=env,
+    ).stdout.splitlines()[-1]
+
+
+def test_main():
+    """export / translate-export子命令可导出存储中和旧json中的小说，且不加载httpx、bs4、pydantic等"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        novel = make_novel(5, 10)
+        with NovelStore(os.path.join(tmp_dir, "novels.sqlite3")) as store:
+            store.save_novel("n0000aa", novel)
+        legacy_root = os.path.join(tmp_dir, "data", "n0000bb")
+        os.makedirs(legacy_root)
+        with io.open(
+            os.path.join(legacy_root, "n0000bb.json"), "w", encoding="utf-8"
+        ) as f:
+            f.write(novel_to_json(novel))
+
+        store_arg = "--store=novels.sqlite3"
+        assert _run(tmp_dir, "export", "n0000aa", "n0000bb", store_arg) == "0 "
+        for code in ("n0000aa", "n0000bb"):
+            with io.open(
+                os.path.join(tmp_dir, "data", code, f"{code}.md"), encoding="utf-8"
+            ) as f:
+                assert f.read().count("## ") == 5
+        assert _run(tmp_dir, "translate-export", "n0000aa", "--delta", store_arg) == (
+            "0 "
+        )
+        assert os.path.exists(
+            os.path.join(tmp_dir, "data", "n0000aa", "n0000aa_delta.json")
+        )
+        # 找不到小说时失败，仍不加载采集依赖
+        assert _run(tmp_dir, "export", "n9999zz", store_arg) == "1 "
+
+        # 需要导入采集模块才能检查的参数也以命令行错误退出
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "main.py"), "fetch", "n1"]
+            + ["--proxies", "http://x", "--proxy-strategy", "bogus"],
+            capture_output=True,
+            text=True,
+            cwd=tmp_dir,
+        )
+        assert result.returncode == 2
+        assert "Unknown proxy strategy: bogus" in result.stderr
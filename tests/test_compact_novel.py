@@ -0,0 +1,90 @@
+import io
+import os
+import tempfile
+
+from novel_spiders.entities.compact_novel import (
+    CompactNovel,
+    ContentLine,
+    LazyChapters,
+    LineTable,
+)
+from novel_spiders.entities.novel import Chapter, ChapterContent, Novel
+from novel_spiders.utils.novel_save_load import (
+    load_compact_novel_from_json,
+    novel_to_json,
+    write_novel_json,
+)
+from novel_spiders.utils.novel_store import NovelStore
+
+
+def _novel() -> Novel:
+    return Novel(
+        title="題名",
+        description="紹介",
+        author="作者",
+        chapters=[
+            Chapter(
+                index=index,
+                title=f"第{index}話",
+                ep_title="第一章",
+                prepend_contents=[ChapterContent(key="p1", content="前書き")],
+                contents=[
+                    ChapterContent(key=str(i), content=f"本文{index}-{i}")
+                    for i in range(3)
+                ],
+                append_contents=[ChapterContent(key="a1", content="後書き")],
+                updated_at="2024/01/01 12:00" if index > 1 else "",
+            )
+            for index in (1, 2, 5)
+        ],
+    )
+
+
+def test_main():
+    """紧凑表示与pydantic模型互相转换结果不变，按需加载的章节只在访问时加载"""
+    novel = _novel()
+    table = LineTable.from_contents(novel.chapters[0].contents)
+    assert len(table) == 3
+    assert table[1] == ContentLine("1", "本文1-1")
+    assert table[1].key == "1" and table[1].content == "本文1-1"
+    assert list(table) == [ContentLine(c.key, c.content) for c in table.to_contents()]
+    assert table.to_contents() == novel.chapters[0].contents
+    assert LineTable.from_pairs([("1", "x")]).to_contents() == [
+        ChapterContent(key="1", content="x")
+    ]
+
+    compact = CompactNovel.from_novel(novel)
+    assert compact.to_novel() == novel
+    assert load_compact_novel_from_json(novel_to_json(novel)).to_novel() == novel
+    # 紧凑表示逐章写出的json与原来的一致
+    f = io.StringIO()
+    write_novel_json(compact, f)
+    assert f.getvalue() == novel_to_json(novel)
+
+    loaded = []
+
+    def load(index):
+        loaded.append(index)
+        return compact.chapters[[1, 2, 5].index(index)]
+
+    chapters = LazyChapters([1, 2, 5], load)
+    assert len(chapters) == 3 and not loaded
+    assert chapters[-1].index == 5 and loaded == [5]
+    assert [c.index for c in chapters[:2]] == [1, 2]
+    # 不保留已加载的章节时每次访问都重新加载
+    chapters.get(5)
+    assert loaded == [5, 1, 2, 5]
+    cached = LazyChapters([1, 2, 5], load, keep_loaded=True)
+    loaded.clear()
+    assert [c.index for c in cached] == [1, 2, 5]
+    assert [c.index for c in cached] == [1, 2, 5]
+    assert loaded == [1, 2, 5]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with NovelStore(os.path.join(tmp_dir, "novels.sqlite3")) as store:
+            store.save_novel("n1", novel)
+            lazy = store.load_compact("n1")
+            assert isinstance(lazy.chapters, LazyChapters)
+            assert lazy.chapters.indexes == [1, 2, 5]
+            assert lazy.to_novel() == novel
+            assert store.load_compact("n2") is None
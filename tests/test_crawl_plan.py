@@ -0,0 +1,71 @@
+import asyncio
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.entities.novel import Novel, TocEntry
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from tests.helpers import make_chapter
+
+OLD = "2024/01/01 12:00"
+NEW = "2024/03/01 12:00"
+
+
+def test_main():
+    """按目录清单与已保存章节的更新时间比较，只获取新增和改稿的章节，合并时去掉已删除的章节"""
+    spider = Syosetu18Spider()
+    manifest = [
+        TocEntry(index=1, url="u1", updated_at=OLD),
+        TocEntry(index=2, url="u2", updated_at=NEW),
+        TocEntry(index=3, url="u3", updated_at=NEW),
+        TocEntry(index=4, url="u4", updated_at=""),
+        TocEntry(index=5, url="u5", updated_at=OLD),
+    ]
+    versions = {1: OLD, 2: OLD, 3: "", 4: OLD, 9: OLD}
+    # 2改稿、5新增；3是没有更新时间的旧数据，4目录中没有时间，都视为未改动
+    entries = spider._get_outdated_entries(versions, manifest)
+    assert [e.index for e in entries] == [2, 5]
+
+    config = StubConfig(
+        chapters=8, deleted={4}, revised={2: NEW}, retry_after=None, seed=1
+    )
+    with StubServer(config) as server:
+        patch_spider(spider, server.base_url)
+        spider.resource_name = config.code
+        spider.http2 = False
+        spider.rate_limit = RateLimitConfig(requests_per_second=0)
+
+        # 已保存1~6章：2章之后改稿，3章是旧数据，4章已从目录删除，7、8章是新增
+        novel = Novel(
+            title="旧題",
+            description="",
+            author="",
+            chapters=[
+                make_chapter(i, updated_at="" if i == 3 else OLD) for i in range(1, 7)
+            ],
+        )
+        plan = asyncio.run(spider.plan_crawl(novel))
+        assert [e.index for e in plan.entries] == [2, 7, 8]
+        assert [e.index for e in plan.manifest] == [1, 2, 3, 5, 6, 7, 8]
+        assert plan.manifest[1].updated_at == NEW
+        # 旧数据补上目录中的更新时间
+        assert novel.chapters[2].updated_at == OLD
+        assert server.requests["chapter"] == 0
+
+        # 只用更新时间比较时结果相同，旧数据的时间由missing_versions补上
+        versions = {i: "" if i == 3 else OLD for i in range(1, 7)}
+        plan = asyncio.run(spider.plan_crawl(versions=versions))
+        assert [e.index for e in plan.entries] == [2, 7, 8]
+        assert plan.missing_versions(versions) == {3: OLD}
+
+        fetched = {
+            e.index: make_chapter(e.index, updated_at=e.updated_at)
+            for e in plan.entries
+        }
+        merged = plan.merge({c.index: c for c in novel.chapters}, fetched)
+        assert merged.title == config.title
+        assert [c.index for c in merged.chapters] == [1, 2, 3, 5, 6, 7, 8]
+        assert merged.chapters[1].updated_at == NEW
+
+        # 没有已保存的章节时全部获取
+        plan = asyncio.run(spider.plan_crawl())
+        assert [e.index for e in plan.entries] == [1, 2, 3, 5, 6, 7, 8]
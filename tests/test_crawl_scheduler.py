@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+import tempfile
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+
+
+async def _crawl(server: StubServer, tmp_dir: str, metrics: Metrics):
+    """两部小说共用一个客户端和调度器，获取第3章时抛出异常"""
+    spiders = []
+    for retry_rounds in (0, 1):
+        spider = Syosetu18Spider()
+        patch_spider(spider, server.base_url)
+        spider.resource_name = server.config.code
+        spider.data_root = tmp_dir
+        spider.use_journal = False
+        spider.http2 = False
+        spider.parse_workers = 0
+        spider.max_concurrency = 1
+        spider.chapter_retry_rounds = retry_rounds
+        spider.metrics = metrics
+        spider.rate_limit = RateLimitConfig(
+            requests_per_second=0, backoff_base=0.01, backoff_max=0.05
+        )
+        spiders.append(spider)
+
+    client = spiders[0].create_client()
+    get_webpage = client.get_webpage
+    failures = {"left": 2}
+
+    async def flaky_get_webpage(url, version=None):
+        if url.endswith("/3/") and failures["left"] > 0:
+            failures["left"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return await get_webpage(url, version)
+
+    client.get_webpage = flaky_get_webpage
+    scheduler = spiders[0].create_scheduler(client)
+    async with client, scheduler:
+        for spider in spiders:
+            spider.client = client
+            spider.scheduler = scheduler
+        manifest = await spiders[0].get_chapter_manifest()
+
+        async def collect(spider):
+            return [c.index async for c in spider.iter_chapters(manifest)]
+
+        return await asyncio.wait_for(
+            asyncio.gather(*(collect(s) for s in spiders), return_exceptions=True),
+            timeout=10,
+        )
+
+
+def test_main():
+    """获取网页抛出异常时只有该章失败，获取协程继续运行，共用调度器的其他小说不受影响"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = StubConfig(chapters=5, retry_after=None)
+        with StubServer(config) as server:
+            metrics = Metrics()
+            failed, retried = asyncio.run(_crawl(server, tmp_dir, metrics))
+            # 不重试的小说第3章失败，重试的小说全部完成
+            assert isinstance(failed, Exception)
+            assert "[3]" in str(failed)
+            assert sorted(retried) == [1, 2, 3, 4, 5]
+            assert metrics.value("chapters_total", result="fetch_failed") == 2
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import tempfile
+
+from benchmarks.stub_server import StubConfig, StubServer
+from novel_spiders.utils.image_downloader import ImageDownloader
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+
+
+async def _download(base_url: str, tmp_dir: str):
+    config = RateLimitConfig(requests_per_second=0, backoff_base=0.01, max_retry=1)
+    async with AsyncHttpClient(rate_limit=config, http2=False) as client:
+        downloader = ImageDownloader(client, max_finished=2)
+        tasks = [
+            downloader.submit(f"{base_url}/img/{name}.jpg", os.path.join(tmp_dir, path))
+            for name, path in [("a", "1/a.jpg"), ("a", "2/a.jpg"), ("a", "1/a.jpg")]
+        ]
+        assert tasks[0] is tasks[2]
+        await downloader.join()
+        results = [task.result() for task in tasks]
+        pending = (len(downloader._tasks), len(downloader._downloads))
+
+        # 已下载完成的URL从文件复制，超过上限后忘记最早的
+        assert await downloader.submit(
+            f"{base_url}/img/a.jpg", os.path.join(tmp_dir, "3/a.jpg")
+        )
+        for name in ("b", "c"):
+            downloader.submit(
+                f"{base_url}/img/{name}.jpg", os.path.join(tmp_dir, f"{name}.jpg")
+            )
+        await downloader.join()
+        return results, pending, list(downloader._finished)
+
+
+def test_main():
+    """同一URL只下载一次，完成的任务不再保留，已完成的URL只记录最近的若干个"""
+    with tempfile.TemporaryDirectory() as tmp_dir, StubServer(StubConfig()) as server:
+        results, pending, finished = asyncio.run(_download(server.base_url, tmp_dir))
+        assert results == [True, True, True]
+        assert pending == (0, 0)
+        assert server.requests["image"] == 3
+        for path in ("1/a.jpg", "2/a.jpg", "3/a.jpg"):
+            assert os.path.exists(os.path.join(tmp_dir, path))
+        assert sorted(finished) == [
+            f"{server.base_url}/img/{n}.jpg" for n in ("b", "c")
+        ]
@@ -0,0 +1,32 @@
+from novel_spiders.utils.metrics import Metrics
+
+
+def test_main():
+    """计数器、仪表和直方图的Prometheus文本和json导出"""
+    metrics = Metrics()
+    metrics.describe("parse_seconds", "章节解析耗时", "histogram", [0.1, 1.0])
+    metrics.inc("http_responses_total", status=200)
+    metrics.inc("http_responses_total", status=200)
+    metrics.inc("http_responses_total", status=503)
+    metrics.set("queue_depth", 3, queue="jobs")
+    metrics.add("queue_depth", -1, queue="jobs")
+    for value in (0.05, 0.5, 2.0):
+        metrics.observe("parse_seconds", value)
+
+    assert metrics.value("http_responses_total", status=200) == 2
+    assert metrics.total("http_responses_total") == 3
+    assert metrics.value("queue_depth", queue="jobs") == 2
+
+    text = metrics.to_prometheus()
+    assert "# HELP parse_seconds 章节解析耗时" in text
+    assert "# TYPE http_responses_total counter" in text
+    assert 'http_responses_total{status="503"} 1' in text
+    assert 'queue_depth{queue="jobs"} 2' in text
+    assert 'parse_seconds_bucket{le="0.1"} 1' in text
+    assert 'parse_seconds_bucket{le="1"} 2' in text
+    assert 'parse_seconds_bucket{le="+Inf"} 3' in text
+    assert "parse_seconds_count 3" in text
+
+    stats = metrics.to_json()
+    assert stats["parse_seconds"][0]["count"] == 3
+    assert stats["parse_seconds"][0]["p50"] == 1.0
@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+
+from benchmarks.synthetic import make_novel
+from novel_spiders.entities.novel import ChapterContent
+from novel_spiders.utils.novel_export import RenderCache, export_novel
+from novel_spiders.utils.novel_save_load import (
+    novel_to_markdown,
+    novel_to_translatable_json,
+)
+
+
+def test_main():
+    """多格式导出：markdown与原实现一致，修改一章或一行翻译后只重新渲染该章，epub目录按大章节嵌套"""
+    novel = make_novel(60, 20)
+    novel.chapters[2].contents.append(
+        ChapterContent(key="L99", content="img: ![挿絵](assets/imgs/a.jpg)")
+    )
+    translates = {
+        key: f"訳:{text}"
+        for key, text in json.loads(novel_to_translatable_json(novel)).items()
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.makedirs(os.path.join(tmp_dir, "assets", "imgs"))
+        with open(os.path.join(tmp_dir, "assets", "imgs", "a.jpg"), "wb") as f:
+            f.write(b"jpeg")
+        out_base = os.path.join(tmp_dir, "n0000aa")
+        formats = ["md", "html", "epub"]
+
+        with RenderCache(os.path.join(tmp_dir, "render.sqlite3")) as cache:
+            stats = export_novel(novel, translates, out_base, formats, cache, 2)
+            assert (stats.chapters, stats.rendered, stats.cached) == (60, 60, 0)
+            with io.open(f"{out_base}.md", "r", encoding="utf-8") as f:
+                assert f.read() == novel_to_markdown(novel, translates)
+
+            novel.chapters[10].contents[0].content = "書き換えた行"
+            translates["ch-30-L1"] = "直した訳"
+            stats = export_novel(novel, translates, out_base, formats, cache, 0)
+            assert (stats.rendered, stats.cached) == (2, 58)
+            with io.open(f"{out_base}.md", "r", encoding="utf-8") as f:
+                assert f.read() == novel_to_markdown(novel, translates)
+
+        with io.open(f"{out_base}.html", "r", encoding="utf-8") as f:
+            page = f.read()
+        assert page.count("<section ") == 60
+        assert "直した訳" in page and "書き換えた行" in page
+
+        with zipfile.ZipFile(f"{out_base}.epub") as book:
+            names = book.namelist()
+            assert names[0] == "mimetype"
+            assert book.getinfo("mimetype").compress_type == zipfile.ZIP_STORED
+            assert "OEBPS/ch-00060.xhtml" in names
+            assert "OEBPS/assets/imgs/a.jpg" in names
+            opf = book.read("OEBPS/content.opf").decode("utf-8")
+            assert opf.count("<itemref ") == 61
+            nav = book.read("OEBPS/nav.xhtml").decode("utf-8")
+            assert nav.count("第2章") == 1
+
+        # 大章节变为没有大章节时，之后的章节不放进上一个大章节
+        small = make_novel(5, 2)
+        for chapter, ep_title in zip(small.chapters, ["甲", "甲", "", "乙", ""]):
+            chapter.ep_title = ep_title
+        export_novel(small, {}, out_base, ["epub"])
+        with zipfile.ZipFile(f"{out_base}.epub") as book:
+            nav = ET.fromstring(book.read("OEBPS/nav.xhtml"))
+        ns = {"x": "http://www.w3.org/1999/xhtml"}
+        top = nav.find(".//x:nav/x:ol", ns)
+        assert [li.find("x:a", ns).text for li in top.findall("x:li", ns)] == [
+            small.title,
+            "甲",
+            small.chapters[2].title,
+            "乙",
+            small.chapters[4].title,
+        ]
+        assert len(top.findall("x:li/x:ol/x:li", ns)) == 3
@@ -0,0 +1,58 @@
+import io
+import json
+import os
+
+from novel_spiders.entities.compact_novel import CompactNovel
+from novel_spiders.utils.novel_save_load import (
+    NovelLineIndex,
+    TranslationTable,
+    _is_skip_line,
+    load_novel_from_json,
+    novel_to_markdown,
+    novel_to_translatable_json,
+    write_novel_markdown,
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _read(name: str) -> str:
+    with io.open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _old_is_skip_line(line: str) -> bool:
+    """原来的逐字符判断"""
+    return (
+        line.strip() == ""
+        or line.strip().startswith("#")
+        or line.strip().startswith("img:")
+        or all(c in ".,:;!?。，：；！？ #1234567890＊-+=()*♥" for c in line.strip())
+    )
+
+
+def test_main():
+    """共用行索引和预处理翻译后，待翻译json和markdown与原实现的输出一致"""
+    novel = load_novel_from_json(_read("export_novel.json"))
+    translates = json.loads(_read("export_translates.json"))
+    # 由原实现生成
+    expected_json = _read("export_expected.json")
+    expected_md = _read("export_expected.md")
+
+    for chapter in novel.chapters:
+        for content in chapter.contents + chapter.prepend_contents:
+            assert _is_skip_line(content.content) == _old_is_skip_line(content.content)
+
+    assert novel_to_translatable_json(novel) == expected_json
+    assert novel_to_markdown(novel, translates) == expected_md
+
+    compact = CompactNovel.from_novel(novel)
+    line_index = NovelLineIndex()
+    table = TranslationTable(translates)
+    assert novel_to_translatable_json(compact, line_index) == expected_json
+    # 第二次导出复用行索引
+    assert novel_to_markdown(compact, table, line_index) == expected_md
+    assert novel_to_markdown(novel, table, line_index) == expected_md
+    f = io.StringIO()
+    write_novel_markdown(compact, table, f, line_index)
+    assert f.getvalue() == expected_md
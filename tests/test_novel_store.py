@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+from novel_spiders.entities.novel import Chapter, Novel
+from novel_spiders.utils.novel_save_load import novel_to_json
+from novel_spiders.utils.novel_store import NovelStore
+from tests.helpers import make_chapter
+
+
+def _chapter(index: int, text: str = "本文") -> Chapter:
+    return make_chapter(
+        index,
+        text,
+        updated_at=f"2024/01/0{index} 12:00",
+        ep_title="第一章" if index <= 2 else "",
+        prepend="前書き",
+    )
+
+
+def _novel(chapters) -> Novel:
+    return Novel(title="題名", description="紹介", author="作者", chapters=chapters)
+
+
+def test_main():
+    """只写入有变化的章节、删除已不存在的章节、逐章读取，以及从旧的json导入"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with NovelStore(os.path.join(tmp_dir, "novels.sqlite3")) as store:
+            novel = _novel([_chapter(i) for i in range(1, 5)])
+            assert store.save_novel("n1", novel) == 4
+            assert store.save_novel("n1", novel) == 0
+            # 内容或元数据变化的章节重新写入
+            novel.chapters[1] = _chapter(2, "改稿")
+            novel.chapters[2].title = "新しい題"
+            assert store.save_novel("n1", novel) == 2
+            assert store.load_novel("n1") == novel
+            # 目录中已删除的章节从存储中删除
+            del novel.chapters[3]
+            assert store.save_novel("n1", novel) == 0
+            assert store.chapter_indexes("n1") == [1, 2, 3]
+            assert store.load_chapter("n1", 4) is None
+            assert store.load_novel("n1") == novel
+            assert list(store.iter_chapters("n1")) == novel.chapters
+            assert list(store.iter_chapters("n2")) == []
+            assert store.load_novel("n2") is None
+
+            # 逐章读取中途停止也能继续使用
+            chapters = store.iter_chapters("n1")
+            assert next(chapters).index == 1
+            chapters.close()
+            assert store.save_chapters("n1", [_chapter(3, "再改稿")]) == 1
+            assert store.load_chapter("n1", 3).contents[0].content == "再改稿"
+
+            # 旧数据：./{code}/{code}.json，已导入和无法解析的跳过
+            data_root = os.path.join(tmp_dir, "data")
+            for code, text in [
+                ("n1", novel_to_json(novel)),
+                ("n3", novel_to_json(_novel([_chapter(1)]))),
+                ("n4", "{"),
+            ]:
+                os.makedirs(os.path.join(data_root, code))
+                with open(
+                    os.path.join(data_root, code, f"{code}.json"), "w", encoding="utf-8"
+                ) as f:
+                    f.write(text)
+            os.makedirs(os.path.join(data_root, "n5"))
+            assert store.migrate_data_root(data_root) == ["n3"]
+            assert store.codes() == ["n1", "n3"]
+            assert store.load_novel("n3") == _novel([_chapter(1)])
+            assert os.path.exists(os.path.join(data_root, "n3", "n3.json"))
+            assert store.migrate_data_root(data_root) == []
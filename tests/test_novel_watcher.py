@@ -0,0 +1,108 @@
+import asyncio
+import os
+import tempfile
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.spiders.novel_watcher import (
+    POLL_CHANGED,
+    POLL_NOT_MODIFIED,
+    POLL_UNCHANGED,
+    NovelWatcher,
+)
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from novel_spiders.utils.watch_list import WatchList
+
+
+async def _poll_rounds(server, tmp_dir, store, watch_list):
+    """依次轮询：首次获取、304、内容未变、新增章节"""
+
+    def create_spider(code, site):
+        spider = Syosetu18Spider()
+        patch_spider(spider, server.base_url)
+        spider.resource_name = code
+        spider.data_root = os.path.join(tmp_dir, code)
+        spider.use_journal = False
+        spider.http2 = False
+        spider.parse_workers = 0
+        spider.rate_limit = RateLimitConfig(
+            requests_per_second=0, backoff_base=0.01, backoff_max=0.05
+        )
+        return spider
+
+    async def on_change(spider):
+        code = spider.resource_name
+        novel = store.load_novel(code)
+        if novel is None:
+            novel = await spider.get_novel()
+        else:
+            novel = await spider.update_novel(novel)
+        store.save_novel(code, novel)
+
+    watcher = NovelWatcher(watch_list, create_spider, on_change)
+    template = create_spider("", "syosetu18")
+    rounds = []
+    async with template.create_client() as client:
+        async with template.create_scheduler(client) as scheduler:
+            for setup in (
+                lambda: None,
+                lambda: None,
+                lambda: setattr(server.config, "etag", False),
+                lambda: setattr(server.config, "chapters", 12),
+            ):
+                setup()
+                before = dict(server.requests)
+                results = await watcher.run_once(client, scheduler)
+                requests = {
+                    kind: count - before.get(kind, 0)
+                    for kind, count in server.requests.items()
+                    if count != before.get(kind, 0)
+                }
+                rounds.append(([r.status for r in results], requests))
+    return rounds
+
+
+def test_main():
+    """关注列表的自适应轮询间隔，以及条件请求和摘要比较，有更新时只获取新章节"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with WatchList(
+            os.path.join(tmp_dir, "schedule.sqlite3"),
+            min_interval=10,
+            max_interval=100,
+            initial_interval=40,
+            jitter=0,
+        ) as schedule:
+            assert schedule.follow(["a", "b"], "syosetu") == 2
+            assert schedule.follow(["b", "c"], "syosetu18") == 1
+            assert [e.code for e in schedule.due(10)] == ["a", "b", "c"]
+            assert schedule.record_poll("a", False, '"e1"', None, "d1", now=0) == 60
+            assert schedule.record_poll("a", True, '"e2"', None, "d2", now=0) == 30
+            assert schedule.record_poll("a", True, '"e2"', None, "d2", now=0) == 15
+            assert schedule.record_poll("a", True, '"e2"', None, "d2", now=0) == 10
+            assert schedule.record_poll("b", False, None, None, "d", now=0) == 60
+            schedule.record_failure("c", now=0)
+            assert [e.code for e in schedule.due(10, now=20)] == ["a", "c"]
+            assert schedule.next_poll_at() == 10
+            assert schedule.entries()[0].etag == '"e2"'
+
+        config = StubConfig(chapters=10, retry_after=None, seed=3)
+        store = NovelStore(os.path.join(tmp_dir, "novels.sqlite3"))
+        with WatchList(
+            os.path.join(tmp_dir, "watch.sqlite3"),
+            min_interval=0,
+            max_interval=0,
+            jitter=0,
+        ) as watch_list:
+            watch_list.follow(["n0000aa"], "syosetu18")
+            with StubServer(config) as server:
+                rounds = asyncio.run(_poll_rounds(server, tmp_dir, store, watch_list))
+        first, not_modified, unchanged, changed = rounds
+        assert first[0] == [POLL_CHANGED] and first[1]["chapter"] == 10
+        assert not_modified == ([POLL_NOT_MODIFIED], {"info_not_modified": 1})
+        assert unchanged == ([POLL_UNCHANGED], {"info": 1})
+        assert changed[0] == [POLL_CHANGED] and changed[1]["chapter"] == 2
+        assert [c.index for c in store.load_novel("n0000aa").chapters] == list(
+            range(1, 13)
+        )
+        store.close()
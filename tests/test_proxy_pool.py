@@ -0,0 +1,59 @@
+import asyncio
+import tempfile
+
+from benchmarks.stub_proxy import StubProxy, closed_port_url
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.proxy_pool import ProxyPool
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+
+
+def test_main():
+    """通过本地代理采集，请求分摊到正常的代理，被限流和连不上的代理被剔除"""
+    config = StubConfig(chapters=20, toc_page_size=10, image_count=2, seed=1)
+    with (
+        tempfile.TemporaryDirectory() as tmp_dir,
+        StubServer(config) as server,
+        StubProxy() as good1,
+        StubProxy() as good2,
+        StubProxy(throttle=True) as throttled,
+    ):
+        down = closed_port_url()
+        pool = ProxyPool([good1.url, good2.url, throttled.url, down], max_failures=2)
+
+        spider = Syosetu18Spider()
+        patch_spider(spider, server.base_url)
+        spider.resource_name = config.code
+        spider.data_root = tmp_dir
+        spider.use_journal = False
+        spider.http2 = False
+        spider.parse_workers = 0
+        spider.max_concurrency = 2
+        spider.proxy_pool = pool
+        spider.rate_limit = RateLimitConfig(
+            requests_per_second=0, max_retry=5, backoff_base=0.01, backoff_max=0.05
+        )
+
+        novel = asyncio.run(spider.get_novel())
+
+        assert [c.index for c in novel.chapters] == list(range(1, 21))
+        forwarded = good1.requests["forwarded"] + good2.requests["forwarded"]
+        assert forwarded == sum(server.requests.values())
+        assert good1.requests["forwarded"] > 0 and good2.requests["forwarded"] > 0
+        # 被剔除后不再使用，只有剔除前已分到的请求
+        assert 0 < throttled.requests["throttled"] <= 4
+        assert pool.get(throttled.url).is_ejected()
+        assert pool.get(down).is_ejected()
+        assert not pool.get(good1.url).is_ejected()
+
+        # 健康检查：限流的出口仍不健康，恢复后的出口重新加入
+        throttled.throttle = False
+        health = asyncio.run(_check(spider, server.base_url))
+        assert health[throttled.url] is True
+        assert health[down] is False
+        assert not pool.get(throttled.url).is_ejected()
+
+
+async def _check(spider, base_url):
+    async with spider.create_client() as client:
+        return await client.check_proxies(f"{base_url}/")
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from benchmarks.stub_server import StubConfig, StubServer
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.rate_limiter import (
+    HostLimiter,
+    RateLimitConfig,
+    TokenBucket,
+    backoff_delay,
+    parse_retry_after,
+)
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+
+
+async def _bucket_elapsed() -> float:
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        await bucket.acquire()
+    return time.monotonic() - start
+
+
+async def _paused_slot(limiter: HostLimiter) -> float:
+    start = time.monotonic()
+    async with limiter.slot():
+        pass
+    return time.monotonic() - start
+
+
+async def _fetch(server: StubServer, metrics: Metrics, url: str):
+    config = RateLimitConfig(
+        requests_per_second=0, backoff_base=0.01, backoff_max=0.05, max_retry=3
+    )
+    async with AsyncHttpClient(
+        rate_limit=config, http2=False, metrics=metrics
+    ) as client:
+        return await client.get_webpage(f"{server.base_url}{url}")
+
+
+def test_main():
+    """令牌桶限速、AIMD自适应并发、Retry-After暂停，以及404等客户端错误不重试"""
+    # 容量2的桶先取出2个，之后每个令牌等待1/50秒
+    assert 0.03 <= asyncio.run(_bucket_elapsed()) < 0.5
+
+    config = RateLimitConfig(
+        requests_per_second=0, initial_concurrency=2, additive_increase=1.0
+    )
+    limiter = HostLimiter(config, max_concurrency=4)
+    assert limiter.limit == 2
+    limiter.on_success(0.001)
+    assert limiter.limit == 2.5
+    for _ in range(20):
+        limiter.on_success(0.001)
+    assert limiter.limit == 4
+    limiter.on_failure()
+    assert limiter.limit == 2
+    # 同一个延迟窗口内的失败只减一次
+    limiter.on_failure()
+    assert limiter.limit == 2
+    time.sleep(0.01)
+    # 延迟突增也乘性减少
+    limiter.on_success(1.0)
+    assert limiter.limit == 1
+    time.sleep(0.01)
+    limiter.on_failure()
+    assert limiter.limit == 1
+
+    assert parse_retry_after(" 3 ") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert backoff_delay(0, base=0.01, cap=10, retry_after=2) == 2
+    assert backoff_delay(0, base=0.01, cap=1, retry_after=5) == 1
+    limiter.on_failure(retry_after=0.05)
+    assert asyncio.run(_paused_slot(limiter)) >= 0.04
+
+    with StubServer(StubConfig(chapters=6, deleted={5}, retry_after=1)) as server:
+        metrics = Metrics()
+        assert asyncio.run(_fetch(server, metrics, "/n0000aa/5/")) is None
+        assert server.requests["missing"] == 1
+        assert (
+            metrics.value(
+                "http_retries_total", kind="page", reason="404", result="gave_up"
+            )
+            == 1
+        )
+        # 被限流时重试到次数用尽
+        server.config.error_rate = 1.0
+        server.config.error_status = 429
+        assert asyncio.run(_fetch(server, metrics, "/n0000aa/1/")) is None
+        assert server.requests["error"] == 3
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+
+from benchmarks.stub_server import StubConfig, StubServer
+from novel_spiders.utils.metrics import Metrics
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from novel_spiders.utils.requests_helper import AsyncHttpClient
+from novel_spiders.utils.response_cache import ResponseCache
+
+
+async def _fetch(cache: ResponseCache, metrics: Metrics, url: str, version=None):
+    config = RateLimitConfig(requests_per_second=0, backoff_base=0.01, max_retry=1)
+    async with AsyncHttpClient(
+        rate_limit=config, http2=False, metrics=metrics, cache=cache
+    ) as client:
+        return await client.get_webpage(url, version)
+
+
+def test_main():
+    """ETag重新验证（304）、版本相同时不访问网络、离线模式，以及按最近最少使用成批淘汰"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with StubServer(StubConfig(chapters=3, retry_after=None)) as server:
+            cache = ResponseCache(os.path.join(tmp_dir, "http"))
+            metrics = Metrics()
+            info_url = f"{server.base_url}/novelview/infotop/ncode/n0000aa/"
+            chapter_url = f"{server.base_url}/n0000aa/1/"
+
+            text = asyncio.run(_fetch(cache, metrics, info_url))
+            assert text and server.requests["info"] == 1
+            # 带If-None-Match重新验证，服务器返回304，内容取自缓存
+            assert asyncio.run(_fetch(cache, metrics, info_url)) == text
+            assert server.requests["info_not_modified"] == 1
+            assert metrics.value("cache_requests_total", result="revalidated") == 1
+
+            # 章节版本与缓存的相同时不访问网络，版本变化时重新获取
+            text = asyncio.run(_fetch(cache, metrics, chapter_url, "v1"))
+            assert asyncio.run(_fetch(cache, metrics, chapter_url, "v1")) == text
+            assert server.requests["chapter"] == 1
+            assert metrics.value("cache_requests_total", result="fresh") == 1
+            asyncio.run(_fetch(cache, metrics, chapter_url, "v2"))
+            assert server.requests["chapter"] == 2
+            cache.close()
+
+            # 离线模式只读缓存
+            offline = ResponseCache(os.path.join(tmp_dir, "http"), cache_only=True)
+            assert asyncio.run(_fetch(offline, metrics, chapter_url, "v3")) == text
+            assert (
+                asyncio.run(_fetch(offline, metrics, f"{server.base_url}/x/")) is None
+            )
+            assert server.requests["chapter"] == 2
+            offline.close()
+
+        cache = ResponseCache(os.path.join(tmp_dir, "lru"), max_bytes=10000)
+        bodies = [os.urandom(1000) for _ in range(12)]
+        for i, body in enumerate(bodies[:9]):
+            cache.put(f"u{i}", body, "utf-8", None, None)
+        assert cache.total_bytes() > 9000
+        # 最早写入的u0刚被读取过，淘汰时保留
+        assert cache.get("u0").body == bodies[0]
+        cache.put("u9", bodies[9], "utf-8", None, None)
+        # 超过上限后一次淘汰到上限的90%以下，之后的写入暂不淘汰
+        assert cache.total_bytes() <= 9000
+        cache.put("u10", bodies[10], "utf-8", None, None)
+        assert 9000 < cache.total_bytes() <= 10000
+        assert cache.get("u0") is not None
+        assert cache.get("u1") is None and cache.get("u2") is None
+        assert cache.get("u10").body == bodies[10]
+        cache.close()
+        # 大小与磁盘上的记录一致
+        cache = ResponseCache(os.path.join(tmp_dir, "lru"), max_bytes=10000)
+        assert 9000 < cache.total_bytes() <= 10000
+        assert cache.get("u0") is not None
+        cache.close()
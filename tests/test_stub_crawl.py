@@ -0,0 +1,52 @@
+import asyncio
+import tempfile
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+
+
+def test_main():
+    """通过本地桩服务器离线采集整部小说，包括出错重试和图片下载"""
+    config = StubConfig(
+        chapters=12,
+        toc_page_size=5,
+        error_rate=0.1,
+        retry_after=None,
+        episode_size=4,
+        deleted={5},
+        seed=3,
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir, StubServer(config) as server:
+        spider = Syosetu18Spider()
+        patch_spider(spider, server.base_url)
+        spider.resource_name = config.code
+        spider.data_root = tmp_dir
+        spider.use_journal = False
+        spider.http2 = False
+        spider.parse_workers = 0
+        spider.rate_limit = RateLimitConfig(
+            requests_per_second=0, backoff_base=0.01, backoff_max=0.05
+        )
+
+        novel = asyncio.run(spider.get_novel())
+
+        assert novel.title == config.title
+        assert novel.author == "ベンチ作者"
+        # 目录中没有的章节不获取
+        assert [c.index for c in novel.chapters] == [1, 2, 3, 4, 6, 7, 8, 9, 10, 11, 12]
+        assert all(c.updated_at == "2024/01/01 12:00" for c in novel.chapters)
+        assert novel.chapters[0].title == "第1話 長い一日"
+        assert novel.chapters[1].title == "第2話 挿絵"
+        assert server.requests["toc"] == 3
+        assert "missing" not in server.requests
+        # 图片按URL去重下载
+        assert 0 < server.requests["image"] <= config.image_count
+
+        manifest = asyncio.run(spider.get_chapter_manifest())
+        assert [e.index for e in manifest] == [c.index for c in novel.chapters]
+        assert manifest[0].url == f"{server.base_url}/{config.code}/1/"
+        assert manifest[0].title == "第1話"
+        # 章标题沿用到之后的页
+        assert [e.ep_title for e in manifest[3:6]] == ["第1章", "第2章", "第2章"]
+        assert manifest[-1].ep_title == "第3章"
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from novel_spiders.entities.novel import Chapter, ChapterContent, Novel
+from novel_spiders.utils.novel_save_load import novel_to_translatable_json
+from novel_spiders.utils.translation_delta import TranslationFiles, text_hash
+
+
+def _novel(lines) -> Novel:
+    return Novel(
+        title="題名",
+        description="紹介",
+        author="作者",
+        chapters=[
+            Chapter(
+                index=1,
+                title="第1話",
+                ep_title="",
+                prepend_contents=[],
+                contents=[
+                    ChapterContent(key=str(i), content=line)
+                    for i, line in enumerate(lines)
+                ],
+                append_contents=[],
+            )
+        ],
+    )
+
+
+def _write(path: str, data) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_main():
+    """增量导出未翻译和改稿的行，合并增量翻译，旧翻译按待翻译原文快照补记哈希"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = TranslationFiles(tmp_dir, "n1")
+        # 首次导出的快照，之后第2行改稿，翻译时还没有哈希
+        _write(
+            files.untrans_path,
+            json.loads(novel_to_translatable_json(_novel(["あ", "い", "う"]))),
+        )
+        translates = {
+            "title": "标题",
+            "description": "简介",
+            "ch-1-title": "第1话",
+            "ch-1-0": "啊",
+            "ch-1-1": "咿",
+        }
+        novel = _novel(["あ", "い改", "う"])
+
+        delta = files.export_delta(novel, translates)
+        # 未翻译的第3行、翻译后改稿的第2行，未改动的行不导出
+        assert delta == {"ch-1-1": "い改", "ch-1-2": "う"}
+        hashes = files.load_hashes()
+        assert hashes["ch-1-0"] == text_hash("あ")
+        assert hashes["ch-1-1"] == text_hash("い")
+        # 再次导出时结果相同
+        assert files.export_delta(novel, translates) == delta
+
+        _write(
+            files.delta_trans_path, {"ch-1-1": "咿改", "ch-1-2": "呜", "ch-9-0": "x"}
+        )
+        assert files.merge_delta(translates) == ["ch-1-1", "ch-1-2"]
+        assert files.load_translates()["ch-1-1"] == "咿改"
+        assert "ch-9-0" not in translates
+        assert not os.path.exists(files.delta_path)
+        assert not os.path.exists(files.delta_trans_path)
+        assert files.export_delta(novel, translates) == {}
+
+        # 再次改稿只导出改动的行
+        novel = _novel(["あ", "い改", "う改"])
+        assert files.export_delta(novel, translates) == {"ch-1-2": "う改"}
+
+        # 增量原文丢失时不合并，保留翻译结果
+        os.remove(files.delta_path)
+        _write(files.delta_trans_path, {"ch-1-2": "呜改"})
+        with pytest.raises(Exception):
+            files.merge_delta(translates)
+        assert os.path.exists(files.delta_trans_path)
+        assert translates["ch-1-2"] == "呜"
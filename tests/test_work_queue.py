@@ -0,0 +1,106 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.stub_server import StubConfig, StubServer, patch_spider
+from novel_spiders.entities.novel import TocEntry
+from novel_spiders.spiders.distributed_crawl import (
+    CrawlWorker,
+    enqueue_novel,
+    finish_novel,
+)
+from novel_spiders.spiders.syosetu_18_spider import Syosetu18Spider
+from novel_spiders.utils.novel_store import NovelStore
+from novel_spiders.utils.rate_limiter import RateLimitConfig
+from novel_spiders.utils.work_queue import WorkQueue
+
+
+def _entries(count):
+    return [
+        TocEntry(index=i, url=f"http://example.com/{i}/", updated_at="2024/01/01")
+        for i in range(1, count + 1)
+    ]
+
+
+async def _crawl(server, tmp_dir, store, queue):
+    """协调者加入任务后，两个工作者并发处理"""
+
+    def create_spider(code, site):
+        spider = Syosetu18Spider()
+        patch_spider(spider, server.base_url)
+        spider.resource_name = code
+        spider.data_root = os.path.join(tmp_dir, code)
+        spider.use_journal = False
+        spider.http2 = False
+        spider.parse_workers = 0
+        spider.rate_limit = RateLimitConfig(
+            requests_per_second=0, backoff_base=0.01, backoff_max=0.05
+        )
+        return spider
+
+    coordinator = create_spider("n0000aa", "syosetu18")
+    plan = await enqueue_novel(coordinator, store, queue)
+    queue.closed = True
+
+    async def run_worker(name):
+        worker = CrawlWorker(
+            queue, store, create_spider, name, concurrency=3, poll_interval=0.05
+        )
+        async with coordinator.create_client() as client:
+            async with coordinator.create_scheduler(client) as scheduler:
+                return await worker.run(client, scheduler)
+
+    done = await asyncio.gather(run_worker("w1"), run_worker("w2"))
+    # 章节完成前小说信息未保存，中断时不会被当作已保存的小说
+    assert not store.has_novel("n0000aa")
+    await finish_novel(store, "n0000aa", plan)
+    # 已写入存储的章节不再加入队列
+    assert not (await enqueue_novel(coordinator, store, queue)).entries
+    return plan, done
+
+
+def test_main():
+    """任务队列的租用、过期重租、退避重试和次数上限，以及多个工作者的分布式采集"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with WorkQueue(
+            os.path.join(tmp_dir, "queue.sqlite3"), max_attempts=2, retry_base=0
+        ) as queue:
+            assert queue.enqueue("n1", "syosetu18", _entries(3)) == 3
+            leased = queue.lease("w1", 2, lease_seconds=0)
+            assert [t.entry.index for t in leased] == [1, 2]
+            time.sleep(0.01)
+            # 租期已过，其他工作者可以租用，原工作者的完成不再生效
+            retaken = queue.lease("w2", 5)
+            assert [t.entry.index for t in retaken] == [1, 2, 3]
+            assert [t.attempts for t in retaken] == [2, 2, 1]
+            assert not queue.complete("w1", leased[0])
+            assert queue.complete("w2", retaken[0])
+            # 次数用尽时标记为失败，否则回到队列
+            assert queue.fail("w2", retaken[1], "boom")
+            assert queue.fail("w2", retaken[2], "boom")
+            assert queue.counts("n1") == {
+                "pending": 1,
+                "leased": 0,
+                "done": 1,
+                "failed": 1,
+            }
+            assert queue.failed("n1") == {2: "boom"}
+            assert [t.entry.index for t in queue.lease("w1", 5)] == [3]
+            # 重新加入时重置状态
+            queue.enqueue("n1", "syosetu18", _entries(3))
+            assert queue.counts("n1")["pending"] == 3
+            queue.purge("n1")
+
+            config = StubConfig(chapters=12, error_rate=0.1, retry_after=None, seed=5)
+            store = NovelStore(os.path.join(tmp_dir, "novels.sqlite3"))
+            with StubServer(config) as server:
+                plan, done = asyncio.run(_crawl(server, tmp_dir, store, queue))
+            assert len(plan.entries) == 12
+            assert sum(done) == 12
+            assert queue.counts("n0000aa")["done"] == 12
+            novel = store.load_novel("n0000aa")
+            assert novel.title == config.title
+            assert [c.index for c in novel.chapters] == list(range(1, 13))
+            assert all(c.updated_at for c in novel.chapters)
+            store.close()